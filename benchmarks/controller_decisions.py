@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@file    controller_decisions.py
+@date    2016-01-29
+
+Benchmark of the intersection controllers of sumocontrollib on synthetic
+grid networks, without SUMO.
+
+A grid of rows x cols traffic lights is generated, every intersection with
+four single lane approaches of three links each (right, straight, left) and
+four phases. The lanes are filled by a small synthetic traffic model which
+stands in for traci: vehicles enter at the fringe, cross an intersection
+while their link is green and join the next approach. The intersection
+controllers read it through set_lane_state and set_route_cache, the few
+calls the controllers still make to traci directly (setting the lights,
+occupancy, waiting times) are pointed at it as well.
+
+Every queue controller of controllers.py is run with the MinMax green time
+controller and every green time controller with the Lmax queue controller.
+For each network size the time spent in the controllers is reported per
+simulated step and per decision (the end of a green phase: measuring the
+queues, picking the next phase and setting the amber phase). The time the
+synthetic traffic takes to move is not counted.
+
+sumocontrollib, and so this benchmark, runs on Python 2.
+"""
+from __future__ import print_function, division
+import os
+import sys
+import random
+import timeit
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import traci
+from sumocontrollib import controllers as ctrl
+from sumocontrollib import scheduler
+from sumocontrollib.intersection_controller import IntersectionController
+
+LANE_LENGTH = 100.
+VEHICLE_LENGTH = 5.
+MIN_GAP = 2.5
+# approaches in clockwise order, a vehicle coming from d leaves straight on to
+# (d + 2) % 4, turning right to (d + 3) % 4 and turning left to (d + 1) % 4
+DIRECTIONS = "NESW"
+OFFSETS = {"N": (-1, 0), "E": (0, 1), "S": (1, 0), "W": (0, -1)}
+TURNS = (("r", 3), ("s", 2), ("l", 1))
+# signals of the links of each approach (right, straight, left) in the four phases
+PHASES = ({"N": "GGr", "S": "GGr", "E": "rrr", "W": "rrr"},
+          {"N": "rrG", "S": "rrG", "E": "rrr", "W": "rrr"},
+          {"N": "rrr", "S": "rrr", "E": "GGr", "W": "GGr"},
+          {"N": "rrr", "S": "rrr", "E": "rrG", "W": "rrG"})
+
+
+class GridNetwork:
+
+    def __init__(self, rows, cols):
+        """ Traffic light topology of a rows x cols grid, laid out as tls_logic.get_tls_topology_from_net_file
+        returns it for a SUMO network """
+        self.tls_ids = []
+        self.topology = {}  # tls id -> in lanes, out lanes, L, phases, directions, link index by in lane and out edge
+        self.in_lanes = {}  # lane -> tls id
+        self.fringe_lanes = []
+
+        def node(row, col, direction):
+            neighbour = (row + OFFSETS[direction][0], col + OFFSETS[direction][1])
+            if 0 <= neighbour[0] < rows and 0 <= neighbour[1] < cols:
+                return "%d/%d" % neighbour, False
+            return "%d/%d:%s" % (row, col, direction), True
+
+        for row in range(rows):
+            for col in range(cols):
+                tls_id = "%d/%d" % (row, col)
+                in_lanes, out_lanes, directions, phases = [], [], [], [[] for phase in PHASES]
+                lane2index = {}
+                for approach in DIRECTIONS:
+                    source, fringe = node(row, col, approach)
+                    in_lane = "%s>%s_0" % (source, tls_id)
+                    self.in_lanes[in_lane] = tls_id
+                    if fringe:
+                        self.fringe_lanes.append(in_lane)
+                    lane2index[in_lane] = {}
+                    for turn, (direction, offset) in enumerate(TURNS):
+                        exit_direction = DIRECTIONS[(DIRECTIONS.index(approach) + offset) % 4]
+                        out_edge = "%s>%s" % (tls_id, node(row, col, exit_direction)[0])
+                        lane2index[in_lane][out_edge] = len(in_lanes)
+                        in_lanes.append(in_lane)
+                        out_lanes.append(out_edge + "_0")
+                        directions.append(direction)
+                        for phase, signals in zip(phases, PHASES):
+                            phase.append(signals[approach][turn])
+                L = [[1 if signal in "Gg" else 0 for signal in phase] for phase in phases]
+                self.tls_ids.append(tls_id)
+                self.topology[tls_id] = (in_lanes, out_lanes, L, phases, directions, lane2index)
+
+    def __repr__(self):
+        return "Grid Network (%d intersections)" % len(self.tls_ids)
+
+
+class SyntheticTraci:
+
+    def __init__(self, network, arrival_probability, discharge_probability, seed):
+        """ Vehicles on the approaches of a GridNetwork, moved on by a simple queueing model. Serves as the lane state
+        and the route cache of the intersection controllers and, once installed, answers the traci calls they make """
+        self._network = network
+        self._random = random.Random(seed)
+        self._arrival_probability = arrival_probability
+        self._discharge_probability = discharge_probability
+        self._capacity = int(LANE_LENGTH / (VEHICLE_LENGTH + MIN_GAP))
+        self._time = 0
+        self._num_vehicles = 0
+
+        self._vehicles = dict((lane, ()) for lane in network.in_lanes)  # the last vehicle is nearest the junction
+        self._next_edges = {}
+        self._entry_times = {}
+        self._signals = dict((tls_id, "r" * len(network.topology[tls_id][0])) for tls_id in network.tls_ids)
+
+    def __repr__(self):
+        return "Synthetic Traci (%d vehicles)" % len(self._next_edges)
+
+    def install(self):
+        """Points the traci functions the controllers call directly at this object"""
+        traci.trafficlights.setRedYellowGreenState = self.set_red_yellow_green_state
+        traci.lane.getLastStepVehicleIDs = self.get_vehicle_ids
+        traci.lane.getLastStepOccupancy = self.get_occupancy
+        traci.vehicle.getWaitingTime = self.get_waiting_time
+        traci.vehicle.getBestLanes = lambda veh_id: ()
+
+    def _enter(self, lane):
+        veh_id = "v%d" % self._num_vehicles
+        self._num_vehicles += 1
+        self._next_edges[veh_id] = self._random.choice(
+            list(self._network.topology[self._network.in_lanes[lane]][5][lane].keys()))
+        self._entry_times[veh_id] = self._time
+        self._vehicles[lane] = (veh_id,) + self._vehicles[lane]
+
+    def advance(self, step_length):
+        """Lets the first vehicle of every lane with a green light cross with the discharge probability, then lets new
+        vehicles in at the fringe"""
+        self._time += step_length
+        moves = []
+        for lane, vehicles in self._vehicles.items():
+            if not vehicles or self._random.random() >= self._discharge_probability:
+                continue
+            tls_id = self._network.in_lanes[lane]
+            in_lanes, out_lanes, L, phases, directions, lane2index = self._network.topology[tls_id]
+            link_index = lane2index[lane][self._next_edges[vehicles[-1]]]
+            if self._signals[tls_id][link_index] in "Gg":
+                moves.append((lane, out_lanes[link_index]))
+
+        for lane, out_lane in moves:
+            veh_id = self._vehicles[lane][-1]
+            self._vehicles[lane] = self._vehicles[lane][:-1]
+            del self._next_edges[veh_id]
+            del self._entry_times[veh_id]
+            if out_lane in self._vehicles and len(self._vehicles[out_lane]) < self._capacity:
+                self._enter(out_lane)
+
+        for lane in self._network.fringe_lanes:
+            if len(self._vehicles[lane]) < self._capacity and self._random.random() < self._arrival_probability:
+                self._enter(lane)
+
+    def set_red_yellow_green_state(self, tls_id, state):
+        self._signals[tls_id] = state
+
+    def get_vehicle_ids(self, lane):
+        return self._vehicles.get(lane, ())
+
+    def get_vehicle_number(self, lane):
+        return len(self._vehicles.get(lane, ()))
+
+    def get_mean_vehicle_length(self, lane):
+        return VEHICLE_LENGTH if self._vehicles.get(lane) else 0
+
+    def get_length(self, lane):
+        return LANE_LENGTH
+
+    def get_occupancy(self, lane):
+        return 100 * self.get_vehicle_number(lane) * VEHICLE_LENGTH / LANE_LENGTH
+
+    def get_waiting_time(self, veh_id):
+        return self._time - self._entry_times[veh_id]
+
+    def get_next_edge(self, veh_id, current_edge=None):
+        return self._next_edges[veh_id]
+
+
+def grid_shape(num_intersections):
+    rows = int(num_intersections ** 0.5)
+    while num_intersections % rows:
+        rows -= 1
+    return rows, num_intersections // rows
+
+
+def make_intersection_controllers(network, state, green_time_controller, queue_controller, step_length):
+    intersection_controllers = []
+    for tls_id in network.tls_ids:
+        in_lanes, out_lanes, L, phases, directions, lane2index = network.topology[tls_id]
+        intersection_controller = IntersectionController(tls_id, in_lanes, out_lanes, L, phases, 0.8,
+                                                         green_time_controller, queue_controller, directions,
+                                                         lane2index, 4, sim_step_length=step_length)
+        intersection_controller.set_lane_state(state)
+        intersection_controller.set_route_cache(state)
+        intersection_controllers.append(intersection_controller)
+    return intersection_controllers
+
+
+def run(network, green_time_controller, queue_controller, options):
+    """Returns the controller time per simulated step and per decision (s) and the number of decisions"""
+    random.seed(options.seed)
+    state = SyntheticTraci(network, options.arrivals, options.discharge, options.seed)
+    state.install()
+    intersection_controllers = make_intersection_controllers(network, state, green_time_controller,
+                                                             queue_controller, options.step_length)
+    intersection_scheduler = None
+    if options.scheduler:
+        intersection_scheduler = scheduler.IntersectionScheduler(intersection_controllers)
+
+    step_time = 0
+    decisions = 0
+    for step in range(options.warmup + options.steps):
+        state.advance(options.step_length)
+        if step == options.warmup:
+            step_time = 0
+            decisions = 0
+        green = [intersection_controller._state for intersection_controller in intersection_controllers]
+        start = timeit.default_timer()
+        if intersection_scheduler is None:
+            for intersection_controller in intersection_controllers:
+                intersection_controller.update(step * options.step_length, options.step_length)
+        else:
+            scheduled = intersection_scheduler.start_step()
+            for index, intersection_controller in scheduled:
+                intersection_controller.update(step * options.step_length, options.step_length)
+            intersection_scheduler.end_step(scheduled, options.step_length)
+        step_time += timeit.default_timer() - start
+        # a decision ends every green phase
+        decisions += sum(1 for was_green, intersection_controller in zip(green, intersection_controllers)
+                         if was_green and not intersection_controller._state)
+
+    # every intersection decides again on the state the run ended with, the best of the repeats is taken. Between
+    # the decisions the amber phase is cut short (untimed) so each decision starts from a green phase
+    decision_times = []
+    for repeat in range(options.repeat):
+        decision_time = 0
+        for intersection_controller in intersection_controllers:
+            if not intersection_controller._state:
+                intersection_controller._amber_timer = 0
+                intersection_controller.update(options.steps * options.step_length, options.step_length)
+            start = timeit.default_timer()
+            intersection_controller.prepare_phase_change(options.steps * options.step_length)
+            intersection_controller.change_phase()
+            decision_time += timeit.default_timer() - start
+        decision_times.append(decision_time / len(intersection_controllers))
+
+    return step_time / options.steps, min(decision_times), decisions
+
+
+def main():
+    green_time_controllers = [("MinMax", lambda: ctrl.MinMaxGreenTimeController(10, 60)),
+                              ("P", lambda: ctrl.PGreenTimeController(0.5, 35, 10, 60)),
+                              ("ModelBased", lambda: ctrl.ModelBasedGreenTimeController(10, 60)),
+                              ("AdvancedModelBased", lambda: ctrl.AdvancedModelBasedGreenTimeController(4, 120))]
+    queue_controllers = [("Lmax", ctrl.LmaxQueueController),
+                         ("WaitTimeBasedLmax", ctrl.WaitTimeBasedLmaxQueueController),
+                         ("NormalConvexMax", ctrl.NormalConvexMaxQueueController),
+                         ("NormalLinearMax", ctrl.NormalLinearMaxQueueController),
+                         ("BackPressure", ctrl.BackPressureQueueController),
+                         ("CapacityAwareBackPressure", ctrl.CapacityAwareBackPressureQueueController),
+                         ("CongestionAwareLmax", ctrl.CongestionAwareLmaxQueueController),
+                         ("CongestionDemandOptimising", ctrl.CongestionDemandOptimisingQueueController),
+                         ("MaxWaitTimeDeadlockDetecting",
+                          lambda: ctrl.MaxWaitTimeDeadlockDetectingController(60, ctrl.LmaxQueueController)),
+                         ("AlternatingPhases", ctrl.AlternatingPhasesQueueController)]
+
+    optParser = OptionParser()
+    optParser.add_option("-n", "--intersections", default="10,100,1000",
+                         help="comma separated numbers of intersections (each is laid out as a grid)")
+    optParser.add_option("-s", "--steps", type="int", default=200,
+                         help="number of timed simulation steps")
+    optParser.add_option("-w", "--warmup", type="int", default=100,
+                         help="number of steps run before the timing starts, to fill the lanes")
+    optParser.add_option("-l", "--step-length", type="float", default=1.,
+                         help="simulation step length (s)")
+    optParser.add_option("-a", "--arrivals", type="float", default=0.1,
+                         help="probability of a vehicle entering each fringe lane per step")
+    optParser.add_option("-d", "--discharge", type="float", default=0.5,
+                         help="probability of the first vehicle of a lane crossing per green step")
+    optParser.add_option("-r", "--repeat", type="int", default=3,
+                         help="number of timed decisions per intersection (the best is reported)")
+    optParser.add_option("-q", "--queue-controllers", default=None,
+                         help="comma separated queue controllers to run (default all)")
+    optParser.add_option("-g", "--green-time-controllers", default=None,
+                         help="comma separated green time controllers to run (default all)")
+    optParser.add_option("--scheduler", action="store_true", default=False,
+                         help="wake the intersections with sumocontrollib.scheduler")
+    optParser.add_option("--seed", type="int", default=42,
+                         help="random seed of the traffic and of the controllers")
+    (options, args) = optParser.parse_args()
+
+    if options.queue_controllers:
+        names = options.queue_controllers.split(",")
+        queue_controllers = [entry for entry in queue_controllers if entry[0] in names]
+    if options.green_time_controllers:
+        names = options.green_time_controllers.split(",")
+        green_time_controllers = [entry for entry in green_time_controllers if entry[0] in names]
+
+    combinations = [(green_time_controllers[0], entry) for entry in queue_controllers] if green_time_controllers else []
+    combinations += [(entry, queue_controllers[0]) for entry in green_time_controllers[1:]] if queue_controllers else []
+
+    for num_intersections in [int(entry) for entry in options.intersections.split(",")]:
+        network = GridNetwork(*grid_shape(num_intersections))
+        print("%d intersections (%dx%d grid), %d steps" % ((num_intersections,) + grid_shape(num_intersections) +
+                                                            (options.steps,)))
+        for (green_time_name, green_time_controller), (queue_name, queue_controller) in combinations:
+            name = "%s / %s" % (green_time_name, queue_name)
+            try:
+                step_time, decision_time, decisions = run(network, green_time_controller(), queue_controller(), options)
+            except Exception as e:
+                print("  %-50s failed: %s: %s" % (name, type(e).__name__, e))
+                continue
+            print("  %-50s %10.1f us/step  %8.1f us/decision  %6d decisions" % (
+                name, step_time * 1e6, decision_time * 1e6, decisions))
+
+
+if __name__ == "__main__":
+    main()
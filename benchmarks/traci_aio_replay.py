@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@file    traci_aio_replay.py
+@date    2016-01-27
+
+Drives traci.aio clients against traci.replay servers, without SUMO.
+
+A log of a small session is written with canned SUMO responses: every
+vehicle is subscribed to its speed and road, then each step asks for the
+minimum number of expected vehicles and performs a simulation step, whose
+response carries the subscription results of all vehicles. One
+ReplayServer per simulation serves this log strictly, so every request of
+an AsyncConnection has to match the recorded one byte for byte, and the
+clients run side by side on one event loop. The script checks that each
+client decoded the canned values and reports the time per step as seen by
+the servers, for the clients run concurrently and one after the other.
+
+traci.aio, and so this script, needs Python 3.5 or newer.
+"""
+from __future__ import print_function, division
+import os
+import sys
+import asyncio
+import struct
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import traci
+import traci.aio
+import traci.replay
+import traci.constants as tc
+
+VARIABLES = (tc.VAR_SPEED, tc.VAR_ROAD_ID)
+
+
+def _string(value):
+    value = value.encode("latin-1")
+    return struct.pack("!i", len(value)) + value
+
+
+def _status(cmdID):
+    return struct.pack("!BBBi", 1 + 1 + 1 + 4, cmdID, tc.RTYPE_OK, 0)
+
+
+def _response(cmdID, body):
+    """Frames a response the way SUMO does, with a short or extended length"""
+    if 1 + 1 + len(body) <= 255:
+        return struct.pack("!BB", 1 + 1 + len(body), cmdID) + body
+    return struct.pack("!BiB", 0, 1 + 4 + 1 + len(body), cmdID) + body
+
+
+def vehicleIDs(numVehicles):
+    return ["veh%d" % index for index in range(numVehicles)]
+
+
+def speed(step, index):
+    return ((step + index) % 20) * 0.5
+
+
+def road(step, index):
+    return "edge%d" % ((step // 10 + index) % 7)
+
+
+def _subscriptionResult(vehID, step, index):
+    body = _string(vehID) + struct.pack("!B", len(VARIABLES))
+    body += struct.pack("!BBBd", tc.VAR_SPEED, tc.RTYPE_OK, tc.TYPE_DOUBLE, speed(step, index))
+    body += struct.pack("!BBB", tc.VAR_ROAD_ID, tc.RTYPE_OK, tc.TYPE_STRING) + _string(road(step, index))
+    return _response(tc.RESPONSE_SUBSCRIBE_VEHICLE_VARIABLE, body)
+
+
+def writeLog(filename, numVehicles, steps):
+    """Writes the log of the session run by drive, with responses made up for it"""
+    recorder = traci.replay.Recorder(filename)
+    subscribe = tc.CMD_SUBSCRIBE_VEHICLE_VARIABLE
+    for index, vehID in enumerate(vehicleIDs(numVehicles)):
+        body = struct.pack("!ii", 0, 2**31 - 1) + _string(vehID)
+        body += struct.pack("!B%sB" % len(VARIABLES), len(VARIABLES), *VARIABLES)
+        recorder.write(traci.aio._command(subscribe, body),
+                       _status(subscribe) + _subscriptionResult(vehID, 0, index))
+
+    get = tc.CMD_GET_SIM_VARIABLE
+    getRequest = traci.aio._command(get, struct.pack("!Bi", tc.VAR_MIN_EXPECTED_VEHICLES, 0))
+    stepRequest = traci.aio._command(tc.CMD_SIMSTEP2, struct.pack("!i", 0))
+    for step in range(steps + 1):
+        expected = numVehicles if step < steps else 0
+        recorder.write(getRequest, _status(get) + _response(
+            get + 0x10, struct.pack("!B", tc.VAR_MIN_EXPECTED_VEHICLES) + _string("") +
+            struct.pack("!Bi", tc.TYPE_INTEGER, expected)))
+        if step < steps:
+            results = b"".join(_subscriptionResult(vehID, step + 1, index)
+                               for index, vehID in enumerate(vehicleIDs(numVehicles)))
+            recorder.write(stepRequest, _status(tc.CMD_SIMSTEP2) + struct.pack("!i", numVehicles) + results)
+
+    recorder.write(traci.aio._command(tc.CMD_CLOSE, b""), _status(tc.CMD_CLOSE))
+    recorder.close()
+
+
+async def drive(port, numVehicles):
+    """Runs the session of the log on one AsyncConnection and returns the step count and whether every
+    subscription result was the one of the log"""
+    conn = await traci.aio.connect(port)
+    ids = vehicleIDs(numVehicles)
+    for vehID in ids:
+        await conn.vehicle.subscribe(vehID, VARIABLES)
+    step = 0
+    correct = True
+    while await conn.simulation.getMinExpectedNumber() > 0:
+        await conn.simulationStep()
+        step += 1
+        for index, vehID in enumerate(ids):
+            results = conn.vehicle.getSubscriptionResults(vehID)
+            correct = correct and results[tc.VAR_SPEED] == speed(step, index) and \
+                results[tc.VAR_ROAD_ID] == road(step, index).encode("latin-1")
+    await conn.close()
+    return step, correct
+
+
+async def driveAll(ports, numVehicles):
+    return await asyncio.gather(*[drive(port, numVehicles) for port in ports])
+
+
+def run(log, options, concurrent):
+    """Serves the log to options.connections clients and returns the wall time and the step times of all servers"""
+    servers = [traci.replay.ReplayServer(log) for i in range(options.connections)]
+    for server in servers:
+        server.start()
+    loop = asyncio.new_event_loop()
+    start = time.time()
+    if concurrent:
+        outcomes = loop.run_until_complete(driveAll([server.port for server in servers], options.vehicles))
+    else:
+        outcomes = [loop.run_until_complete(drive(server.port, options.vehicles)) for server in servers]
+    wall = time.time() - start
+    loop.close()
+    for server in servers:
+        server.join()
+        if server.error:
+            sys.exit(server.error)
+    for steps, correct in outcomes:
+        if steps != options.steps or not correct:
+            sys.exit("A client did not decode the responses of the log (%s steps)." % steps)
+    return wall, sorted(t for server in servers for t in server.stepTimes)
+
+
+def main():
+    optParser = OptionParser()
+    optParser.add_option("-c", "--connections", type="int", default=10,
+                         help="number of simulations driven at once")
+    optParser.add_option("-v", "--vehicles", type="int", default=100,
+                         help="subscribed vehicles per simulation")
+    optParser.add_option("-s", "--steps", type="int", default=200,
+                         help="simulation steps per simulation")
+    (options, args) = optParser.parse_args()
+
+    handle, log = tempfile.mkstemp(suffix=".log")
+    os.close(handle)
+    try:
+        writeLog(log, options.vehicles, options.steps)
+        print("%d simulations, %d vehicles, %d steps" % (options.connections, options.vehicles, options.steps))
+        for name, concurrent in (("concurrent", True), ("one by one", False)):
+            wall, times = run(log, options, concurrent)
+            print("  %-12s total %.3f s  step mean %.3f ms  median %.3f ms" % (
+                name, wall, 1e3 * sum(times) / len(times), 1e3 * times[len(times) // 2]))
+    finally:
+        os.remove(log)
+
+
+if __name__ == "__main__":
+    main()
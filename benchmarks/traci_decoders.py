@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@file    traci_decoders.py
+@date    2016-01-25
+
+Micro-benchmark for the decoders of the compound TraCI values.
+
+The payloads are laid out byte for byte like the values SUMO sends for
+vehicle.getBestLanes, vehicle.getLeader, lane.getLinks and
+trafficlights.getControlledLinks (the part behind the response header).
+Each is decoded with the single pass decoder of the traci module and with
+the previous field by field decoder, which is kept below for comparison.
+"""
+from __future__ import print_function, division
+import os
+import sys
+import struct
+import timeit
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import traci
+import traci.constants as tc
+
+
+def legacyReadBestLanes(result):
+    result.read("!iB")
+    nbLanes = result.read("!i")[0]  # Length
+    lanes = []
+    for i in range(nbLanes):
+        result.read("!B")
+        laneID = result.readString()
+        length, occupation, offset = result.read("!BdBdBb")[1::2]
+        allowsContinuation = result.read("!BB")[1]
+        nextLanesNo = result.read("!Bi")[1]
+        nextLanes = []
+        for j in range(nextLanesNo):
+            nextLanes.append(result.readString())
+        lanes.append(
+            [laneID, length, occupation, offset, allowsContinuation, nextLanes])
+    return lanes
+
+
+def legacyReadLeader(result):
+    result.read("!iB")
+    vehicleID = result.readString()
+    result.read("!B")
+    dist = result.readDouble()
+    if vehicleID:
+        return vehicleID, dist
+    return None
+
+
+def legacyReadLaneLinks(result):
+    # the flags used to be bool(result.read("!B")), which is always True,
+    # they are compared by value here
+    result.read("!Bi")  # Type Compound, Length
+    nbLinks = result.readInt()
+    links = []
+    for i in range(nbLinks):
+        result.read("!B")                           # Type String
+        approachedLane = result.readString()
+        result.read("!B")                           # Type String
+        approachedInternal = result.readString()
+        result.read("!B")                           # Type Byte
+        hasPrio = bool(result.read("!B")[0])
+        result.read("!B")                           # Type Byte
+        isOpen = bool(result.read("!B")[0])
+        result.read("!B")                           # Type Byte
+        hasFoe = bool(result.read("!B")[0])
+        result.read("!B")                           # Type String
+        state = result.readString()
+        result.read("!B")                           # Type String
+        direction = result.readString()
+        result.read("!B")                           # Type Float
+        length = result.readDouble()
+        links.append((approachedLane, hasPrio, isOpen, hasFoe,
+                      approachedInternal, state, direction, length))
+    return links
+
+
+def legacyReadTLSLinks(result):
+    result.readLength()
+    nbSignals = result.read("!i")[0]  # Length
+    signals = []
+    for i in range(nbSignals):
+        # Type of Number of Controlled Links
+        result.read("!B")
+        # Number of Controlled Links
+        nbControlledLinks = result.read("!i")[0]
+        controlledLinks = []
+        for j in range(nbControlledLinks):
+            result.read("!B")                       # Type of Link j
+            link = result.readStringList()          # Link j
+            controlledLinks.append(link)
+        signals.append(controlledLinks)
+    return signals
+
+
+def _packString(s):
+    s = s.encode("latin-1") if not isinstance(s, bytes) else s
+    return struct.pack("!i", len(s)) + s
+
+
+def _typedString(s):
+    return struct.pack("!B", tc.TYPE_STRING) + _packString(s)
+
+
+def bestLanesPayload(lanes, nextLanes):
+    parts = [struct.pack("!iBi", 1 + 4 * lanes, tc.TYPE_INTEGER, lanes)]
+    for i in range(lanes):
+        parts.append(_typedString("edge0_%d" % i))
+        parts.append(struct.pack("!BdBdBbBBBi", tc.TYPE_DOUBLE, 250. + i,
+                                 tc.TYPE_DOUBLE, 37.5, tc.TYPE_BYTE, -i,
+                                 tc.TYPE_UBYTE, 1, tc.TYPE_STRINGLIST, nextLanes))
+        parts.extend(_packString("edge%d_%d" % (j + 1, i)) for j in range(nextLanes))
+    return b"".join(parts)
+
+
+def leaderPayload():
+    return struct.pack("!iB", 2, tc.TYPE_STRING) + _packString("veh42") + \
+        struct.pack("!Bd", tc.TYPE_DOUBLE, 12.5)
+
+
+def laneLinksPayload(links):
+    parts = [struct.pack("!Bii", tc.TYPE_COMPOUND, 0, links)]
+    for i in range(links):
+        parts.append(_typedString("out%d_0" % i))
+        parts.append(_typedString(":junction_%d_0" % i))
+        parts.append(struct.pack("!BBBBBB", tc.TYPE_UBYTE, i % 2,
+                                 tc.TYPE_UBYTE, 1, tc.TYPE_UBYTE, 0))
+        parts.append(_typedString("G"))
+        parts.append(_typedString("s"))
+        parts.append(struct.pack("!Bd", tc.TYPE_DOUBLE, 9.3))
+    return b"".join(parts)
+
+
+def tlsLinksPayload(signals, linksPerSignal):
+    parts = [struct.pack("!i", signals)]
+    for i in range(signals):
+        parts.append(struct.pack("!Bi", tc.TYPE_INTEGER, linksPerSignal))
+        for j in range(linksPerSignal):
+            parts.append(struct.pack("!Bi", tc.TYPE_STRINGLIST, 3))
+            parts.extend(_packString(s % (i, j)) for s in
+                         ("in%d_%d", "out%d_%d", ":via%d_%d"))
+    payload = b"".join(parts)
+    return struct.pack("!Bi", 0, len(payload) + 5) + payload
+
+
+def run(name, legacy, decoder, payload, repeat, number):
+    if [tuple(d) if isinstance(d, list) else d for d in legacy(traci.Storage(payload))] != \
+            [tuple(d) if isinstance(d, list) else d for d in decoder(traci.Storage(payload))]:
+        sys.exit("%s is decoded differently" % name)
+    timings = []
+    for function in (legacy, decoder):
+        best = min(timeit.repeat(lambda: function(traci.Storage(payload)),
+                                 repeat=repeat, number=number)) / number
+        timings.append(best)
+    print("%-40s %7d bytes  legacy %8.2f us  single pass %8.2f us  speedup %5.2fx" % (
+        name, len(payload), timings[0] * 1e6, timings[1] * 1e6, timings[0] / timings[1]))
+
+
+def main():
+    optParser = OptionParser()
+    optParser.add_option("-l", "--lanes", type="int", default=3,
+                         help="number of best lanes (and lane links)")
+    optParser.add_option("-e", "--edges", type="int", default=8,
+                         help="number of next lanes per best lane")
+    optParser.add_option("-r", "--repeat", type="int", default=5,
+                         help="number of timing repetitions (the best is reported)")
+    optParser.add_option("-n", "--number", type="int", default=20000,
+                         help="number of decodes per repetition")
+    (options, args) = optParser.parse_args()
+
+    run("vehicle.getBestLanes (%dx%d)" % (options.lanes, options.edges),
+        legacyReadBestLanes, traci.vehicle._readBestLanes,
+        bestLanesPayload(options.lanes, options.edges), options.repeat, options.number)
+    run("vehicle.getLeader", lambda result: [legacyReadLeader(result)],
+        lambda result: [traci.vehicle._readLeader(result)],
+        leaderPayload(), options.repeat, options.number)
+    run("lane.getLinks (%d)" % options.lanes, legacyReadLaneLinks, traci.lane._readLinks,
+        laneLinksPayload(options.lanes), options.repeat, options.number)
+    run("trafficlights.getControlledLinks (4x%d)" % options.lanes,
+        legacyReadTLSLinks, traci.trafficlights._readLinks,
+        tlsLinksPayload(4, options.lanes), options.repeat, options.number // 4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@file    traci_recv.py
+@date    2016-01-19
+
+Throughput benchmark for receiving TraCI responses.
+
+A thread on one end of a local socketpair stands in for SUMO and writes
+length-prefixed responses of 1 KB up to 10 MB in chunks, as large context
+subscription responses arrive from the network. The other end receives them
+with traci._recvExact and with the previous string concatenating loop, which
+is kept below as legacyRecvExact for comparison.
+"""
+from __future__ import print_function, division
+import os
+import sys
+import socket
+import struct
+import threading
+import time
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import traci
+
+SIZES = [1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20]
+
+
+def legacyRecvExact():
+    """traci._recvExact as it was before it received into a bytearray"""
+    try:
+        result = b""
+        while len(result) < 4:
+            t = traci._connections[""]._socket.recv(4 - len(result))
+            if not t:
+                return None
+            result += t
+        length = struct.unpack("!i", result)[0] - 4
+        result = b""
+        while len(result) < length:
+            t = traci._connections[""]._socket.recv(length - len(result))
+            if not t:
+                return None
+            result += t
+        return traci.Storage(result)
+    except socket.error:
+        return None
+
+
+def serve(sock, message, count, chunk):
+    for i in range(count):
+        for start in range(0, len(message), chunk):
+            sock.sendall(message[start:start + chunk])
+
+
+def measure(recv, size, count, chunk):
+    server, client = socket.socketpair()
+    message = struct.pack("!i", size + 4) + b"\x01" * size
+    sender = threading.Thread(target=serve, args=(server, message, count, chunk))
+    traci._connections[""] = traci.Connection(client)
+    sender.start()
+    start = time.time()
+    for i in range(count):
+        result = recv()
+        if result is None or len(result._view) != size:
+            sys.exit("lost the connection while receiving %s bytes" % size)
+    elapsed = time.time() - start
+    sender.join()
+    del traci._connections[""]
+    server.close()
+    client.close()
+    return elapsed / count
+
+
+def main():
+    optParser = OptionParser()
+    optParser.add_option("-b", "--bytes", default=50 << 20, type="int",
+                         help="number of bytes to transfer per response size and receiver")
+    optParser.add_option("-c", "--chunk", default=64 << 10, type="int",
+                         help="number of bytes the stand-in server writes at once")
+    (options, args) = optParser.parse_args()
+
+    for size in SIZES:
+        count = max(3, options.bytes // size)
+        timings = [measure(recv, size, count, options.chunk)
+                   for recv in (legacyRecvExact, traci._recvExact)]
+        print("%9d bytes  legacy %8.1f MB/s  recv_into %8.1f MB/s  speedup %5.2fx" % (
+            size, size / timings[0] / 1e6, size / timings[1] / 1e6, timings[0] / timings[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@file    traci_replay.py
+@date    2016-01-27
+
+Serves a recorded TraCI session (see traci.replay) on a local port and
+reports how long the connecting client spent per simulation step.
+
+Record a run once against SUMO with traci.startRecording(log) right after
+traci.init, then start this script with the log and point the same client
+at the printed port instead of SUMO. Since the answers come from the log
+the step times only contain the work done on the Python side.
+"""
+from __future__ import print_function, division
+import os
+import sys
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import traci.replay
+
+
+def main():
+    optParser = OptionParser(usage="usage: %prog [options] <log>")
+    optParser.add_option("-p", "--port", type="int", default=8813,
+                         help="port to wait for the client on")
+    optParser.add_option("-l", "--loose", action="store_true", default=False,
+                         help="do not check the requests against the log")
+    (options, args) = optParser.parse_args()
+    if len(args) != 1:
+        optParser.error("a single log file is needed")
+
+    server = traci.replay.ReplayServer(args[0], options.port, strict=not options.loose)
+    server.start()
+    print("replaying %s on port %s" % (args[0], server.port))
+    while server.is_alive():
+        server.join(1)
+    if server.error:
+        sys.exit(server.error)
+    times = sorted(server.stepTimes)
+    if times:
+        print("%d steps  mean %.3f ms  median %.3f ms  max %.3f ms  total %.3f s" % (
+            len(times), 1e3 * sum(times) / len(times), 1e3 * times[len(times) // 2],
+            1e3 * times[-1], sum(times)))
+
+
+if __name__ == "__main__":
+    main()
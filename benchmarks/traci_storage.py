@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@file    traci_storage.py
+@date    2016-01-18
+
+Micro-benchmark for decoding TraCI responses with traci.Storage.
+
+The payloads are laid out byte for byte like the responses SUMO sends for
+the benchmarked commands (an id list, a shape and a simulation step with
+vehicle variable subscriptions). Every payload is decoded with the current
+traci.Storage and with the previous slicing implementation, which is kept
+below as LegacyStorage for comparison.
+"""
+from __future__ import print_function, division
+import os
+import sys
+import struct
+import timeit
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import traci
+import traci.constants as tc
+
+
+class LegacyStorage:
+
+    """traci.Storage as it was before it read through a memoryview"""
+
+    def __init__(self, content):
+        self._content = content
+        self._pos = 0
+
+    def read(self, format):
+        oldPos = self._pos
+        self._pos += struct.calcsize(format)
+        return struct.unpack(format, self._content[oldPos:self._pos])
+
+    def readInt(self):
+        return self.read("!i")[0]
+
+    def readDouble(self):
+        return self.read("!d")[0]
+
+    def readLength(self):
+        length = self.read("!B")[0]
+        if length > 0:
+            return length
+        return self.read("!i")[0]
+
+    def readString(self):
+        length = self.read("!i")[0]
+        return self.read("!%ss" % length)[0]
+
+    def readStringList(self):
+        n = self.read("!i")[0]
+        list = []
+        for i in range(n):
+            list.append(self.readString())
+        return list
+
+    def readShape(self):
+        length = self.read("!B")[0]
+        return [self.read("!dd") for i in range(length)]
+
+
+def _packString(s):
+    s = s.encode("latin-1") if not isinstance(s, bytes) else s
+    return struct.pack("!i", len(s)) + s
+
+
+def idListPayload(count):
+    ids = ["veh%d" % i for i in range(count)]
+    return struct.pack("!i", count) + b"".join(_packString(i) for i in ids)
+
+
+def shapePayload(points):
+    payload = struct.pack("!B", points)
+    for i in range(points):
+        payload += struct.pack("!dd", i * 10., i * 0.5)
+    return payload
+
+
+def stepPayload(vehicles):
+    """Subscription part of a simulation step response, subscribing to
+    speed, position and road id of every vehicle"""
+    parts = [struct.pack("!i", vehicles)]
+    for i in range(vehicles):
+        body = struct.pack("!B", tc.RESPONSE_SUBSCRIBE_VEHICLE_VARIABLE)
+        body += _packString("veh%d" % i)
+        body += struct.pack("!B", 3)
+        body += struct.pack("!BBBd", tc.VAR_SPEED, 0, tc.TYPE_DOUBLE, 13.9)
+        body += struct.pack("!BBBdd", tc.VAR_POSITION, 0, tc.POSITION_2D,
+                            100. + i, 200.)
+        body += struct.pack("!BBB", tc.VAR_ROAD_ID, 0, tc.TYPE_STRING)
+        body += _packString("edge%d" % (i % 500))
+        parts.append(struct.pack("!Bi", 0, len(body) + 5) + body)
+    return b"".join(parts)
+
+
+def decodeIdList(storage):
+    return storage.readStringList()
+
+
+def decodeShape(storage):
+    return storage.readShape()
+
+
+def decodeStep(storage):
+    """Walks the step response the same way traci._readSubscription does"""
+    results = {}
+    for i in range(storage.readInt()):
+        storage.readLength()
+        storage.read("!B")
+        objectID = storage.readString()
+        values = results[objectID] = {}
+        for v in range(storage.read("!B")[0]):
+            varID = storage.read("!B")[0]
+            storage.read("!BB")
+            if varID == tc.VAR_SPEED:
+                values[varID] = storage.readDouble()
+            elif varID == tc.VAR_POSITION:
+                values[varID] = storage.read("!dd")
+            else:
+                values[varID] = storage.readString()
+    return results
+
+
+def run(name, decoder, payload, repeat, number):
+    for storageClass in (LegacyStorage, traci.Storage):
+        if decoder(storageClass(payload)) != decoder(traci.Storage(payload)):
+            sys.exit("%s decodes %s differently" % (storageClass.__name__, name))
+    timings = []
+    for storageClass in (LegacyStorage, traci.Storage):
+        best = min(timeit.repeat(lambda: decoder(storageClass(payload)),
+                                 repeat=repeat, number=number)) / number
+        timings.append(best)
+    print("%-28s %9d bytes  legacy %9.1f us  memoryview %9.1f us  speedup %5.2fx" % (
+        name, len(payload), timings[0] * 1e6, timings[1] * 1e6, timings[0] / timings[1]))
+
+
+def main():
+    optParser = OptionParser()
+    optParser.add_option("-v", "--vehicles", type="int", default=20000,
+                         help="number of vehicles in the id list and step payloads")
+    optParser.add_option("-r", "--repeat", type="int", default=5,
+                         help="number of timing repetitions (the best is reported)")
+    optParser.add_option("-n", "--number", type="int", default=10,
+                         help="number of decodes per repetition")
+    (options, args) = optParser.parse_args()
+
+    run("id list (%d ids)" % options.vehicles, decodeIdList,
+        idListPayload(options.vehicles), options.repeat, options.number)
+    run("shape (255 points)", decodeShape, shapePayload(255),
+        options.repeat, options.number * 100)
+    run("step (%d subscriptions)" % options.vehicles, decodeStep,
+        stepPayload(options.vehicles), options.repeat, max(1, options.number // 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -229,10 +229,10 @@ def addInductionLoops2AdditionalFile(additionalFile_filepath, inductionLoops_fil
             
     ADDFILE.close()
     
-def genShortestPathsObject(netFile_filepath, shortestPathsObj_filepath):
+def genShortestPathsObject(netFile_filepath, shortestPathsObj_filepath, processes=None):
     
-    shortestPathsObj = shortestPaths.shortestPathsClass(netFile_filepath)
-    pickleFunc.save_obj(shortestPathsObj, shortestPathsObj_filepath)
+    # Found over a pool of processes, one per CPU if processes is None, and saved as shortestPathsObj_filepath
+    shortestPaths.shortestPathsClass(netFile_filepath, shortestPathsObj_filepath, processes)
 
 def addVehTypesToTrips(tripsFolder_path, vType="HumanStandard"):
         
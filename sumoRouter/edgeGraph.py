@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+@file    edgeGraph.py
+@date    01/02/2016
+
+Integer indexed graph of a sumolib net in compressed sparse rows (CSR) and a binary heap Dijkstra over it. The graph is
+built once per net (see getEdgeGraph), after that a search from one edge costs O(E log E) instead of rebuilding the
+adjacency dict and sorting all the unvisited edges at every step
+
+"""
+from __future__ import division
+import heapq
+import numpy as np
+
+
+def heapDijkstra(indptr, targets, weights, start, end=None):
+    """ Dijkstra from vertex start over a graph in compressed sparse rows: the arcs leaving vertex v go to
+    targets[indptr[v]:indptr[v+1]] at the cost weights[indptr[v]:indptr[v+1]] (plain lists are the fastest to index).
+    Returns the cost of each vertex (inf if not visited) and the vertex it was reached from (-1 for the start and for
+    vertices never reached). As in the dict based searches this replaces, vertices only reachable over infinite
+    weights are visited with cost inf and keep the vertex they were first reached from. Stops once end is visited """
+    inf = float("inf")
+    numVertices = len(indptr) - 1
+    tentative = [None] * numVertices
+    visited = [False] * numVertices
+    via = [-1] * numVertices
+
+    tentative[start] = 0
+    heap = [(0, start)]
+    while heap:
+        cost, current = heapq.heappop(heap)
+        if visited[current]: continue
+        visited[current] = True
+        if current == end: break
+        for arc in range(indptr[current], indptr[current + 1]):
+            target = targets[arc]
+            if visited[target]: continue
+            newCost = cost + weights[arc]
+            if tentative[target] is None or tentative[target] > newCost:
+                tentative[target] = newCost
+                via[target] = current
+                heapq.heappush(heap, (newCost, target))
+
+    costs = [tentative[vertex] if visited[vertex] else inf for vertex in range(numVertices)]
+    return costs, via
+
+
+def heapAStar(indptr, targets, weights, start, end, bounds):
+    """ A* from vertex start to vertex end over a graph in compressed sparse rows (as heapDijkstra). bounds[v] is a
+    consistent lower bound of the cost from vertex v to end, inf if v cannot reach end (such vertices are not
+    searched). Returns the cost of the shortest path (inf if there is none) and a dict of the vertex each vertex
+    reached was reached from (-1 for the start). Only the vertices reached are kept, not a list over the graph """
+    inf = float("inf")
+    tentative = {start: 0}
+    via = {start: -1}
+    closed = set()
+
+    if bounds[start] == inf:
+        return inf, via
+    heap = [(bounds[start], 0, start)]
+    while heap:
+        estimate, cost, current = heapq.heappop(heap)
+        if current in closed: continue
+        if current == end: return cost, via
+        closed.add(current)
+        for arc in range(indptr[current], indptr[current + 1]):
+            target = targets[arc]
+            if target in closed: continue
+            newCost = cost + weights[arc]
+            if target not in tentative or tentative[target] > newCost:
+                bound = bounds[target]
+                if bound == inf: continue
+                tentative[target] = newCost
+                via[target] = current
+                heapq.heappush(heap, (newCost + bound, newCost, target))
+    return inf, via
+
+
+class edgeGraph:
+
+    """ The edges of a sumolib net (with the edge weights loaded, see shortestPaths.addEdgeWeights2Net) numbered in the
+    order of net.getEdges(), in two graphs:
+        edge graph: a vertex per edge, an arc to each outgoing edge costing the travel time of the edge it leaves
+        node graph: a vertex per node, an arc per edge costing the travel time of the edge """
+
+    def __init__(self, net):
+        edges = net.getEdges()
+        self._edgeIDs = [str(edge.getID()) for edge in edges]
+        self._edgeIndex = dict((edge_id, index) for index, edge_id in enumerate(self._edgeIDs))
+        self._edgeCosts = np.array([edge.cost for edge in edges], dtype=float)
+
+        indptr = [0]
+        targets = []
+        for edge in edges:
+            for outgoing_edge in edge.getOutgoing():
+                targets.append(self._edgeIndex[str(outgoing_edge.getID())])
+            indptr.append(len(targets))
+        self._indptr = np.array(indptr, dtype=np.int32)
+        self._targets = np.array(targets, dtype=np.int32)
+        # edge each arc leaves, the arc costs the travel time of this edge
+        self._arcEdges = np.repeat(np.arange(len(edges), dtype=np.int32), np.diff(self._indptr))
+
+        self._edges = edges
+        self._nodes = net.getNodes()
+        self._nodeIndex = dict((node, index) for index, node in enumerate(self._nodes))
+        nodeIndptr = [0]
+        nodeTargets = []
+        nodeArcEdges = []
+        for node in self._nodes:
+            for outgoing_edge in node.getOutgoing():
+                nodeTargets.append(self._nodeIndex[outgoing_edge.getToNode()])
+                nodeArcEdges.append(self._edgeIndex[str(outgoing_edge.getID())])
+            nodeIndptr.append(len(nodeTargets))
+        self._nodeIndptr = np.array(nodeIndptr, dtype=np.int32)
+        self._nodeTargets = np.array(nodeTargets, dtype=np.int32)
+        self._nodeArcEdges = np.array(nodeArcEdges, dtype=np.int32)
+        self._edgeFromNodes = np.array([self._nodeIndex[edge.getFromNode()] for edge in edges], dtype=np.int32)
+        self._edgeToNodes = np.array([self._nodeIndex[edge.getToNode()] for edge in edges], dtype=np.int32)
+
+        # lists for the inner loop of heapDijkstra
+        self._indptrList = indptr
+        self._targetsList = targets
+        self._weightsList = self._edgeCosts[self._arcEdges].tolist()
+        self._nodeIndptrList = nodeIndptr
+        self._nodeTargetsList = nodeTargets
+        self._nodeArcEdgesList = nodeArcEdges
+        self._nodeWeightsList = self._edgeCosts[self._nodeArcEdges].tolist()
+
+    def __repr__(self):
+        return "Edge Graph (%d edges, %d connections)" % (len(self._edgeIDs), len(self._targets))
+
+    def getNumEdges(self):
+        return len(self._edgeIDs)
+
+    def getEdgeIDs(self):
+        return self._edgeIDs
+
+    def getEdgeID(self, index):
+        return self._edgeIDs[index]
+
+    def getEdge(self, index):
+        return self._edges[index]
+
+    def getEdgeIndex(self, edge_id):
+        return self._edgeIndex[str(edge_id)]
+
+    def getEdgeCosts(self):
+        return self._edgeCosts
+
+    def getCSR(self):
+        """ indptr, targets and the edge each arc leaves, of the edge graph """
+        return self._indptr, self._targets, self._arcEdges
+
+    def getNodes(self):
+        return self._nodes
+
+    def getNodeIndex(self, node):
+        return self._nodeIndex[node]
+
+    def getEdgeNodes(self):
+        """ Index of the node each edge leaves from and of the node it leads to """
+        return self._edgeFromNodes, self._edgeToNodes
+
+    def edgeMask(self, edges):
+        """ Boolean array marking the given edges (sumolib edges or edge ids) """
+        mask = np.zeros(len(self._edgeIDs), dtype=bool)
+        for edge in edges:
+            mask[self.getEdgeIndex(edge.getID() if hasattr(edge, "getID") else edge)] = True
+        return mask
+
+    def _maskedWeights(self, arcEdges, notVia):
+        """ Arc costs with the arcs over the notVia edges (edges, edge ids or a mask) set to inf """
+        if not isinstance(notVia, np.ndarray):
+            notVia = self.edgeMask(notVia)
+        return np.where(notVia[arcEdges], np.inf, self._edgeCosts[arcEdges]).tolist()
+
+    def shortestPathsFromEdge(self, start, notVia=None, end=None):
+        """ Costs of the shortest paths from edge index start to every edge and the edge each is reached from (-1 if
+        none). Paths do not leave the notVia edges (their outgoing connections cost inf). Stops at edge index end """
+        weights = self._weightsList
+        if notVia is not None and len(notVia):
+            weights = self._maskedWeights(self._arcEdges, notVia)
+        return heapDijkstra(self._indptrList, self._targetsList, weights, start, end)
+
+    def shortestPathsFromNode(self, start, notVia=None):
+        """ Costs of the shortest paths from node index start to every node, the node each is reached from and the edge
+        it is reached over (-1 if none). Paths do not use the notVia edges (they cost inf) """
+        weights = self._nodeWeightsList
+        if notVia is not None and len(notVia):
+            weights = self._maskedWeights(self._nodeArcEdges, notVia)
+        costs, via = heapDijkstra(self._nodeIndptrList, self._nodeTargetsList, weights, start)
+
+        # the edge the node was reached over is the cheapest one from the node it was reached from
+        viaEdges = [-1] * len(via)
+        for node, fromNode in enumerate(via):
+            if fromNode >= 0:
+                bestCost = None
+                for arc in range(self._nodeIndptrList[fromNode], self._nodeIndptrList[fromNode + 1]):
+                    if self._nodeTargetsList[arc] == node and (bestCost is None or weights[arc] < bestCost):
+                        bestCost = weights[arc]
+                        viaEdges[node] = self._nodeArcEdgesList[arc]
+        return costs, via, viaEdges
+
+
+def getEdgeGraph(net):
+    """ The edgeGraph of the net, built on the first call and kept on the net object. Reloading the edge weights
+    (addEdgeWeights2Net.load_weights) drops it """
+    graph = getattr(net, "_edgeGraph", None)
+    if graph is None:
+        graph = edgeGraph(net)
+        net._edgeGraph = graph
+    return graph
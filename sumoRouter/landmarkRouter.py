@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+@file    landmarkRouter.py
+@date    05/02/2016
+
+Point to point shortest paths found when they are asked for, for nets too large for the all pairs tables of
+shortestPaths. The search is A* with landmark bounds (ALT): the costs from and to a few landmark edges are found once,
+by the triangle inequality they give a lower bound of the cost between any two edges. Recent results are kept in a
+bounded least recently used cache, as the routers ask for the cost and then the path of the same pair
+
+"""
+from __future__ import division
+from array import array
+from collections import OrderedDict
+import numpy as np
+from tools.sumolib.net import readNet
+from sumoRouter.edgeGraph import getEdgeGraph, heapDijkstra, heapAStar
+from sumoRouter.shortestPaths import addEdgeWeights2Net
+
+
+class landmarkShortestPaths:
+
+    """ Shortest paths between edges, as shortestPathsClass (same costs and the same getPath, getPathCost,
+    getMaxPathCost and getMaxElementCost) so it can be given to vehicleRouter.createRouterObject in its place.
+    getMaxPathCost needs a search from every edge, once (only the costs of one search are kept at a time). A value
+    known from before, e.g. the getMaxPathCost of a stored shortestPathsClass of the net, can be given as
+    max_path_cost instead """
+
+    def __init__(self, net_filepath, num_landmarks=8, cache_size=10000, bounds_cache_size=100, max_path_cost=None):
+        net = readNet(net_filepath)
+        netWithEdgeWeights = addEdgeWeights2Net(net)
+        net = netWithEdgeWeights.getNet()
+        graph = getEdgeGraph(net)
+
+        # only the lists the searches use are kept, not the net
+        self._edgeIDs = graph.getEdgeIDs()
+        self._edgeIndex = dict((edge_id, index) for index, edge_id in enumerate(self._edgeIDs))
+        indptr, targets, arc_edges = graph.getCSR()
+        weights = graph.getEdgeCosts()[arc_edges]
+        self._indptr = indptr.tolist()
+        self._targets = targets.tolist()
+        self._weights = weights.tolist()
+
+        # the graph with the arcs turned round, searching it from an edge gives the costs to that edge
+        order = np.argsort(targets, kind='mergesort')
+        in_degrees = np.bincount(targets, minlength=len(self._edgeIDs))
+        self._reverseIndptr = np.concatenate([[0], np.cumsum(in_degrees)]).astype(int).tolist()
+        self._reverseTargets = arc_edges[order].tolist()
+        self._reverseWeights = weights[order].tolist()
+
+        self._landmarks, self._fromLandmarks, self._toLandmarks = self.findLandmarks(num_landmarks)
+
+        self._cacheSize = cache_size
+        self._cache = OrderedDict()
+        self._boundsCacheSize = bounds_cache_size
+        self._boundsCache = OrderedDict()
+
+        self._maxPathCost = self.findMaxPathCost() if max_path_cost is None else max_path_cost
+        self._maxElementCost = self.findMaxElementCost(net)
+
+    def __repr__(self):
+        return "Landmark Shortest Paths (%d edges, %d landmarks, %d cached)" % (len(self._edgeIDs),
+                                                                               len(self._landmarks), len(self._cache))
+
+    def findLandmarks(self, num_landmarks):
+        """ Picks the landmarks one at a time, each the edge furthest (costs there and back) from the ones picked
+        before, starting from the edge furthest from the first edge. Returns the landmarks and arrays of the costs
+        from and to each of them, [landmark, edge] """
+        num_edges = len(self._edgeIDs)
+        landmarks = []
+        from_landmarks = []
+        to_landmarks = []
+        if not num_edges:
+            return landmarks, np.zeros([0, 0]), np.zeros([0, 0])
+
+        # edges which cannot be reached either way do not count as far
+        costs = np.array(heapDijkstra(self._indptr, self._targets, self._weights, 0)[0])
+        distance = np.where(np.isfinite(costs), costs, 0)
+        for landmark_number in range(min(num_landmarks, num_edges)):
+            landmark = int(np.argmax(distance))
+            landmarks.append(landmark)
+            from_landmarks.append(heapDijkstra(self._indptr, self._targets, self._weights, landmark)[0])
+            to_landmarks.append(heapDijkstra(self._reverseIndptr, self._reverseTargets, self._reverseWeights,
+                                             landmark)[0])
+            round_trip = np.array(from_landmarks[-1]) + np.array(to_landmarks[-1])
+            round_trip = np.where(np.isfinite(round_trip), round_trip, 0)
+            distance = round_trip if landmark_number == 0 else np.minimum(distance, round_trip)
+
+        return landmarks, np.array(from_landmarks), np.array(to_landmarks)
+
+    def getLandmarks(self):
+        return [self._edgeIDs[landmark] for landmark in self._landmarks]
+
+    def lowerBounds(self, end):
+        """ Lower bound of the cost from every edge to the edge numbered end: by the triangle inequality
+        cost(v, end) >= cost(L, end) - cost(L, v) and cost(v, end) >= cost(v, L) - cost(end, L) for each landmark L.
+        The bound is inf for edges which cannot reach end. inf - inf gives nan, fmax ignores it. The bounds of the last
+        bounds_cache_size ends are kept, as the routers ask for the paths from many edges to the destination of each
+        vehicle, so the O(landmarks * edges) work is only done for a new destination """
+        try:
+            bounds = self._boundsCache.pop(end)
+        except KeyError:
+            bounds = np.zeros(len(self._edgeIDs))
+            if len(self._landmarks):
+                with np.errstate(invalid='ignore'):
+                    bounds = np.fmax(bounds, np.fmax.reduce(self._fromLandmarks[:, [end]] - self._fromLandmarks,
+                                                            axis=0))
+                    bounds = np.fmax(bounds, np.fmax.reduce(self._toLandmarks - self._toLandmarks[:, [end]], axis=0))
+            # an array of doubles is as fast to index in heapAStar as a list and takes 8 bytes per edge
+            bounds = array('d', bounds.tobytes())
+        if self._boundsCacheSize > 0:
+            if len(self._boundsCache) >= self._boundsCacheSize:
+                self._boundsCache.popitem(last=False)
+            self._boundsCache[end] = bounds
+        return bounds
+
+    def findPath(self, start, end):
+        """ Cost and edge ids of the shortest path between two edge ids. The path to an edge which cannot be reached
+        is the edge alone, with cost inf """
+        start_index = self._edgeIndex[str(start)]
+        end_index = self._edgeIndex[str(end)]
+        cost, via = heapAStar(self._indptr, self._targets, self._weights, start_index, end_index,
+                              self.lowerBounds(end_index))
+        if cost == float("inf"):
+            return cost, (self._edgeIDs[end_index],)
+
+        path = []
+        current = end_index
+        while current != -1:
+            path.append(self._edgeIDs[current])
+            current = via[current]
+        path.reverse()
+        return cost, tuple(path)
+
+    def cachedPath(self, start, end):
+        key = (str(start), str(end))
+        try:
+            result = self._cache.pop(key)
+        except KeyError:
+            result = self.findPath(start, end)
+        if self._cacheSize > 0:
+            if len(self._cache) >= self._cacheSize:
+                self._cache.popitem(last=False)
+            self._cache[key] = result
+        return result
+
+    def getPathCost(self, start, end):
+        """ return cost of the shortest path (in travel time) """
+        return self.cachedPath(start, end)[0]
+
+    def getPath(self, start, end):
+        """ return shortest path """
+        return list(self.cachedPath(start, end)[1])
+
+    def findMaxPathCost(self):
+        """ The largest cost of a shortest path between two edges, as shortestPathsClass gives it: inf if some pair has
+        no path, which is the case if a landmark cannot reach an edge or be reached from one. Otherwise the cost of
+        every pair is looked at, by a search from every edge """
+        if len(self._landmarks) and not (np.isfinite(self._fromLandmarks).all() and
+                                         np.isfinite(self._toLandmarks).all()):
+            return float("inf")
+        maxCost = 0
+        for start in range(len(self._edgeIDs)):
+            maxCost = max(maxCost, max(heapDijkstra(self._indptr, self._targets, self._weights, start)[0]))
+            if maxCost == float("inf"):
+                break
+        return maxCost
+
+    def findMaxElementCost(self, net):
+        maxCost = 0
+        for edge in net.getEdges():
+            if edge.cost > maxCost : maxCost = edge.cost
+        return maxCost
+
+    def getMaxPathCost(self):
+        return self._maxPathCost
+
+    def getMaxElementCost(self):
+        return self._maxElementCost
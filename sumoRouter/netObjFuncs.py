@@ -8,80 +8,47 @@ Functions which take the juncObj and edgeObj classes defined in the ApiExtension
 
 """
 from __future__ import print_function
+from sumoRouter.edgeGraph import heapDijkstra
 
-def findShortestDistance(juncContainer, edgeContainer, start):
-    
-    #  Thanks to Hyperboreus @ stackoverflow.com for this Dijsktra implementation
-  
-    nodes = juncContainer.container
-    unvisited = {node: None for node in nodes}
-    visited = {node: float("inf") for node in nodes}
-    current = start
-    currentDistance = 0
-    unvisited[current] = currentDistance
-    
-    distances = {}
-    
-    for junc in juncContainer.container:
-        distances.update({junc:{}})
-        for child in juncContainer.container[junc].children:
-            distance_to_child = edgeContainer.container[juncContainer.container[junc].children[child]].length
-            distances[junc].update({ child : distance_to_child})
-    
-    via = {node: None for node in nodes}
-    
-    while True:
-        for neighbour, distance in distances[current].items():
-            if neighbour not in unvisited: continue
-            newDistance = currentDistance + distance
-            if unvisited[neighbour] is None or unvisited[neighbour] > newDistance:
-                unvisited[neighbour] = newDistance
-                via.update({neighbour:current})
-        visited[current] = currentDistance
-        del unvisited[current]
-        if not unvisited: break
-        candidates = [node for node in unvisited.items() if node[1]]
-        if not candidates: break
-        current, currentDistance = sorted(candidates, key = lambda x: x[1])[0]
+def juncGraph(juncContainer, edgeContainer, cost_attribute):
+    """ The junctions of the container in compressed sparse rows (see edgeGraph.heapDijkstra), each connection to a
+    child costing the cost_attribute ('length' or 'minTravelTime') of the edge leading to it. Returns the junctions,
+    a dict of their indices, indptr, targets and weights """
+    nodes = list(juncContainer.container)
+    nodeIndex = dict((node, index) for index, node in enumerate(nodes))
+    indptr = [0]
+    targets = []
+    weights = []
+    for junc in nodes:
+        children = juncContainer.container[junc].children
+        for child in children:
+            if child not in nodeIndex: continue
+            targets.append(nodeIndex[child])
+            weights.append(getattr(edgeContainer.container[children[child]], cost_attribute))
+        indptr.append(len(targets))
+    return nodes, nodeIndex, indptr, targets, weights
+
+def findShortestJuncCosts(graph, start):
+    
+    nodes, nodeIndex, indptr, targets, weights = graph
+    costs, via_indices = heapDijkstra(indptr, targets, weights, nodeIndex[start])
+    
+    visited = dict(zip(nodes, costs))
+    via = dict((node, nodes[via_index] if via_index >= 0 else None) for node, via_index in zip(nodes, via_indices))
     
     return visited, via
 
-def findShortestTime(juncContainer, edgeContainer, start):
-    
-    #  Thanks to Hyperboreus @ stackoverflow.com for this Dijsktra implementation
-  
-    nodes = juncContainer.container
-    unvisited = {node: None for node in nodes}
-    visited = {node: float("inf") for node in nodes}
-    current = start
-    currentTime = 0
-    unvisited[current] = currentTime
-    
-    times = {}
-    
-    for junc in juncContainer.container:
-        times.update({junc:{}})
-        for child in juncContainer.container[junc].children:
-            time_to_child = edgeContainer.container[juncContainer.container[junc].children[child]].minTravelTime
-            times[junc].update({ child : time_to_child})
-    
-    via = {node: None for node in nodes}
-    
-    while True:
-        for neighbour, time in times[current].items():
-            if neighbour not in unvisited: continue
-            newTime = currentTime + time
-            if unvisited[neighbour] is None or unvisited[neighbour] > newTime:
-                unvisited[neighbour] = newTime
-                via.update({neighbour:current})
-        visited[current] = currentTime
-        del unvisited[current]
-        if not unvisited: break
-        candidates = [node for node in unvisited.items() if node[1]]
-        if not candidates: break
-        current, currentTime = sorted(candidates, key = lambda x: x[1])[0]
+def findShortestDistance(juncContainer, edgeContainer, start, graph=None):
+    
+    if graph is None: graph = juncGraph(juncContainer, edgeContainer, 'length')
+    
+    return findShortestJuncCosts(graph, start)
 
-    return visited, via
+def findShortestTime(juncContainer, edgeContainer, start, graph=None):
+    
+    if graph is None: graph = juncGraph(juncContainer, edgeContainer, 'minTravelTime')
+    
+    return findShortestJuncCosts(graph, start)
 
 def findShortestPath(via, start, end):
     
@@ -110,9 +77,12 @@ def genDistanceAndRouteTables(juncContainer, edgeContainer,  print_distance_tabl
     distanceTable = {}
     routeTable = {}
     
+    # The junctions and their connections, built once for all the searches
+    graph = juncGraph(juncContainer, edgeContainer, 'length')
+    
     # For every junction, update the distance table with dictionary of shortest distances to each node
     for start in juncContainer.container:
-        distances, via = findShortestDistance(juncContainer, edgeContainer, start)
+        distances, via = findShortestDistance(juncContainer, edgeContainer, start, graph)
         distanceTable.update({start:distances})
         routeTable.update({start : {}})
         for end in juncContainer.container:
@@ -150,9 +120,12 @@ def genTimeAndRouteTables(juncContainer, edgeContainer, print_time_table = False
     timeTable = {}
     routeTable = {}
     
+    # The junctions and their connections, built once for all the searches
+    graph = juncGraph(juncContainer, edgeContainer, 'minTravelTime')
+    
     # For every junction, update the distance table with dictionary of shortest distances to each node
     for start in juncContainer.container:
-        times, via = findShortestTime(juncContainer, edgeContainer, start)
+        times, via = findShortestTime(juncContainer, edgeContainer, start, graph)
         timeTable.update({start:times})
         routeTable.update({start : {}})
         for end in juncContainer.container:
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+@file    pathStore.py
+@date    03/02/2016
+
+Compact stores for the shortest paths between all pairs of edges. Instead of a list of edge ids per pair they keep a
+float32 cost matrix and an int32 predecessor matrix indexed by edge number, the path of a pair is rebuilt from the
+predecessors when it is asked for. For 5000 edges this is about 200 MB
+
+The stores can be written to a single binary file (savePathStore) which loadPathStore maps into memory instead of
+reading it: loading takes the same time however many paths there are, and runs on the same node share the pages
+
+"""
+from __future__ import division
+import os
+import json
+import struct
+import numpy as np
+
+# Layout of a path store file: PATH_STORE_MAGIC, the version and the length of the header (two little endian uint32),
+# the header (JSON: kind of store, edge ids, attributes and the dtype, shape and offset of every array), then the
+# arrays, each starting on a multiple of PATH_STORE_ALIGNMENT. Offsets are counted from the end of the header rounded
+# up to the alignment. Bump the version when the layout changes
+PATH_STORE_MAGIC = b"PATHSTR\0"
+PATH_STORE_VERSION = 1
+PATH_STORE_ALIGNMENT = 64
+
+
+class pathStore:
+
+    """ Costs of the shortest paths from every edge (rows, numbered as edgeIDs) and the edge ids by number. The
+    predecessors and the way paths are rebuilt from them are up to the subclasses """
+
+    def __init__(self, edgeIDs, numColumns, costs=None, predecessors=None):
+        self._edgeIDs = [str(edge_id) for edge_id in edgeIDs]
+        self._edgeIndex = dict((edge_id, index) for index, edge_id in enumerate(self._edgeIDs))
+        if costs is None:
+            costs = np.full([len(self._edgeIDs), numColumns], np.inf, dtype=np.float32)
+        if predecessors is None:
+            predecessors = np.full([len(self._edgeIDs), numColumns], -1, dtype=np.int32)
+        self._costs = costs
+        self._predecessors = predecessors
+
+    def __repr__(self):
+        return "%s (%d edges, %.1f MB)" % (self.__class__.__name__, len(self._edgeIDs),
+                                           (self._costs.nbytes + self._predecessors.nbytes) / 2**20)
+
+    def getEdgeIDs(self):
+        return self._edgeIDs
+
+    def getEdgeIndex(self, edge_id):
+        return self._edgeIndex[str(edge_id)]
+
+    def getCosts(self):
+        return self._costs
+
+    def getPredecessors(self):
+        return self._predecessors
+
+    def getArrays(self):
+        """ The arrays savePathStore writes, by name """
+        return {'costs': self._costs, 'predecessors': self._predecessors}
+
+    def setRow(self, start, costs, predecessors):
+        """ Stores the search from the edge numbered start """
+        self._costs[start] = costs
+        self._predecessors[start] = predecessors
+
+
+class edgePathStore(pathStore):
+
+    """ Paths found by a search over the edges: the predecessor of an edge is the edge before it on the path from the
+    start edge (-1 for the start edge and edges which cannot be reached). The path to an edge which cannot be reached
+    is the edge alone, with cost inf """
+
+    def __init__(self, edgeIDs, costs=None, predecessors=None):
+        pathStore.__init__(self, edgeIDs, len(edgeIDs), costs, predecessors)
+
+    def getPathCost(self, start, end):
+        """ return cost of the shortest path (in travel time) """
+        return float(self._costs[self._edgeIndex[str(start)], self._edgeIndex[str(end)]])
+
+    def getPath(self, start, end):
+        """ return shortest path """
+        predecessors = self._predecessors[self._edgeIndex[str(start)]]
+        path = []
+        current = self._edgeIndex[str(end)]
+        while current != -1:
+            path.append(self._edgeIDs[current])
+            current = predecessors[current]
+        path.reverse()
+        return path
+
+    def getMaxPathCost(self):
+        return float(self._costs.max()) if self._costs.size else 0
+
+
+class nodePathStore(pathStore):
+
+    """ Paths found by a search over the nodes, from the node the start edge leads to: the predecessor of a node is
+    the edge the path reaches it over (-1 for the start node and nodes which cannot be reached). The path to an edge
+    is the edges into the nodes back from the node the edge leads to, followed by the edge itself """
+
+    def __init__(self, edgeIDs, edgeFromNodes, edgeToNodes, numNodes, costs=None, predecessors=None):
+        pathStore.__init__(self, edgeIDs, numNodes, costs, predecessors)
+        self._edgeFromNodes = np.asarray(edgeFromNodes, dtype=np.int32)
+        self._edgeToNodes = np.asarray(edgeToNodes, dtype=np.int32)
+
+    def getArrays(self):
+        arrays = pathStore.getArrays(self)
+        arrays.update({'edgeFromNodes': self._edgeFromNodes, 'edgeToNodes': self._edgeToNodes})
+        return arrays
+
+    def getPathCost(self, start, end):
+        """ return cost of the shortest path (in travel time) to the node the end edge leads to """
+        return float(self._costs[self._edgeIndex[str(start)], self._edgeToNodes[self._edgeIndex[str(end)]]])
+
+    def getPath(self, start, end):
+        """ return shortest path """
+        via_edges = self._predecessors[self._edgeIndex[str(start)]]
+        path = []
+        current_edge = self._edgeIndex[str(end)]
+        current_node = self._edgeToNodes[current_edge]
+        while current_node != -1:
+            path.append(self._edgeIDs[current_edge])
+            current_edge = via_edges[current_node]
+            current_node = self._edgeFromNodes[current_edge] if current_edge != -1 else -1
+        path.reverse()
+        return path
+
+    def getMaxPathCost(self):
+        if not self._costs.size:
+            return 0
+        return float(self._costs[:, np.unique(self._edgeToNodes)].max())
+
+
+def _aligned(offset):
+    return -(-offset // PATH_STORE_ALIGNMENT) * PATH_STORE_ALIGNMENT
+
+
+def savePathStore(store, filepath, attributes=None, reserve=0):
+    """ Writes the store and a dict of attributes (anything JSON can hold) to filepath. The file is written next to
+    filepath and then moved over it, so a run loading it never sees half a file. reserve bytes are left free after the
+    header for setPathStoreAttributes """
+    arrays = dict((name, np.ascontiguousarray(array, dtype=np.asarray(array).dtype.newbyteorder('<')))
+                  for name, array in store.getArrays().items())
+    specs = {}
+    offset = 0
+    for name in sorted(arrays):
+        specs[name] = {'dtype': arrays[name].dtype.str, 'shape': list(arrays[name].shape), 'offset': offset}
+        offset = _aligned(offset + arrays[name].nbytes)
+    header = json.dumps({'kind': store.__class__.__name__, 'edgeIDs': store.getEdgeIDs(),
+                         'attributes': attributes or {}, 'arrays': specs}).encode('utf-8')
+    # JSON allows trailing white space
+    header += b" " * reserve
+    data_start = _aligned(len(PATH_STORE_MAGIC) + 8 + len(header))
+
+    tmp_filepath = "%s.%d.tmp" % (filepath, os.getpid())
+    with open(tmp_filepath, 'wb') as f:
+        f.write(PATH_STORE_MAGIC)
+        f.write(struct.pack('<II', PATH_STORE_VERSION, len(header)))
+        f.write(header)
+        for name in sorted(arrays):
+            f.seek(data_start + specs[name]['offset'])
+            arrays[name].tofile(f)
+        # pad to the end of the last array so every array can be mapped in full
+        f.truncate(data_start + offset)
+    os.rename(tmp_filepath, filepath)
+
+
+def readPathStoreHeader(filepath):
+    """ The header of a path store file and the position its arrays are counted from """
+    with open(filepath, 'rb') as f:
+        magic = f.read(len(PATH_STORE_MAGIC))
+        if magic != PATH_STORE_MAGIC:
+            raise ValueError("%s is not a path store file" % filepath)
+        version, header_length = struct.unpack('<II', f.read(8))
+        if version != PATH_STORE_VERSION:
+            raise ValueError("%s is a version %d path store file, this code reads version %d"
+                             % (filepath, version, PATH_STORE_VERSION))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    return header, _aligned(len(PATH_STORE_MAGIC) + 8 + header_length)
+
+
+def setPathStoreAttributes(filepath, attributes):
+    """ Replaces the attributes of a path store file in place. The new header has to fit in the space the old one and
+    the reserve (see savePathStore) took """
+    header, data_start = readPathStoreHeader(filepath)
+    header['attributes'] = attributes
+    header = json.dumps(header).encode('utf-8')
+    header_length = data_start - len(PATH_STORE_MAGIC) - 8
+    if len(header) > header_length:
+        raise ValueError("the attributes do not fit in the header of %s" % filepath)
+
+    with open(filepath, 'r+b') as f:
+        f.seek(len(PATH_STORE_MAGIC))
+        f.write(struct.pack('<II', PATH_STORE_VERSION, header_length))
+        f.write(header + b" " * (header_length - len(header)))
+
+
+def loadPathStore(filepath, mmap=True, writable=False):
+    """ Reads a file written by savePathStore, returns the store and the attributes saved with it. With mmap the arrays
+    are read only views of the file which the OS pages in as paths are asked for (writable views if writable, what is
+    stored in them goes to the file), without it they are read into memory """
+    header, data_start = readPathStoreHeader(filepath)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if mmap and np.prod(shape):
+            arrays[name] = np.memmap(filepath, dtype=spec['dtype'], mode='r+' if writable else 'r',
+                                     offset=data_start + spec['offset'], shape=shape)
+        else:
+            with open(filepath, 'rb') as f:
+                f.seek(data_start + spec['offset'])
+                arrays[name] = np.fromfile(f, dtype=spec['dtype'], count=int(np.prod(shape))).reshape(shape)
+
+    if header['kind'] == 'edgePathStore':
+        store = edgePathStore(header['edgeIDs'], arrays['costs'], arrays['predecessors'])
+    elif header['kind'] == 'nodePathStore':
+        store = nodePathStore(header['edgeIDs'], arrays['edgeFromNodes'], arrays['edgeToNodes'],
+                              arrays['costs'].shape[1], arrays['costs'], arrays['predecessors'])
+    else:
+        raise ValueError("%s holds an unknown kind of path store: %s" % (filepath, header['kind']))
+    return store, header['attributes']
@@ -12,7 +12,7 @@ from __future__ import print_function, division
 import subprocess, sys, os
 import tools
 import traci
-from sumoRouter import vehObj
+from sumoRouter import vehObj, shortestPaths
 from sumoFileGen import pickleFunc
 from blueCrystalFuncs import checkPorts
 from tools.sumolib import net
@@ -36,7 +36,7 @@ def covBasedRoutingMain(netID, stepLength, carGenRate, penetrationRate, run, alp
     loop_ids = inductionLoopsContainer.getILids()
     
     shortestPaths_filepath = ("%s/netObjects/%s_shortestPaths" % (os.environ['DIRECTORY_PATH'], netID))
-    shortestPathsContainer = pickleFunc.load_obj(shortestPaths_filepath)
+    shortestPathsContainer = shortestPaths.loadShortestPaths(shortestPaths_filepath)
     
     sumolibnet = net.readNet(netFile_filepath)
     vehContainer = vehObj.vehObjContainer(sumolibnet, shortestPathsContainer, loop_ids, alpha)
@@ -85,7 +85,7 @@ def q_learning_router_with_config_file(net_id, config_file, step_length, alpha,
     loop_ids = inductionLoopsContainer.getILids()
 
     shortestPaths_filepath = ("%s/netObjects/%s_shortestPaths" % (os.environ['DIRECTORY_PATH'], net_id))
-    shortestPathsContainer = pickleFunc.load_obj(shortestPaths_filepath)
+    shortestPathsContainer = shortestPaths.loadShortestPaths(shortestPaths_filepath)
 
     sumolibnet = net.readNet(net_file_filepath)
     vehContainer = vehObj.vehObjContainer(sumolibnet, shortestPathsContainer, loop_ids, alpha)
@@ -1,176 +1,63 @@
-from __future__ import division
+from __future__ import division, print_function
+import os
+import multiprocessing
+import numpy as np
 from tools.sumolib.net import readNet
+from sumoFileGen import pickleFunc
+from sumoRouter.edgeGraph import getEdgeGraph
+from sumoRouter import pathStore
+
+# Added to the name of shortest paths files, as pickleFunc adds .pkl
+PATHS_FILE_EXTENSION = '.paths'
+
+# Container and graph the worker processes of shortestPathsClass.findPathsToFile search with. They are set before the
+# pool is started so the workers get them with the fork rather than pickled, then the workers add the store and the
+# done marks they write to
+_parallelSearch = {}
+
+def edgeSearchToDicts(graph, costs, via):
+    """ Turns the edge index lists of edgeGraph.shortestPathsFromEdge into the dicts keyed by edge id the searches
+    below return: the cost of reaching each edge and the edge it is reached from (None if none) """
+    edge_ids = graph.getEdgeIDs()
+    visited = dict(zip(edge_ids, costs))
+    via = dict((edge_id, edge_ids[via_index] if via_index >= 0 else None) for edge_id, via_index in zip(edge_ids, via))
+    return visited, via
 
 def findShortestPathBewtweenTwoNodes(net, start, end):
-    
-    # Retrieve edges from the net object
-    net_edges = net.getEdges()
-    
-    #  Thanks to Hyperboreus @ stackoverflow.com for this Dijsktra implementation
-    
-    unvisited = {str(edge.getID()): None for edge in net_edges}
-    visited = {str(edge.getID()): float("inf") for edge in net_edges}
-    current = start
-    currentTime = 0
-    unvisited[current] = currentTime
-    
-    times = {}
-    
-    for edge in net_edges:
-        times.update({str(edge.getID()):{}})
-        for outgoing_edge in edge.getOutgoing():
-            cost_to_outgoing_edge = edge.cost
-            times[str(edge.getID())].update({str(outgoing_edge.getID()) : cost_to_outgoing_edge})
-    
-    via = {str(edge.getID()): None for edge in net_edges}
-    
-    while True:
-        for outgoing_edge, time in times[current].items():
-            if outgoing_edge not in unvisited: continue
-            newTime = currentTime + time
-            if unvisited[outgoing_edge] is None or unvisited[outgoing_edge] > newTime:
-                unvisited[outgoing_edge] = newTime
-                via.update({outgoing_edge:current})
-        visited[current] = currentTime
-        del unvisited[current]
-        if not unvisited: break
-        candidates = [edge for edge in unvisited.items() if edge[1]]
-        if not candidates: break
-        current, currentTime = sorted(candidates, key = lambda x: x[1])[0]
-        if end in visited: break
-        
-    return visited, via
+
+    graph = getEdgeGraph(net)
+    costs, via = graph.shortestPathsFromEdge(graph.getEdgeIndex(start), end=graph.getEdgeIndex(end))
+
+    return edgeSearchToDicts(graph, costs, via)
  
 def findShortestPathToAllNodes(net, start):
-    
-    # Retrieve edges from the net object
-    net_edges = net.getEdges()
-    
-    #  Thanks to Hyperboreus @ stackoverflow.com for this Dijsktra implementation
-    
-    unvisited = {str(edge.getID()): None for edge in net_edges}
-    visited = {str(edge.getID()): float("inf") for edge in net_edges}
-    current = start
-    currentTime = 0
-    unvisited[current] = currentTime
-    
-    times = {}
-    
-    for edge in net_edges:
-        times.update({str(edge.getID()):{}})
-        for outgoing_edge in edge.getOutgoing():
-            cost_to_outgoing_edge = edge.cost
-            times[str(edge.getID())].update({str(outgoing_edge.getID()) : cost_to_outgoing_edge})
-    
-    via = {str(edge.getID()): None for edge in net_edges}
-    
-    while True:
-        for outgoing_edge, time in times[current].items():
-            if outgoing_edge not in unvisited: continue
-            newTime = currentTime + time
-            if unvisited[outgoing_edge] is None or unvisited[outgoing_edge] > newTime:
-                unvisited[outgoing_edge] = newTime
-                via.update({outgoing_edge:current})
-        visited[current] = currentTime
-        del unvisited[current]
-        if not unvisited: break
-        candidates = [edge for edge in unvisited.items() if edge[1]]
-        if not candidates: break
-        current, currentTime = sorted(candidates, key = lambda x: x[1])[0]
 
-    return visited, via
+    graph = getEdgeGraph(net)
+    costs, via = graph.shortestPathsFromEdge(graph.getEdgeIndex(start))
+
+    return edgeSearchToDicts(graph, costs, via)
 
 def find_shortest_paths_to_all_edges_not_via_these_edges(net, starting_edge, not_via=[]):
 
-    # put not_via into a set
-    not_via = set(not_via)
-
-    # Retrieve edges from the net object
-    net_edges = net.getEdges()
-
-    #  Thanks to Hyperboreus @ stackoverflow.com for this Dijsktra implementation
-
-    unvisited = {str(edge.getID()): None for edge in net_edges}
-    visited = {str(edge.getID()): float("inf") for edge in net_edges}
-    current = starting_edge
-    currentTime = 0
-    unvisited[current] = currentTime
-
-    times = {}
-
-    for edge in net_edges:
-        times.update({str(edge.getID()): {}})
-        for outgoing_edge in edge.getOutgoing():
-            cost_to_outgoing_edge = edge.cost
-            if edge in not_via : cost_to_outgoing_edge = float("inf")
-            times[str(edge.getID())].update({str(outgoing_edge.getID()): cost_to_outgoing_edge})
-
-    via = {str(edge.getID()): None for edge in net_edges}
-
-    while True:
-        for outgoing_edge, time in times[current].items():
-            if outgoing_edge not in unvisited: continue
-            newTime = currentTime + time
-            if unvisited[outgoing_edge] is None or unvisited[outgoing_edge] > newTime:
-                unvisited[outgoing_edge] = newTime
-                via.update({outgoing_edge: current})
-        visited[current] = currentTime
-        del unvisited[current]
-        if not unvisited: break
-        candidates = [edge for edge in unvisited.items() if edge[1]]
-        if not candidates: break
-        current, currentTime = sorted(candidates, key=lambda x: x[1])[0]
+    graph = getEdgeGraph(net)
+    costs, via = graph.shortestPathsFromEdge(graph.getEdgeIndex(starting_edge), notVia=graph.edgeMask(not_via))
 
-    return visited, via
+    return edgeSearchToDicts(graph, costs, via)
 
 def find_shortest_paths_to_all_nodes_not_via_these_edges(net, starting_edge, not_via=[]):
 
+    graph = getEdgeGraph(net)
+    net_nodes = graph.getNodes()
+
     # from node
-    starting_node = starting_edge.getToNode()
-
-    # put not_via into a set
-    not_via = set(not_via)
-
-    # Retrieve edges from the net object
-    net_nodes = net.getNodes()
-    net_edges = net.getEdges()
-
-    #  Thanks to Hyperboreus @ stackoverflow.com for this Dijsktra implementation
-
-    unvisited = {node: None for node in net_nodes}
-    visited = {node: float("inf") for node in net_nodes}
-    current = starting_node
-    currentTime = 0
-    unvisited[current] = currentTime
-
-    times = {}
-
-    for node in net_nodes:
-        times.update({node : {}})
-        for outgoing_edge in node.getOutgoing():
-            cost_via_outgoing_edge = outgoing_edge.cost
-            if outgoing_edge in not_via : cost_via_outgoing_edge = float("inf")
-            times[node].update({outgoing_edge.getToNode(): (outgoing_edge, cost_via_outgoing_edge)})
-
-    via = {node : None for node in net_nodes}
-    via_edges = {node : None for node in net_nodes}
-
-    while True:
-        for node, edge_and_time in times[current].items():
-            via_edge = edge_and_time[0]
-            time = edge_and_time[1]
-            if node not in unvisited: continue
-            newTime = currentTime + time
-            if unvisited[node] is None or unvisited[node] > newTime:
-                unvisited[node] = newTime
-                via.update({node: current})
-                via_edges.update({node:via_edge})
-        visited[current] = currentTime
-        del unvisited[current]
-        if not unvisited: break
-        candidates = [node for node in unvisited.items() if node[1]]
-        if not candidates: break
-        current, currentTime = sorted(candidates, key=lambda x: x[1])[0]
+    starting_node = graph.getNodeIndex(starting_edge.getToNode())
+    costs, via_indices, via_edge_indices = graph.shortestPathsFromNode(starting_node, notVia=graph.edgeMask(not_via))
+
+    visited = dict(zip(net_nodes, costs))
+    via = dict((node, net_nodes[via_index] if via_index >= 0 else None)
+               for node, via_index in zip(net_nodes, via_indices))
+    via_edges = dict((node, graph.getEdge(via_edge_index) if via_edge_index >= 0 else None)
+                     for node, via_edge_index in zip(net_nodes, via_edge_indices))
 
     return visited, via, via_edges
 
@@ -187,6 +74,8 @@ class addEdgeWeights2Net:
         # reset weights before loading
         for e in self._net.getEdges():
             e.cost = e.getLength() / e.getSpeed()
+        # the edge graph holds the old weights
+        self._net._edgeGraph = None
             
     def getNet(self):
         return self._net
@@ -197,51 +86,127 @@ class addEdgeWeights2Net:
 class shortestPathsClass:
     
     """ Contains all the shortest paths between edges in the network """
+
+    # Containers pickled before the path stores were added keep their paths in the _paths dict
+    _store = None
     
-    def __init__(self, net_filepath):
+    def __init__(self, net_filepath, name=None, processes=None):
+        """ With a name the paths are found in parallel and saved as name (see findPathsToFile), else one at a time
+        in memory """
         net = readNet(net_filepath)
         netWithEdgeWeights = addEdgeWeights2Net(net)
         net = netWithEdgeWeights.getNet()
 
         self._paths = {}
-        self.findPaths(net)
+        if name is None:
+            self._store = self.newPathStore(getEdgeGraph(net))
+            self.findPaths(net)
+        else:
+            self._store = self.findPathsToFile(net, name, processes)
         
         self._maxPathCost = self.findMaxPathCost()
         self._maxElementCost = self.findMaxElementCost(net)
+
+    def newPathStore(self, graph):
+        """ The store the paths found by searchFrom are kept in """
+        return pathStore.edgePathStore(graph.getEdgeIDs())
+
+    def searchFrom(self, graph, start):
+        """ Shortest paths from the edge numbered start, as the row of the path store """
+        return graph.shortestPathsFromEdge(start)
     
     def findPaths(self, net):
-        """ Generate all the shortest paths and store in the _paths dict """
+        """ Generate all the shortest paths and store them in the path store """
         
-        net_edges = net.getEdges()
-        num_edges = len(net_edges)
-        edges_evaluated = 0
-        # Initialise a dictionary which contains all the data 
+        graph = getEdgeGraph(net)
+        num_edges = graph.getNumEdges()
         
-        for start in net_edges:
-            start = str(start.getID())
-            self._paths.update({start:{}})
-            [dijkstra_visited, dijkstra_via] = findShortestPathToAllNodes(net, start)
-            for end in net_edges:
-                end = str(end.getID())
-                self._paths[start].update({end:([],dijkstra_visited[end])})
-                current_edge = end
-                while current_edge != None:
-                    self._paths[start][end][0].append(current_edge)
-                    current_edge = dijkstra_via[current_edge]
-                self._paths[start][end][0].reverse()
-            
-            edges_evaluated += 1
-            print("%d of %d completed" % (edges_evaluated, num_edges))
+        for start in range(num_edges):
+            costs, predecessors = self.searchFrom(graph, start)
+            self._store.setRow(start, costs, predecessors)
+            print("%d of %d completed" % (start + 1, num_edges))
+
+    def findPathsToFile(self, net, name, processes=None):
+        """ Generate all the shortest paths with a pool of processes (one per CPU if processes is None) and save them
+        as name (see loadShortestPaths), return the store mapped from the file. The workers write the rows straight
+        into name + PATHS_FILE_EXTENSION + '.partial' and mark them in a '.done' file next to it; if the search is
+        stopped, running it again only searches from the edges not done. The workers are forked, so this needs a
+        platform with fork """
+
+        graph = getEdgeGraph(net)
+        num_edges = graph.getNumEdges()
+        filepath = name + PATHS_FILE_EXTENSION
+        partial_filepath = filepath + '.partial'
+        done_filepath = filepath + '.done'
+
+        if not self.canResume(graph, partial_filepath, done_filepath):
+            pathStore.savePathStore(self.newPathStore(graph), partial_filepath,
+                                    {'container': self.__class__.__name__}, reserve=256)
+            np.zeros(num_edges, dtype=np.uint8).tofile(done_filepath)
+        starts = np.flatnonzero(np.fromfile(done_filepath, dtype=np.uint8) == 0).tolist()
+
+        processes = processes or multiprocessing.cpu_count()
+        chunk_size = max(1, min(64, len(starts) // (processes * 8)))
+        chunks = [starts[i:i + chunk_size] for i in range(0, len(starts), chunk_size)]
+        completed = num_edges - len(starts)
+
+        _parallelSearch.update({'container': self, 'graph': graph})
+        pool = None
+        try:
+            if processes == 1:
+                _initSearchWorker(partial_filepath, done_filepath)
+                results = (_searchFromRows(chunk) for chunk in chunks)
+            else:
+                pool = multiprocessing.Pool(processes, _initSearchWorker, (partial_filepath, done_filepath))
+                results = pool.imap_unordered(_searchFromRows, chunks)
+            for num_rows in results:
+                completed += num_rows
+                print("%d of %d completed" % (completed, num_edges))
+            if pool is not None:
+                pool.close()
+                pool.join()
+        finally:
+            if pool is not None:
+                pool.terminate()
+            _parallelSearch.clear()
+
+        store = pathStore.loadPathStore(partial_filepath)[0]
+        pathStore.setPathStoreAttributes(partial_filepath, {'maxPathCost': float(store.getMaxPathCost()),
+                                                            'maxElementCost': float(self.findMaxElementCost(net))})
+        os.rename(partial_filepath, filepath)
+        os.remove(done_filepath)
+        return pathStore.loadPathStore(filepath)[0]
+
+    def canResume(self, graph, partial_filepath, done_filepath):
+        """ Whether the files left by a findPathsToFile which did not finish are for this container and graph """
+        if not (os.path.exists(partial_filepath) and os.path.exists(done_filepath)):
+            return False
+        try:
+            header = pathStore.readPathStoreHeader(partial_filepath)[0]
+        except ValueError:
+            return False
+        return (header['attributes'].get('container') == self.__class__.__name__
+                and header['edgeIDs'] == graph.getEdgeIDs()
+                and os.path.getsize(done_filepath) == graph.getNumEdges())
+
+    def getPathStore(self):
+        return self._store
             
     def getPathCost(self, start, end):
         """ return cost of the shortest path (in travel time) """
-        return self._paths[start][end][1]
+        if self._store is None:
+            return self._paths[start][end][1]
+        return self._store.getPathCost(start, end)
     
     def getPath(self, start, end):
         """ return shortest path """
-        return self._paths[start][end][0]
+        if self._store is None:
+            return self._paths[start][end][0]
+        return self._store.getPath(start, end)
     
     def findMaxPathCost(self):
+        if self._store is not None:
+            return self._store.getMaxPathCost()
         maxCost = 0
         for start in self._paths:
             for end in self._paths[start]:
@@ -262,68 +227,108 @@ class shortestPathsClass:
 
 class shortestPathsNotViaOtherOutEdges(shortestPathsClass):
 
-    def findPaths(self, net):
-        """ Generate all the shortest paths and store in the _paths dict """
-
-        net_edges = net.getEdges()
-        num_edges = len(net_edges)
-        edges_evaluated = 0
-        # Initialise a dictionary which contains all the data
-
-        for start in net_edges:
-
-            from_node = start.getFromNode()
-            out_edges = from_node.getOutgoing()
-            out_edges_set = set(out_edges)
-            out_edges_set.remove(start)
-
-            start = str(start.getID())
-            self._paths.update({start: {}})
-            [dijkstra_visited, dijkstra_via] = find_shortest_paths_to_all_edges_not_via_these_edges(net, start, not_via=out_edges_set)
-            for end in net_edges:
-                end = str(end.getID())
-                self._paths[start].update({end: ([], dijkstra_visited[end])})
-                current_edge = end
-                while current_edge != None:
-                    self._paths[start][end][0].append(current_edge)
-                    current_edge = dijkstra_via[current_edge]
-                self._paths[start][end][0].reverse()
-
-            edges_evaluated += 1
-            print("%d of %d completed" % (edges_evaluated, num_edges))
+    def searchFrom(self, graph, start):
+        """ Shortest paths from the edge numbered start which do not go on from the other edges leaving its from
+        node """
+
+        start_edge = graph.getEdge(start)
+        out_edges_set = set(start_edge.getFromNode().getOutgoing())
+        out_edges_set.remove(start_edge)
+
+        return graph.shortestPathsFromEdge(start, notVia=graph.edgeMask(out_edges_set))
 
 class shortestPathToEndNodeNotViaOtherOutEdges(shortestPathsClass):
 
-    def findPaths(self, net):
-        """ Generate all the shortest paths and store in the _paths dict """
-
-        net_edges = net.getEdges()
-        num_edges = len(net_edges)
-        edges_evaluated = 0
-        # Initialise a dictionary which contains all the data
-
-        for start in net_edges:
-
-            from_node = start.getFromNode()
-            out_edges = from_node.getOutgoing()
-            out_edges_set = set(out_edges)
-            out_edges_set.remove(start)
-
-            self._paths.update({start.getID(): {}})
-            [dijkstra_visited, dijkstra_via, dijkstra_via_edges] = find_shortest_paths_to_all_nodes_not_via_these_edges(net, start, not_via=out_edges_set)
-            for end in net_edges:
-                end_node = end.getToNode()
-                self._paths[start.getID()].update({end.getID(): ([], dijkstra_visited[end_node])})
-                current_node = end_node
-                current_edge = end
-                while current_node != None:
-                    self._paths[start.getID()][end.getID()][0].append(current_edge.getID())
-                    current_edge = dijkstra_via_edges[current_node]
-                    current_node = dijkstra_via[current_node]
-                self._paths[start.getID()][end.getID()][0].reverse()
-
-            edges_evaluated += 1
-            print("%d of %d completed" % (edges_evaluated, num_edges))
+    def newPathStore(self, graph):
+        edge_from_nodes, edge_to_nodes = graph.getEdgeNodes()
+        return pathStore.nodePathStore(graph.getEdgeIDs(), edge_from_nodes, edge_to_nodes, len(graph.getNodes()))
+
+    def searchFrom(self, graph, start):
+        """ Shortest paths from the node the edge numbered start leads to, to every node, not using the other edges
+        leaving its from node """
+
+        start_edge = graph.getEdge(start)
+        out_edges_set = set(start_edge.getFromNode().getOutgoing())
+        out_edges_set.remove(start_edge)
+
+        costs, via, via_edges = graph.shortestPathsFromNode(graph.getNodeIndex(start_edge.getToNode()),
+                                                            notVia=graph.edgeMask(out_edges_set))
+        return costs, via_edges
+
+def _initSearchWorker(partial_filepath, done_filepath):
+    _parallelSearch['store'] = pathStore.loadPathStore(partial_filepath, writable=True)[0]
+    _parallelSearch['done'] = np.memmap(done_filepath, dtype=np.uint8, mode='r+')
+
+def _searchFromRows(starts):
+    """ Searches from the edges numbered starts into the store of the worker, returns how many were done """
+    container = _parallelSearch['container']
+    graph = _parallelSearch['graph']
+    for start in starts:
+        costs, predecessors = container.searchFrom(graph, start)
+        _parallelSearch['store'].setRow(start, costs, predecessors)
+        _parallelSearch['done'][start] = 1
+    return len(starts)
+
+class storedShortestPaths(shortestPathsClass):
+
+    """ Shortest paths read from a file written by saveShortestPaths instead of searched for. The costs and predecessors
+    stay in the file, mapped into memory (see pathStore.loadPathStore), so loading does not depend on the size of the
+    net and runs on the same machine share one copy """
+
+    def __init__(self, name, mmap=True):
+        self._paths = {}
+        self._store, attributes = pathStore.loadPathStore(name + PATHS_FILE_EXTENSION, mmap)
+        self._maxPathCost = attributes['maxPathCost']
+        self._maxElementCost = attributes['maxElementCost']
+
+def saveShortestPaths(shortestPathsObj, name):
+    """ Writes the paths of a shortestPathsClass to name + PATHS_FILE_EXTENSION, to be loaded by loadShortestPaths """
+    pathStore.savePathStore(shortestPathsObj.getPathStore(), name + PATHS_FILE_EXTENSION,
+                            {'maxPathCost': float(shortestPathsObj.getMaxPathCost()),
+                             'maxElementCost': float(shortestPathsObj.getMaxElementCost())})
+
+def loadShortestPaths(name):
+    """ The shortest paths saved as name: the file written by saveShortestPaths if there is one, else the pickle """
+    if os.path.exists(name + PATHS_FILE_EXTENSION):
+        return storedShortestPaths(name)
+    return pickleFunc.load_obj(name)
+
+def storeFromPathDicts(paths, net_filepath=None, node_paths=False):
+    """ A path store holding the paths of the _paths dict of a container pickled before the path stores were added
+    ({start: {end: [path, cost]}}). Paths found over the nodes (shortestPathToEndNodeNotViaOtherOutEdges) need the net
+    for the nodes of the edges """
+    if node_paths:
+        if net_filepath is None:
+            raise ValueError("the net file is needed to convert paths found over the nodes")
+        graph = getEdgeGraph(addEdgeWeights2Net(readNet(net_filepath)).getNet())
+        edge_from_nodes, edge_to_nodes = graph.getEdgeNodes()
+        store = pathStore.nodePathStore(graph.getEdgeIDs(), edge_from_nodes, edge_to_nodes, len(graph.getNodes()))
+    else:
+        store = pathStore.edgePathStore(sorted(paths))
+
+    costs = store.getCosts()
+    predecessors = store.getPredecessors()
+    for start in paths:
+        row = store.getEdgeIndex(start)
+        for end, (path, cost) in paths[start].items():
+            # the store keeps the edge before the last one (into the node the last one leaves, for node paths)
+            column = store.getEdgeIndex(end)
+            if node_paths:
+                column = edge_to_nodes[column]
+            costs[row, column] = cost
+            predecessors[row, column] = store.getEdgeIndex(path[-2]) if len(path) > 1 else -1
+    return store
+
+def convertPickledShortestPaths(name, net_filepath=None):
+    """ Writes the shortest paths pickled as name (by pickleFunc.save_obj) to a file loadShortestPaths maps. Containers
+    pickled before the path stores were added are converted from their path dicts, which for
+    shortestPathToEndNodeNotViaOtherOutEdges needs the net file """
+    shortestPathsObj = pickleFunc.load_obj(name)
+    if shortestPathsObj.getPathStore() is None:
+        shortestPathsObj._store = storeFromPathDicts(
+            shortestPathsObj._paths, net_filepath,
+            node_paths=isinstance(shortestPathsObj, shortestPathToEndNodeNotViaOtherOutEdges))
+    saveShortestPaths(shortestPathsObj, name)
 
 if __name__ == "__main__":
 
@@ -43,6 +43,11 @@ class vehObjContainer():
         #self.routerObj = vehicleRouter.createRouterObject(sumolibNet) # The vehicle routing object which decides on the best route for a vehicle to take
         self.loop_ids = loop_ids # Array of induction loops ids, to notify when a vehicle is approaching a junction
         self.CBR_alpha = CBR_alpha
+        self.route_cache = None # VehicleRouteCache of the intersection controllers, see set_route_cache
+
+    # keep the cached routes in line with the routes set here, IntersectionControllerContainer.use_route_cache(self) calls this
+    def set_route_cache(self, route_cache):
+        self.route_cache = route_cache
 
     # add a vehicle to the container
     def addVeh(self, vehID):
@@ -104,4 +109,7 @@ class vehObjContainer():
             for veh in vehicles_approaching_junctions[edge]:
                 if not(self.container[veh].dest == edge) and not(self.container[veh].router_mode == None):
                     vehRoute = self.findVehicleRoute(veh, edge)
-                    traci.vehicle.setRoute(veh, vehRoute)
\ No newline at end of file
+                    if self.route_cache is not None:
+                        self.route_cache.set_route(veh, vehRoute)
+                    else:
+                        traci.vehicle.setRoute(veh, vehRoute)
\ No newline at end of file
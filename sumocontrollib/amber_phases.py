@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import numpy as np
+
+# Signal shown during the amber phase for each (old signal, new signal) pair. Red stays red, green stays green and
+# green turning red shows yellow
+AMBER_SIGNALS = {('r', 'r'): 'r', ('r', 'g'): 'r', ('r', 'G'): 'r',
+                 ('g', 'r'): 'y', ('G', 'r'): 'y',
+                 ('g', 'g'): 'g', ('G', 'G'): 'G',
+                 ('g', 'G'): 'g', ('G', 'g'): 'G'}
+
+# The same as a table indexed by the character codes, 0 marks pairs without an amber signal
+_AMBER_SIGNAL_TABLE = np.zeros([256, 256], dtype=np.uint8)
+for (old_signal, new_signal), amber_signal in AMBER_SIGNALS.items():
+    _AMBER_SIGNAL_TABLE[ord(old_signal), ord(new_signal)] = ord(amber_signal)
+
+
+def amber_phase_string(old_phase, new_phase):
+    """Returns the amber phase string between two phases (strings or lists of signals). Signals without an amber
+    signal are reported and left out"""
+    old_phase = "".join(old_phase)
+    new_phase = "".join(new_phase)
+
+    if old_phase == new_phase:
+        return new_phase
+
+    amber_phase = []
+    for old_signal, new_signal in zip(old_phase, new_phase):
+        try:
+            amber_phase.append(AMBER_SIGNALS[(old_signal, new_signal)])
+        except KeyError:
+            print("Something wrong in amber phase logic. Old: %s, New: %s" % (old_signal, new_signal))
+    return "".join(amber_phase)
+
+
+def amber_phase_strings(old_phases, new_phases):
+    """Returns the amber phase strings between many pairs of phases, looking all the signals up in one go"""
+    old_phases = ["".join(phase) for phase in old_phases]
+    new_phases = ["".join(phase) for phase in new_phases]
+    if any(len(old_phase) != len(new_phase) for old_phase, new_phase in zip(old_phases, new_phases)):
+        return [amber_phase_string(old_phase, new_phase) for old_phase, new_phase in zip(old_phases, new_phases)]
+    if not old_phases:
+        return []
+
+    old_signals = np.frombuffer("".join(old_phases).encode("ascii"), dtype=np.uint8)
+    new_signals = np.frombuffer("".join(new_phases).encode("ascii"), dtype=np.uint8)
+    amber_signals = _AMBER_SIGNAL_TABLE[old_signals, new_signals].tobytes().decode("ascii")
+
+    amber_phases = []
+    start = 0
+    for old_phase, new_phase in zip(old_phases, new_phases):
+        end = start + len(new_phase)
+        amber_phase = str(amber_signals[start:end])
+        if old_phase == new_phase:
+            amber_phase = new_phase
+        elif "\0" in amber_phase:
+            amber_phase = amber_phase_string(old_phase, new_phase)
+        amber_phases.append(amber_phase)
+        start = end
+    return amber_phases
+
+
+class AmberTransitionTable:
+
+    def __init__(self, phase_strings, default_amber_phase_length):
+        """ Amber phase string and length for every pair of phases of a traffic light, worked out when the
+        intersection is built. Changing phase is then a dict lookup. Staying in the same phase takes one second """
+        phase_strings = ["".join(phase) for phase in phase_strings]
+        self._default_amber_phase_length = default_amber_phase_length
+        self._transitions = {}
+        for old_phase in phase_strings:
+            for new_phase in phase_strings:
+                self._transitions[(old_phase, new_phase)] = self._transition(old_phase, new_phase)
+
+    def __repr__(self):
+        return "Amber Transition Table (%d transitions)" % len(self._transitions)
+
+    def _transition(self, old_phase, new_phase):
+        if old_phase == new_phase:
+            return new_phase, 1
+        return amber_phase_string(old_phase, new_phase), self._default_amber_phase_length
+
+    def get_transition(self, old_phase, new_phase):
+        """Returns the amber phase string and its length between two phase strings"""
+        try:
+            return self._transitions[(old_phase, new_phase)]
+        except KeyError:
+            # Phase strings which were not known when the table was made (e.g. set by hand)
+            return self._transition(old_phase, new_phase)
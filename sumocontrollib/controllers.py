@@ -351,45 +351,45 @@ class CongestionAwareLmaxQueueController:
 
 class CongestionDemandOptimisingQueueController:
 
+    def __init__(self):
+        """ Controller that picks the phase releasing the most vehicles the receiving lanes can take. The receiving
+        lane and L matrices of an intersection only depend on its layout, so they are worked out on its first decision
+        and all phases are then evaluated together """
+        self._phase_matrices_by_tls_id = {}
+
     def __repr__(self):
         return """Bounded Queue Length Max Queue Length Controller"""
 
-    def get_L_matrix_from_phase(self, phase):
-        L = []
-        for row_index, row_status in enumerate(phase):
-            L.append([])
-            for other_index, col_status in enumerate(phase):
-                if row_status and col_status:
-                    L[row_index].append(1)
-                else:
-                    L[row_index].append(0)
-
-        return L
-
-    def bounded_demand(self, x_tilda, capacity_vec):
-        return [min(val) for val in zip(x_tilda,capacity_vec)]
-
-    def demand_per_queue(self, combined_out_flows_and_L_matrix, x_bounded):
-
-        return [(queue_bounded/np.sum(combined_out_flows_and_L_matrix[ii][:])) if np.sum(combined_out_flows_and_L_matrix[ii][:]) != 0 else 0 for ii, queue_bounded in enumerate(x_bounded)]
+    def get_receiving_lanes_index(self, intersection_controller):
+        """Matrix with a 1 where the queues of the row and column join the same outgoing lane"""
+        outgoing_lanes = np.array(intersection_controller.get_outgoing_lanes_by_index_array())
+        return (outgoing_lanes[:, np.newaxis] == outgoing_lanes[np.newaxis, :]).astype(int)
 
-    def phase_selection(self, phases, receiving_lanes_index, queues, capacities):
+    def get_combined_out_flows_and_L_matrices(self, phases, receiving_lanes_index):
+        """Receiving lane matrix times the L matrix of each phase, stacked as [phase, queue, queue], and the row sums"""
+        open_queues = np.asarray(phases) != 0
+        L_matrices = open_queues[:, :, np.newaxis] & open_queues[:, np.newaxis, :]
+        combined_out_flows_and_L_matrices = np.asarray(receiving_lanes_index) * L_matrices
+        return combined_out_flows_and_L_matrices, combined_out_flows_and_L_matrices.sum(axis=2)
 
-        phase_benefit = []
-
-        for phase in phases:
-            L = self.get_L_matrix_from_phase(phase)
-            combined_out_flows_and_L_matrix = np.multiply(receiving_lanes_index, L)
-            x_tilda = np.dot(combined_out_flows_and_L_matrix, queues)
+    def phase_benefits(self, phases, combined_out_flows_and_L_matrices, row_sums, queues, capacities):
+        """Vehicles each phase releases, bounded by what the receiving lanes can take, for all phases at once"""
+        x_tilda = np.einsum('pij,j->pi', combined_out_flows_and_L_matrices, queues)
+        x_bounded = np.minimum(x_tilda, capacities)
+        x_bounded_per_queue = np.where(row_sums != 0, x_bounded / np.where(row_sums != 0, row_sums, 1), 0)
+        return np.einsum('pi,pi->p', phases, x_bounded_per_queue)
 
-            x_bounded = self.bounded_demand(x_tilda, capacities)
-            x_bounded_per_queue = self.demand_per_queue(combined_out_flows_and_L_matrix, x_bounded)
+    def phase_selection(self, phases, receiving_lanes_index, queues, capacities, phase_matrices=None):
 
-            total_demand_bounded_by_capacity = np.dot(phase, x_bounded_per_queue)
+        phases = np.asarray(phases)
+        if phase_matrices is None:
+            phase_matrices = self.get_combined_out_flows_and_L_matrices(phases, receiving_lanes_index)
+        combined_out_flows_and_L_matrices, row_sums = phase_matrices
 
-            phase_benefit.append(total_demand_bounded_by_capacity)
+        phase_benefit = self.phase_benefits(phases, combined_out_flows_and_L_matrices, row_sums, queues, capacities)
 
-        best_choices = np.nonzero(phase_benefit == np.amax(phase_benefit))[0]
+        # Benefits are sums of fractions, phases equal up to rounding are ties
+        best_choices = np.nonzero(np.isclose(phase_benefit, np.amax(phase_benefit), rtol=1e-9, atol=1e-12))[0]
 
         return random.choice(best_choices)
 
@@ -398,17 +398,24 @@ class CongestionDemandOptimisingQueueController:
         # extract the relevant data from the intersection controller
         if replacement_phases.any():
             phases = replacement_phases
+            phase_matrices = None
         else:
-            phases = intersection_controller.get_phase_matrix_by_link_index()
-
-        receiving_lanes_index = [[1 if ii in intersection_controller.get_indicies_of_outgoing_lane(intersection_controller.get_outgoing_lane_from_index(jj))
-                                else 0
-                                for ii in range(intersection_controller.get_num_queues())]
-                                for jj in range(intersection_controller.get_num_queues())]
+            # The phases are only read here, so the object in memory is used and the cache can check it by identity
+            phases = intersection_controller.get_phase_matrix_by_link_index(get_object_in_memory=True, warn=False)
+            tls_id = intersection_controller.get_id()
+            cached = self._phase_matrices_by_tls_id.get(tls_id)
+            # The phases are checked by identity in case another intersection with the same id uses this controller
+            if cached is None or cached[0] is not phases:
+                cached = (phases, self.get_combined_out_flows_and_L_matrices(
+                    phases, self.get_receiving_lanes_index(intersection_controller)))
+                self._phase_matrices_by_tls_id[tls_id] = cached
+            phase_matrices = cached[1]
+
+        receiving_lanes_index = None if phase_matrices is not None else self.get_receiving_lanes_index(intersection_controller)
         queues = intersection_controller.get_queues()
         capacities = intersection_controller.get_capacities()
 
-        best_phase = self.phase_selection(phases, receiving_lanes_index, queues, capacities)
+        best_phase = self.phase_selection(phases, receiving_lanes_index, queues, capacities, phase_matrices)
 
         return best_phase
 
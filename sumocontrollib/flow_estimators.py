@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+
+
+class WindowedRateEstimator:
+
+    def __init__(self, window):
+        """ Mean number of vehicles per step over the last window steps. The counts are kept in a ring buffer, so
+        adding a step is O(1) however long the window is. Until the window has filled the estimate is the mean over
+        the steps seen so far """
+        self._window = window
+        self._counts = [0] * int(round(window))
+        self._next = 0
+        self._num_counts = 0
+        self._rate = 0
+
+    def __repr__(self):
+        return "Windowed Rate Estimator (%s steps): %s" % (self._window, self._rate)
+
+    def add(self, count):
+        """Adds the count of the latest step and returns the new rate"""
+        if self._num_counts == len(self._counts):
+            oldest_count = self._counts[self._next]
+            self._rate = self._rate + ((count - oldest_count) / self._window)
+        else:
+            self._num_counts += 1
+            self._rate = ((self._num_counts - 1) / self._num_counts) * self._rate + (1 / self._num_counts) * count
+        self._counts[self._next] = count
+        self._next = (self._next + 1) % len(self._counts)
+        return self._rate
+
+    def get_rate(self):
+        return self._rate
+
+
+class ExponentialRateEstimator:
+
+    def __init__(self, window):
+        """ Exponentially weighted mean number of vehicles per step, counts window steps ago weigh about 1/e as much
+        as the latest one. Needs no buffer at all. Until window steps have been seen the estimate is the plain mean """
+        self._window = window
+        self._num_counts = 0
+        self._rate = 0
+
+    def __repr__(self):
+        return "Exponential Rate Estimator (%s steps): %s" % (self._window, self._rate)
+
+    def add(self, count):
+        """Adds the count of the latest step and returns the new rate"""
+        if self._num_counts < self._window:
+            self._num_counts += 1
+        self._rate = self._rate + (count - self._rate) / self._num_counts
+        return self._rate
+
+    def get_rate(self):
+        return self._rate
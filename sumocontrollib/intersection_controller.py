@@ -5,12 +5,18 @@ from collections import defaultdict, Counter
 import traci
 import random
 import tls_logic
+import phase_selection
+import lane_state
+import vehicle_routes
+import flow_estimators
+import scheduler
+import amber_phases
 
 class IntersectionController:
     def __init__(self, tls_id, inc_lanes_by_index, out_lanes_by_index, phase_matrix_by_link_index,
                  phase_strings, x_star, greenTimeController, queueController, link_index_to_turning_direction,
                  in_lane_and_out_edge_to_link_index, default_amber_phase_length, sim_step_length = 0.1,
-                 time_window_for_mu_and_lambda = 600):
+                 time_window_for_mu_and_lambda = 600, rate_estimator = flow_estimators.WindowedRateEstimator):
         """ Class which controls the lights at each intersection. This class keps track of properties such as
         the time elapsed since the last phase. The algorithm for determining green times and queues will be defined
         elsewhere and called by this function, in order to make it easy to switch algorithms """
@@ -33,6 +39,7 @@ class IntersectionController:
         self._in_lane_and_out_edge_to_link_index = in_lane_and_out_edge_to_link_index
 
         self._default_amber_phase_length = default_amber_phase_length
+        self._amber_transitions = amber_phases.AmberTransitionTable(phase_strings, default_amber_phase_length)
 
         # These are the matrix L representations
         self._phase_matrix_by_link_index = np.array(phase_matrix_by_link_index) # Possible queue combinations for different phases
@@ -59,6 +66,11 @@ class IntersectionController:
         self._outgoing_lanes_queues_by_link_index = [0] * self._num_queues
         self._outgoing_lane_capacities_by_link_index = [999] * self._num_queues  # The capacity of the links each queue wishes to join
 
+        # Source of the lane values (vehicles, counts, lengths), see set_lane_state
+        self._lane_state = lane_state.DirectLaneState()
+        # Cached vehicle routes used to find the next edge of a vehicle, see set_route_cache
+        self._route_cache = None
+
         # Algorithms used for picking queues and calculating green time
         self._timerControl = greenTimeController
         self._queueControl = queueController
@@ -72,8 +84,6 @@ class IntersectionController:
 
         self._number_of_vehicles_to_remove_by_lane = defaultdict()
 
-        self._vehicles_leaving_lane_per_time_step = defaultdict(list)
-        self._vehicles_entering_lane_per_time_step = defaultdict(list)
 
         self._vehicles_at_start_of_timestep = defaultdict(list)
         self._vehicles_at_end_of_timestep = defaultdict(list)
@@ -83,6 +93,11 @@ class IntersectionController:
         self._time_window_for_mu_and_lambda = time_window_for_mu_and_lambda
         self._step_window_for_mu_and_lambda = (1 / sim_step_length) * time_window_for_mu_and_lambda
 
+        # Estimators of the vehicles leaving (mu) and entering (lambda) each lane per step (see flow_estimators)
+        self._rate_estimator = rate_estimator
+        self._vehicles_leaving_lane_per_time_step = {}
+        self._vehicles_entering_lane_per_time_step = {}
+
         self._mu = defaultdict(int)
         self._lambda = defaultdict(int)
 
@@ -101,6 +116,12 @@ class IntersectionController:
     def set_queue_length_by_link_index(self, index, value):
         self._queue_lengths_by_link_index[index] = value
 
+    def set_lane_state(self, state):
+        self._lane_state = state
+
+    def set_route_cache(self, route_cache):
+        self._route_cache = route_cache
+
     def set_vehs_in_lane_at_start_of_step(self, lane, vehList):
         self._vehicles_at_start_of_timestep[lane] = vehList
 
@@ -144,7 +165,7 @@ class IntersectionController:
         # Get the list of all lanes incoming into the junction
         # For every lane, measure the number of vehicles in the queue
         for lane in self.get_incoming_lanes():
-            queue_length = traci.lane.getLastStepVehicleNumber(lane)
+            queue_length = self._lane_state.get_vehicle_number(lane)
             # For every linkIndex assigned to this lane, update link index as follows 'vehicles_in_lane / num_links'
             num_indexes_assigned_to_lane = len(self.get_indicies_of_incoming_lane(lane))
             value = queue_length / num_indexes_assigned_to_lane
@@ -155,14 +176,14 @@ class IntersectionController:
     def update_capacities(self, min_gap=2.5):
         """Updates self._Cs with the capacity of the outgoing lanes"""
         for lane in self.get_outgoing_lanes_by_index_array():
-            vehLength = traci.lane.getLastStepLength(lane)
+            vehLength = self._lane_state.get_mean_vehicle_length(lane)
             if vehLength:
-                laneLength = int(traci.lane.getLength(lane))
-                vehCount = traci.lane.getLastStepVehicleNumber(lane)
+                laneLength = int(self._lane_state.get_length(lane))
+                vehCount = self._lane_state.get_vehicle_number(lane)
                 spaces_total = int(laneLength / (vehLength + min_gap))
             else:
-                laneLength = int(traci.lane.getLength(lane))
-                vehCount = traci.lane.getLastStepVehicleNumber(lane)
+                laneLength = int(self._lane_state.get_length(lane))
+                vehCount = self._lane_state.get_vehicle_number(lane)
                 spaces_total = int(laneLength / (4 + (min_gap)))
             for index in self.get_indicies_of_outgoing_lane(lane):
                 self._outgoing_lanes_queues_by_link_index[index] = vehCount
@@ -173,51 +194,45 @@ class IntersectionController:
     def update_b_compare(self):
 
         """Updates the actual number of vehicles removed from the queue"""
+        for lane in self._current_open_lanes:
+            self.count_lane(lane)
+
+    def count_lane(self, lane):
+        """Counts the vehicles which left and entered an open lane since the last step, into the vehicles removed
+        and the mu and lambda of the lane. In most steps no vehicle leaves or enters a lane, then comparing the
+        vehicles at the start and the end of the step is all there is to do"""
         # Identify only individual vehicles removed from the queue, that were there at the start
         # Compare the vehicles at the start to the vehicles at the end
 
-        # Initialise a counter
-
-        for lane in self._current_open_lanes:
-            # Get the final count (current vehicles in the lane)
-            endCount = traci.lane.getLastStepVehicleIDs(lane)
-            # Get the number of vehicles at the start of the green time
-            startCount = self._vehicles_at_start_of_timestep[lane]
+        # Get the final count (current vehicles in the lane)
+        endCount = self._lane_state.get_vehicle_ids(lane)
+        # Get the number of vehicles at the start of the green time
+        startCount = self._vehicles_at_start_of_timestep[lane]
 
+        if endCount == startCount:
+            b_per_step = lambda_per_step = 0
+        else:
             # if a vehicle there at the start is not longer there, then increase the count by 1
-            b_per_step = 0
-            lambda_per_step = 0
-            for veh in startCount:
-                if veh not in endCount:
-                    self._vehicles_removed_value_for_green_time_calculation += 1
-                    b_per_step += 1
-
-            for veh in endCount:
-                if veh not in startCount:
-                    lambda_per_step += 1
-
-            self._vehicles_leaving_lane_per_time_step[lane].append(b_per_step)
-            if len(self._vehicles_leaving_lane_per_time_step[lane]) > self._step_window_for_mu_and_lambda:
-                alpha_mu = self._vehicles_leaving_lane_per_time_step[lane].pop(0)
-                omega_mu = b_per_step
-                self._mu[lane] = self._mu[lane] + ((omega_mu - alpha_mu) / self._step_window_for_mu_and_lambda)
-            else:
-                self._mu[lane] = ((len(self._vehicles_leaving_lane_per_time_step[lane]) - 1) /
-                                  len(self._vehicles_leaving_lane_per_time_step[lane])) * self._mu[lane] \
-                                 + (1 / len(self._vehicles_leaving_lane_per_time_step[lane])) * b_per_step
-
-            self._vehicles_entering_lane_per_time_step[lane].append(lambda_per_step)
-            if len(self._vehicles_entering_lane_per_time_step) > self._step_window_for_mu_and_lambda:
-                alpha_lam = self._vehicles_entering_lane_per_time_step[lane].pop(0)
-                omega_lam = lambda_per_step
-                self._lambda[lane] = self._lambda[lane] + ((omega_lam - alpha_lam) / self._step_window_for_mu_and_lambda)
-            else:
-                self._lambda[lane] = ((len(self._vehicles_entering_lane_per_time_step[lane]) - 1) / len(self._vehicles_entering_lane_per_time_step[lane])) * \
-                                     self._lambda[lane] + 1 / len(self._vehicles_entering_lane_per_time_step[lane]) * lambda_per_step
+            start_vehicles = set(startCount)
+            end_vehicles = set(endCount)
+            b_per_step = len(start_vehicles - end_vehicles)
+            lambda_per_step = len(end_vehicles - start_vehicles)
+            self._vehicles_removed_value_for_green_time_calculation += b_per_step
 
             # Update the list of vehicles at the intersection to be compared next time.
             self._vehicles_at_start_of_timestep[lane] = endCount
 
+        leaving_estimator, entering_estimator = self._get_rate_estimators(lane)
+        self._mu[lane] = leaving_estimator.add(b_per_step)
+        self._lambda[lane] = entering_estimator.add(lambda_per_step)
+
+    def _get_rate_estimators(self, lane):
+        """The estimators of the vehicles leaving and entering the lane per step, created on first use"""
+        if lane not in self._vehicles_leaving_lane_per_time_step:
+            self._vehicles_leaving_lane_per_time_step[lane] = self._rate_estimator(self._step_window_for_mu_and_lambda)
+            self._vehicles_entering_lane_per_time_step[lane] = self._rate_estimator(self._step_window_for_mu_and_lambda)
+        return self._vehicles_leaving_lane_per_time_step[lane], self._vehicles_entering_lane_per_time_step[lane]
+
     def reset_b(self):
         self._vehicles_removed_value_for_green_time_calculation = 0
 
@@ -235,8 +250,11 @@ class IntersectionController:
         self._number_of_vehicles_to_remove_by_link_index = (map(lambda x: x * self._proportion_of_vehicles_to_remove, self.get_queues()))
         self._vehicles_to_remove_this_time_step_value_for_green_time_calculation = np.sum(np.multiply(self._number_of_vehicles_to_remove_by_link_index, self._current_open_queues))
 
-    def choose_queues_to_release(self):
-        self._current_phase_index = self._queueControl.best_queue_set(self)
+    def choose_queues_to_release(self, phase_index=None):
+        """Opens the phase chosen by the queue controller, or the given phase if it was chosen elsewhere"""
+        if phase_index is None:
+            phase_index = self._queueControl.best_queue_set(self)
+        self._current_phase_index = phase_index
         self._current_open_queues = self._phase_matrix_by_link_index[self._current_phase_index]
         self._current_open_indexes = np.nonzero(self._current_open_queues)[0]
         self._current_open_lanes = []
@@ -252,35 +270,8 @@ class IntersectionController:
 
     def set_amber_phase(self):
         """ Sets the intermediate phase between green times. Returns the phase duration and traffic light string. """
-        amber_phase = []
-
-        old_phase = list(self._current_phase_string)
-        new_phase = list(self._next_green_string)
-
-        if old_phase == new_phase:
-            amber_phase_length = 1
-            amber_phase = new_phase
-        else:
-            amber_phase_length = self._default_amber_phase_length
-            for ii in range(0, len(old_phase)):
-                if old_phase[ii] == 'r' and new_phase[ii] == 'r':
-                    amber_phase.append('r')
-                elif old_phase[ii] == 'r' and (new_phase[ii] == 'g' or new_phase[ii] == 'G'):
-                    amber_phase.append('r')
-                elif (old_phase[ii] == 'g' or old_phase[ii] == 'G') and (new_phase[ii] == 'r'):
-                    amber_phase.append('y')
-                elif (old_phase[ii] == 'g') and (new_phase[ii] == 'g'):
-                    amber_phase.append('g')
-                elif old_phase[ii] == 'G' and new_phase[ii] == 'G':
-                    amber_phase.append('G')
-                elif old_phase[ii] == 'g' and new_phase[ii] == 'G':
-                    amber_phase.append('g')
-                elif old_phase[ii] == 'G' and new_phase[ii] == 'g':
-                    amber_phase.append('G')
-                else:
-                    print("Something wrong in amber phase logic. Old: %s, New: %s" % (old_phase[ii], new_phase[ii]))
-
-        amberPhaseString = "".join(amber_phase)
+        amberPhaseString, amber_phase_length = self._amber_transitions.get_transition(self._current_phase_string,
+                                                                                      self._next_green_string)
 
         self._amber_timer = amber_phase_length
         self._current_phase_string = amberPhaseString
@@ -289,7 +280,10 @@ class IntersectionController:
         traci.trafficlights.setRedYellowGreenState(self._id, self._current_phase_string)
 
     # Main update function
-    def update(self, step, step_length):
+    def update(self, step, step_length, decide=True):
+        """Advances the timers of the intersection by one step. When the green phase ends and decide is False,
+        the phase is not chosen here: update returns True and the caller passes the chosen phase to
+        change_phase (see IntersectionControllerContainer.use_batched_phase_selection)"""
 
         # If the traffic light is in an amber phase and amber timer has reached zero. Go into the green phase.
         if not (self._state) and self._amber_timer <= 0:
@@ -303,41 +297,10 @@ class IntersectionController:
         # Else if the traffic light is in the green phase and the green timer has reached zero. Update all variables
         # and calculate the new green time and phase. Then switch into the amber phase.
         elif self._state and self._green_timer <= 0:
-            # ORDER IS IMPORTANT IN THIS SECTION. DO NOT REORDER WITHOUT FULL UNDERSTANDING OF THE CHANGES TO OBJECT PROPERTIES.
-            # Update the queue lengths at each link
-            self.update_queues()
-            # Update the capacities of each exit lane
-            self.update_capacities()
-            # Update the number of vehicles which were cleared during the last green phase
-            self.update_b_compare()
-            # Update the green time for the links used in the last phase
-            self.update_green_time(step)
-            # Update the time step when the phase was changed
-            # self._updateGtRecords_greenTime()
-            # self.updateGtRecords_changeStep(step)
-
-            # Update the queues to be set to green in the next phase
-            self.choose_queues_to_release()
-            # Update the target number of vehicles to be removed during the next phase
-            self.update_a()
-
-            # Update the green timer according to the queues to be unlocked
-            self.set_green_timer()
-            # Update the green string according to the queue
-            self.set_green_string()
-
-            # Set queues for which the outgoing lane is congested to red (discontinued due to poor performance)
-            # self.setCongestedLanes2Red()   # Turned off the lane closing behaviour as it caused long queues at green lights
-
-            # Set the amber phase according to the next green phase
-            self.set_amber_phase()
-
-            # Transmit the settings to SUMO
-            self.send_tls_settings_to_sumo()
-
-            # Set the state of the intersection to false, indicating the start of the amber phase
-            self.reset_b()
-            self._state = False
+            self.prepare_phase_change(step)
+            if not decide:
+                return True
+            self.change_phase()
 
         # Else if the traffic light is in a green phase and the green timer is not finished, decrement the green timer
         elif self._state and self._green_timer > 0:
@@ -346,6 +309,56 @@ class IntersectionController:
         # Catch all to check for logical errors
         else:
             print("Something wrong in update phase logic")
+        return False
+
+    def advance_timers(self, step_length):
+        """Counts the timer of the current phase down as update does on each step until it runs out, without the
+        updates in between, and returns the number of those steps (see scheduler)"""
+        if self._state:
+            steps, self._green_timer = scheduler.steps_until_expired(self._green_timer, step_length)
+        else:
+            steps, self._amber_timer = scheduler.steps_until_expired(self._amber_timer, step_length)
+        return steps
+
+    def prepare_phase_change(self, step):
+        """Measures the state the next phase is chosen on, at the end of a green phase"""
+        # ORDER IS IMPORTANT IN THIS SECTION. DO NOT REORDER WITHOUT FULL UNDERSTANDING OF THE CHANGES TO OBJECT PROPERTIES.
+        # Update the queue lengths at each link
+        self.update_queues()
+        # Update the capacities of each exit lane
+        self.update_capacities()
+        # Update the number of vehicles which were cleared during the last green phase
+        self.update_b_compare()
+        # Update the green time for the links used in the last phase
+        self.update_green_time(step)
+        # Update the time step when the phase was changed
+        # self._updateGtRecords_greenTime()
+        # self.updateGtRecords_changeStep(step)
+
+    def change_phase(self, phase_index=None):
+        """Switches to the given phase (or the one picked by the queue controller) through an amber phase"""
+        # Update the queues to be set to green in the next phase
+        self.choose_queues_to_release(phase_index)
+        # Update the target number of vehicles to be removed during the next phase
+        self.update_a()
+
+        # Update the green timer according to the queues to be unlocked
+        self.set_green_timer()
+        # Update the green string according to the queue
+        self.set_green_string()
+
+        # Set queues for which the outgoing lane is congested to red (discontinued due to poor performance)
+        # self.setCongestedLanes2Red()   # Turned off the lane closing behaviour as it caused long queues at green lights
+
+        # Set the amber phase according to the next green phase
+        self.set_amber_phase()
+
+        # Transmit the settings to SUMO
+        self.send_tls_settings_to_sumo()
+
+        # Set the state of the intersection to false, indicating the start of the amber phase
+        self.reset_b()
+        self._state = False
 
     def debug(self):
         pass
@@ -354,14 +367,17 @@ class IntersectionController:
 
     # Get functions
 
+    def get_id(self):
+        return self._id
+
     def get_num_queues(self):
         return self._num_queues
 
-    def get_phase_matrix_by_link_index(self, get_object_in_memory=False):
+    def get_phase_matrix_by_link_index(self, get_object_in_memory=False, warn=True):
         if not get_object_in_memory:
             return self._phase_matrix_by_link_index.copy()
         else:
-            print("WARNING: retreiving object in memory may result in accidental altering of contents (phase_matrix_by_link_index)")
+            if warn: print("WARNING: retreiving object in memory may result in accidental altering of contents (phase_matrix_by_link_index)")
             return self._phase_matrix_by_link_index
 
     def get_queues(self, get_object_in_memory=False):
@@ -429,6 +445,9 @@ class IntersectionController:
     def get_mu(self, lane):
         return self._mu[lane]
 
+    def in_green_phase(self):
+        return self._state
+
     def get_current_open_lanes(self):
         return self._current_open_lanes
 
@@ -436,7 +455,9 @@ class IntersectionController:
         route = traci.vehicle.getRoute(veh_id)
         return route.pop()
 
-    def get_next_edge(self, veh_id):
+    def get_next_edge(self, veh_id, in_lane=None):
+        if self._route_cache is not None:
+            return self._route_cache.get_next_edge(veh_id, vehicle_routes.edge_of_lane(in_lane) if in_lane else None)
         current_edge = traci.vehicle.getRoadID(veh_id)
         route = traci.vehicle.getRoute(veh_id)
         list_indicies = [list_index for list_index, edge in enumerate(route) if edge == current_edge]
@@ -452,7 +473,7 @@ class IntersectionController:
                 return out_edge
 
     def get_veh_link_index(self, in_lane, veh_id):
-        out_edge = self.get_next_edge(veh_id)
+        out_edge = self.get_next_edge(veh_id, in_lane)
         if out_edge:
             try:
                 index = self._in_lane_and_out_edge_to_link_index[in_lane][out_edge]
@@ -469,13 +490,13 @@ class IntersectionController:
             return self._in_lane_and_out_edge_to_link_index[in_lane].values()
 
     def get_veh_turning_direction(self, in_lane, veh_id):
-        out_edge = self.get_next_edge(veh_id)
+        out_edge = self.get_next_edge(veh_id, in_lane)
         return self._link_index_to_turning_direction[int(self._in_lane_and_out_edge_to_link_index[in_lane][out_edge])]
 
     def get_queue_length_per_link_index(self):
         veh_link_indexes = []
         for lane_id in self._incoming_lanes:
-            veh_ids = traci.lane.getLastStepVehicleIDs(lane_id)
+            veh_ids = self._lane_state.get_vehicle_ids(lane_id)
             new_indexes = [self.get_veh_link_index(lane_id, veh) for veh in veh_ids]
             if new_indexes :
                 new_indexes_flattened = [item for sublist in new_indexes for item in sublist]
@@ -488,7 +509,7 @@ class IntersectionController:
         waiting_times = [0] * self._num_queues
 
         for lane in self._incoming_lanes:
-            for veh in traci.lane.getLastStepVehicleIDs(lane):
+            for veh in self._lane_state.get_vehicle_ids(lane):
                 self.get_veh_link_index(lane, veh)
                 waiting_times[self.get_veh_link_index(lane, veh)[0]] += traci.vehicle.getWaitingTime(veh)
 
@@ -504,16 +525,93 @@ class IntersectionController:
         print("lambda", self._lambda)
 
 
-class IntersectionControllerContainer:
+class IntersectionControllerContainerBase:
+
+    """The features shared by the intersection controller containers, which only differ in the phase matrices they
+    read from the net file"""
+
+    def __init__(self):
+        self._intersection_controller_container = defaultdict(IntersectionController)
+        self._phase_selector = None
+        self._route_cache = None
+        self._scheduler = None
+
+    def use_batched_phase_selection(self):
+        """Chooses the phases of all intersections due a decision in one go (see phase_selection). Call after all
+        intersection controllers have been added, they must use a (congestion aware) max queue length controller"""
+        self._phase_selector = phase_selection.BatchedPhaseSelector(
+            list(self._intersection_controller_container.itervalues()))
+
+    def subscribe_to_lane_states(self, net_file):
+        """Subscribes once to the incoming and outgoing lanes of all intersections, the intersections then read the
+        lane values from the subscription results instead of asking SUMO lane by lane"""
+        lanes = set()
+        for intersection_controller in self._intersection_controller_container.itervalues():
+            lanes.update(intersection_controller.get_incoming_lanes())
+            lanes.update(intersection_controller.get_outgoing_lanes())
+        state = lane_state.SubscribedLaneState(net_file, lanes)
+        for intersection_controller in self._intersection_controller_container.itervalues():
+            intersection_controller.set_lane_state(state)
+
+    def use_route_cache(self, vehicle_container=None):
+        """Keeps the routes of all vehicles so the intersections find the next edge of their queued vehicles without
+        asking SUMO. Call after all intersection controllers have been added. Routes set by our own code have to go
+        through the cache: a vehicle_container (sumoRouter.vehObj.vehObjContainer) rerouting vehicles in the same run
+        is given the cache to set its routes through"""
+        self._route_cache = vehicle_routes.VehicleRouteCache()
+        for intersection_controller in self._intersection_controller_container.itervalues():
+            intersection_controller.set_route_cache(self._route_cache)
+        if vehicle_container is not None:
+            vehicle_container.set_route_cache(self._route_cache)
+
+    def get_route_cache(self):
+        """The cache of use_route_cache (None before). Code which changes vehicle routes has to go through its
+        set_route"""
+        return self._route_cache
+
+    def use_scheduler(self):
+        """Updates each intersection only on the steps its amber or green phase runs out (see scheduler), instead of
+        every intersection on every step. Call after all intersection controllers have been added"""
+        self._scheduler = scheduler.IntersectionScheduler(list(self._intersection_controller_container.itervalues()))
+
+    def update_intersection_controllers(self, step, step_length):
+        if self._route_cache is not None:
+            self._route_cache.update()
+
+        if self._scheduler is not None:
+            scheduled = self._scheduler.start_step()
+            intersection_controllers = [intersection_controller for index, intersection_controller in scheduled]
+        else:
+            intersection_controllers = self._intersection_controller_container.itervalues()
+
+        if self._phase_selector is None:
+            for intersection_controller in intersection_controllers:
+                intersection_controller.update(step, step_length)
+        else:
+            intersection_controllers_to_change = []
+            for intersection_controller in intersection_controllers:
+                if intersection_controller.update(step, step_length, decide=False):
+                    self._phase_selector.update_state(intersection_controller)
+                    intersection_controllers_to_change.append(intersection_controller)
+
+            best_phases = self._phase_selector.best_queue_sets(intersection_controllers_to_change)
+            for intersection_controller, phase_index in zip(intersection_controllers_to_change, best_phases):
+                intersection_controller.change_phase(phase_index)
+
+        if self._scheduler is not None:
+            self._scheduler.end_step(scheduled, step_length)
+
+    def print_details(self, tls_id):
+
+        self._intersection_controller_container[tls_id].print_details()
+
+class IntersectionControllerContainer(IntersectionControllerContainerBase):
 
     def __str__(self):
         """Container object for all the traffic light controlled intesections in the network.
         Provides methods for automatically creating the intersection objects from net file and updating them
         simultaneously during a simulation"""
 
-    def __init__(self):
-        self._intersection_controller_container = defaultdict(IntersectionController)
-
     def add_intersection_controller(self,
                                     tls_id, inc_lanes_by_index, out_lanes_by_index,
                                     phase_matrix_by_link_index, phase_strings, x_star,
@@ -526,13 +624,18 @@ class IntersectionControllerContainer:
 
         self._intersection_controller_container[tls_id] = new_ic
 
-    def add_intersection_controllers_from_net_file(self, net_file, x_star, green_time_controller, queue_controller, step_length, default_amber_phase_length=4, exclude=[]):
+    def add_intersection_controllers_from_net_file(self, net_file, x_star, green_time_controller, queue_controller, step_length, default_amber_phase_length=4, exclude=[], topology_cache_dir=None):
         """Read a net file and create intersection controllers for every traffic light controlled intersection
-        add a green time controller and a queue controller for each traffic light"""
+        add a green time controller and a queue controller for each traffic light. The topology of the traffic lights
+        is cached in topology_cache_dir if given (see tls_logic.get_tls_topology_from_net_file)"""
 
-        [TLS_L, TLS_phases] = tls_logic.get_compatible_lanes_matrix_and_phases_from_net_file(net_file)
-        [TLS_in_lanes, TLS_out_lanes] = tls_logic.get_in_out_lanes_to_index(net_file)
-        [TLS_dirs, TLS_lane2index] = tls_logic.get_connection_to_turn_defs(net_file)
+        topology = tls_logic.get_tls_topology_from_net_file(net_file, cache_dir=topology_cache_dir)
+        TLS_L = topology['L']
+        TLS_phases = topology['phases']
+        TLS_in_lanes = topology['in_lanes']
+        TLS_out_lanes = topology['out_lanes']
+        TLS_dirs = topology['directions']
+        TLS_lane2index = topology['link_index_by_in_lane_and_out_edge']
 
         TLS_IDs = TLS_L.keys()
 
@@ -549,24 +652,13 @@ class IntersectionControllerContainer:
                                                  phase_matrix_by_link_index, phase_strings, x_star,
                                                  green_time_controller, queue_controller, dirs, lane2index, step_length, default_amber_phase_length=default_amber_phase_length)
 
-    def update_intersection_controllers(self, step, step_length):
-        for intersection_controller in self._intersection_controller_container.itervalues():
-            intersection_controller.update(step, step_length)
-
-    def print_details(self, tls_id):
-
-        self._intersection_controller_container[tls_id].print_details()
-
-class IntersectionControllerContainer_discountedIfGivingWay:
+class IntersectionControllerContainer_discountedIfGivingWay(IntersectionControllerContainerBase):
 
     def __str__(self):
         """Container object for all the traffic light controlled intesections in the network.
         Provides methods for automatically creating the intersection objects from net file and updating them
         simultaneously during a simulation"""
 
-    def __init__(self):
-        self._intersection_controller_container = defaultdict(IntersectionController)
-
     def add_intersection_controller(self,
                                     tls_id, inc_lanes_by_index, out_lanes_by_index,
                                     phase_matrix_by_link_index, phase_strings, x_star,
@@ -579,13 +671,18 @@ class IntersectionControllerContainer_discountedIfGivingWay:
 
         self._intersection_controller_container[tls_id] = new_ic
 
-    def add_intersection_controllers_from_net_file(self, net_file, x_star, green_time_controller, queue_controller, step_length, default_amber_phase_length = 4, exclude=[]):
+    def add_intersection_controllers_from_net_file(self, net_file, x_star, green_time_controller, queue_controller, step_length, default_amber_phase_length = 4, exclude=[], topology_cache_dir=None):
         """Read a net file and create intersection controllers for every traffic light controlled intersection
-        add a green time controller and a queue controller for each traffic light"""
+        add a green time controller and a queue controller for each traffic light. The topology of the traffic lights
+        is cached in topology_cache_dir if given (see tls_logic.get_tls_topology_from_net_file)"""
 
-        [TLS_L, TLS_phases] = tls_logic.get_compatible_lanes_matrix_and_phases_with_giveway_discount_from_net_file(net_file)
-        [TLS_in_lanes, TLS_out_lanes] = tls_logic.get_in_out_lanes_to_index(net_file)
-        [TLS_dirs, TLS_lane2index] = tls_logic.get_connection_to_turn_defs(net_file)
+        topology = tls_logic.get_tls_topology_from_net_file(net_file, cache_dir=topology_cache_dir)
+        TLS_L = topology['L_giveway_discount']
+        TLS_phases = topology['phases']
+        TLS_in_lanes = topology['in_lanes']
+        TLS_out_lanes = topology['out_lanes']
+        TLS_dirs = topology['directions']
+        TLS_lane2index = topology['link_index_by_in_lane_and_out_edge']
 
         TLS_IDs = TLS_L.keys()
 
@@ -602,14 +699,6 @@ class IntersectionControllerContainer_discountedIfGivingWay:
                                                  phase_matrix_by_link_index, phase_strings, x_star,
                                                  green_time_controller, queue_controller, dirs, lane2index, step_length, default_amber_phase_length)
 
-    def update_intersection_controllers(self, step, step_length):
-        for intersection_controller in self._intersection_controller_container.itervalues():
-            intersection_controller.update(step, step_length)
-
-    def print_details(self, tls_id):
-
-        self._intersection_controller_container[tls_id].print_details()
-
 if __name__ == "__main__":
 
     import sys, os, subprocess
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import traci
+import traci.constants as tc
+from sumolib import net
+
+# The lane variables the intersection controllers read every decision
+LANE_VARIABLES = (tc.LAST_STEP_VEHICLE_ID_LIST, tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_LENGTH)
+
+
+class DirectLaneState:
+
+    def __init__(self):
+        """ Lane state read from SUMO with one traci call per value (one round trip each) """
+
+    def __repr__(self):
+        return "Direct Lane State"
+
+    def get_vehicle_ids(self, lane):
+        return traci.lane.getLastStepVehicleIDs(lane)
+
+    def get_vehicle_number(self, lane):
+        return traci.lane.getLastStepVehicleNumber(lane)
+
+    def get_mean_vehicle_length(self, lane):
+        return traci.lane.getLastStepLength(lane)
+
+    def get_length(self, lane):
+        return traci.lane.getLength(lane)
+
+
+class SubscribedLaneState:
+
+    def __init__(self, net_file, lanes):
+        """ Lane state served from traci subscriptions. Every lane is subscribed once, after that SUMO sends the values
+        of all lanes with the answer to each simulation step, so reading them costs no round trips. Lane lengths do not
+        change and are read from the net file """
+
+        self._lanes = set(lanes)
+        netObj = net.readNet(net_file)
+        self._lane_lengths = {}
+        for edge in netObj.getEdges():
+            for lane in edge.getLanes():
+                if lane.getID() in self._lanes:
+                    self._lane_lengths[lane.getID()] = lane.getLength()
+
+        for lane in self._lanes:
+            traci.lane.subscribe(lane, LANE_VARIABLES)
+
+    def __repr__(self):
+        return "Subscribed Lane State"
+
+    def _get(self, lane, variable):
+        results = traci.lane.getSubscriptionResults(lane)
+        if results is None:
+            raise KeyError("No subscription results for lane %s, it is not subscribed or has left the simulation" % lane)
+        return results[variable]
+
+    def get_lanes(self):
+        return self._lanes
+
+    def get_vehicle_ids(self, lane):
+        return self._get(lane, tc.LAST_STEP_VEHICLE_ID_LIST)
+
+    def get_vehicle_number(self, lane):
+        return self._get(lane, tc.LAST_STEP_VEHICLE_NUMBER)
+
+    def get_mean_vehicle_length(self, lane):
+        return self._get(lane, tc.LAST_STEP_LENGTH)
+
+    def get_length(self, lane):
+        return self._lane_lengths[lane]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import numpy as np
+import random
+import controllers
+
+
+class BatchedPhaseSelector:
+
+    def __init__(self, intersection_controllers):
+        """ Chooses the next phase for many intersections at once. Does the same as LmaxQueueController and
+        CongestionAwareLmaxQueueController, but the phase matrices of all intersections are stacked (padded to the
+        largest intersection) so the queue products of every intersection due a decision take a few numpy operations.
+        Ties are still broken with random.choice, once per intersection and in the given order, so a run gives the
+        same phases as with the per intersection controllers."""
+
+        self._row_by_tls_id = {}
+        self._num_queues = []
+        self._num_phases = []
+        congestion_aware = []
+
+        for row, intersection_controller in enumerate(intersection_controllers):
+            queue_controller = intersection_controller._queueControl
+            if isinstance(queue_controller, controllers.CongestionAwareLmaxQueueController):
+                congestion_aware.append(True)
+            elif isinstance(queue_controller, controllers.LmaxQueueController):
+                congestion_aware.append(False)
+            else:
+                raise ValueError("%s uses %s, only the max queue length controllers can choose phases in a batch"
+                                 % (intersection_controller._id, queue_controller))
+            phases = intersection_controller._phase_matrix_by_link_index
+            self._row_by_tls_id[intersection_controller._id] = row
+            self._num_phases.append(len(phases))
+            self._num_queues.append(intersection_controller.get_num_queues())
+
+        num_intersections = len(self._num_phases)
+        max_phases = max(self._num_phases) if num_intersections else 0
+        max_queues = max(self._num_queues) if num_intersections else 0
+
+        # Phases of smaller intersections are padded with zeros, padded phases are never chosen
+        self._phases = np.zeros([num_intersections, max_phases, max_queues])
+        self._is_padding = np.ones([num_intersections, max_phases], dtype=bool)
+        for row, intersection_controller in enumerate(intersection_controllers):
+            phases = intersection_controller._phase_matrix_by_link_index
+            self._phases[row, :len(phases), :phases.shape[1]] = phases
+            self._is_padding[row, :len(phases)] = False
+
+        self._congestion_aware = np.array(congestion_aware, dtype=bool)
+        self._queues = np.zeros([num_intersections, max_queues])
+        self._capacities = np.zeros([num_intersections, max_queues])
+
+    def __repr__(self):
+        return "Batched Max Queue Length Phase Selector"
+
+    def update_state(self, intersection_controller):
+        """Copies the current queue lengths and outgoing capacities of the intersection into the shared arrays"""
+        row = self._row_by_tls_id[intersection_controller._id]
+        num_queues = self._num_queues[row]
+        self._queues[row, :num_queues] = intersection_controller._queue_lengths_by_link_index
+        self._capacities[row, :num_queues] = intersection_controller._outgoing_lane_capacities_by_link_index
+
+    def best_queue_sets(self, intersection_controllers):
+        """Returns the best phase index of each intersection controller, in the given order"""
+
+        if not intersection_controllers:
+            return []
+
+        rows = np.array([self._row_by_tls_id[intersection_controller._id]
+                         for intersection_controller in intersection_controllers])
+
+        # Queues with nowhere to go do not count for the congestion aware intersections
+        queue_weights = self._queues[rows]
+        congested = self._congestion_aware[rows, np.newaxis] & (self._capacities[rows] < 1)
+        queue_weights[congested] = 0
+
+        phase_scores = np.einsum('ipq,iq->ip', self._phases[rows], queue_weights)
+        phase_scores[self._is_padding[rows]] = -np.inf
+
+        # Every phase which ties for the maximum is a candidate, np.nonzero lists them row by row
+        candidates = phase_scores == phase_scores.max(axis=1)[:, np.newaxis]
+        candidate_rows, candidate_phases = np.nonzero(candidates)
+        ends = np.cumsum(np.bincount(candidate_rows, minlength=len(rows)))
+
+        best_phases = []
+        start = 0
+        for end in ends:
+            best_phases.append(random.choice(candidate_phases[start:end]))
+            start = end
+
+        return best_phases
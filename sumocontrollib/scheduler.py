@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import heapq
+from itertools import chain
+
+
+def steps_until_expired(timer, step_length):
+    """Number of times step_length has to be taken off the timer until it reaches zero, and what is left of it then.
+    The subtraction is repeated instead of divided so the result is exactly the one of decrementing every step"""
+    if step_length <= 0:
+        raise ValueError("step_length has to be positive, got %s" % step_length)
+    steps = 0
+    while timer > 0:
+        timer -= step_length
+        steps += 1
+    return steps, timer
+
+
+class IntersectionScheduler:
+
+    def __init__(self, intersection_controllers):
+        """ Wakes intersection controllers only at the steps their amber or green phase runs out, instead of updating
+        every intersection every step to count its timers down. The next wake up of each intersection is kept in a
+        heap. Intersections due on the same step are woken in the order they were given, so the random choices they
+        make come in the same order as when all are updated. The only work left for the other intersections is the
+        count of the vehicles leaving and entering the open lanes (update_b_compare). It is done in a single loop over
+        the open lanes of all green intersections (IntersectionController.count_lane), which is kept as a flat list
+        and only rebuilt when an intersection turns green or is woken"""
+
+        self._tick = 0
+        self._heap = [(0, index, intersection_controller)
+                      for index, intersection_controller in enumerate(intersection_controllers)]
+        heapq.heapify(self._heap)
+        self._green_lanes = {}  # index -> (controller, lane) of the open lanes of the green intersections not due
+        self._b_compare_lanes = []  # the lanes of all of them, None when it has to be rebuilt
+
+    def __repr__(self):
+        return "Intersection Scheduler (step %d, %d intersections)" % (self._tick, len(self._heap))
+
+    def start_step(self):
+        """Returns the intersection controllers due an update this step and does the bookkeeping of the others"""
+        due = []
+        while self._heap and self._heap[0][0] <= self._tick:
+            due.append(heapq.heappop(self._heap))
+
+        for wake_tick, index, intersection_controller in due:
+            if self._green_lanes.pop(index, None) is not None:
+                self._b_compare_lanes = None
+
+        if self._b_compare_lanes is None:
+            self._b_compare_lanes = list(chain.from_iterable(self._green_lanes.itervalues()))
+        self._update_b_compare()
+
+        return [(index, intersection_controller) for wake_tick, index, intersection_controller in due]
+
+    def end_step(self, updated, step_length):
+        """Schedules the intersections updated this step for the step their current phase runs out"""
+        for index, intersection_controller in updated:
+            steps = intersection_controller.advance_timers(step_length)
+            if intersection_controller.in_green_phase():
+                self._green_lanes[index] = [(intersection_controller, lane)
+                                            for lane in intersection_controller.get_current_open_lanes()]
+                self._b_compare_lanes = None
+            # The timer is counted down on the steps after this one, it is checked again on the step after that
+            heapq.heappush(self._heap, (self._tick + steps + 1, index, intersection_controller))
+        self._tick += 1
+
+    def _update_b_compare(self):
+        """update_b_compare of all green intersections not due an update"""
+        for intersection_controller, lane in self._b_compare_lanes:
+            intersection_controller.count_lane(lane)
@@ -1,5 +1,6 @@
 from sumolib import net
 from collections import defaultdict
+import os, hashlib, pickle
 
 def print_output(func):
     def wrapper(*args, **kwargs):
@@ -8,44 +9,36 @@ def print_output(func):
         return output
     return wrapper
 
+# Bump when the contents of the topology change, so older cache files are not used
+TLS_TOPOLOGY_CACHE_VERSION = 1
+
 def get_compatible_lanes_matrix_and_phases_from_net_file(net_file):
     """reads the given net file and returns a dict with TLS ids as the keys and matrices containing the L matrix and
     the phase settings"""
     netObj = net.readNet(net_file, withPrograms=True)
 
-    TLS_phases = {}
-    TLS_L = {}
+    return get_compatible_lanes_matrix_and_phases(netObj)
 
-    for TLS in netObj._tlss:
+def get_compatible_lanes_matrix_and_phases_with_giveway_discount_from_net_file(net_file):
+    """reads the given net file and returns a dict with TLS ids as the keys and matrices containing the L matrix and
+    the phase settings"""
+    netObj = net.readNet(net_file, withPrograms=True)
 
-        TLS_ID = TLS.getID()
+    return get_compatible_lanes_matrix_and_phases(netObj, giveway_discount=True)
 
-        phases = []
-        for program in TLS._programs:
-            for phase_settings, _ in TLS._programs[program]._phases:
-                if 'G' in phase_settings or 'g' in phase_settings:
-                    ammended_phase = [letter if letter == 'G' or letter == 'g' else 'r' for letter in phase_settings]
-                    if ammended_phase not in phases : phases.append(ammended_phase)
-
-        L = []
-        for index, phase in enumerate(phases):
-            L.append([])
-            for letter in list(phase):
-                if letter == 'r':
-                    L[index].append(0)
-                else:
-                    L[index].append(1)
+def get_in_out_lanes_to_index(net_file):
+    netObj = net.readNet(net_file, withPrograms=True)
 
-        TLS_phases.update({TLS_ID: phases})
-        TLS_L.update({TLS_ID: L})
+    return get_in_out_lanes_to_index_from_net(netObj)
 
-    return TLS_L, TLS_phases
+def get_connection_to_turn_defs(net_file):
+    netObj = net.readNet(net_file, withConnections=True)
 
-def get_compatible_lanes_matrix_and_phases_with_giveway_discount_from_net_file(net_file):
-    """reads the given net file and returns a dict with TLS ids as the keys and matrices containing the L matrix and
-    the phase settings"""
-    netObj = net.readNet(net_file, withPrograms=True)
+    return get_connection_to_turn_defs_from_net(netObj)
 
+def get_compatible_lanes_matrix_and_phases(netObj, giveway_discount=False):
+    """returns a dict with TLS ids as the keys and matrices containing the L matrix and the phase settings of the
+    given sumolib net (read with programs). With the giveway discount, links which have to give way count a quarter"""
     TLS_phases = {}
     TLS_L = {}
 
@@ -66,9 +59,9 @@ def get_compatible_lanes_matrix_and_phases_with_giveway_discount_from_net_file(n
             for letter in list(phase):
                 if letter == 'r':
                     L[index].append(0)
-                elif letter == 'g':
+                elif letter == 'g' and giveway_discount:
                     L[index].append(0.25)
-                elif letter == 'G':
+                else:
                     L[index].append(1)
 
         TLS_phases.update({TLS_ID: phases})
@@ -76,9 +69,7 @@ def get_compatible_lanes_matrix_and_phases_with_giveway_discount_from_net_file(n
 
     return TLS_L, TLS_phases
 
-def get_in_out_lanes_to_index(net_file):
-    netObj = net.readNet(net_file, withPrograms=True)
-
+def get_in_out_lanes_to_index_from_net(netObj):
     TLS_in_lanes = {}
     TLS_out_lanes = {}
 
@@ -98,9 +89,7 @@ def get_in_out_lanes_to_index(net_file):
 
     return TLS_in_lanes, TLS_out_lanes
 
-def get_connection_to_turn_defs(net_file):
-    netObj = net.readNet(net_file, withConnections=True)
-
+def get_connection_to_turn_defs_from_net(netObj):
     TLS_directions_by_link_index =  defaultdict(dict)
     TLS_link_index_by_in_lane_and_out_edge = defaultdict(dict)
 
@@ -129,6 +118,58 @@ def get_connection_to_turn_defs(net_file):
 
     return TLS_directions_by_link_index, TLS_link_index_by_in_lane_and_out_edge
 
+def get_net_file_hash(net_file):
+    """sha1 of the contents of the net file"""
+    digest = hashlib.sha1()
+    with open(net_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_tls_topology_from_net_file(net_file, cache_dir=None):
+    """reads the net file once and returns everything the intersection controllers need about its traffic lights in a
+    dict, each entry again keyed by TLS id:
+        'L', 'phases'                  L matrices and phase settings (get_compatible_lanes_matrix_and_phases...)
+        'L_giveway_discount'           L matrices where links that give way count a quarter
+        'in_lanes', 'out_lanes'        lanes by link index (get_in_out_lanes_to_index)
+        'directions', 'link_index_by_in_lane_and_out_edge'      (get_connection_to_turn_defs)
+    If a cache directory is given the topology is kept there under the hash of the net file, so later runs on the
+    same network do not read it again"""
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, "%s-%d.tls.pkl" % (get_net_file_hash(net_file), TLS_TOPOLOGY_CACHE_VERSION))
+        if os.path.exists(cache_file):
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+
+    netObj = net.readNet(net_file, withPrograms=True)
+
+    TLS_L, TLS_phases = get_compatible_lanes_matrix_and_phases(netObj)
+    TLS_L_giveway_discount, _ = get_compatible_lanes_matrix_and_phases(netObj, giveway_discount=True)
+    TLS_in_lanes, TLS_out_lanes = get_in_out_lanes_to_index_from_net(netObj)
+    TLS_dirs, TLS_lane2index = get_connection_to_turn_defs_from_net(netObj)
+
+    topology = {'L': TLS_L,
+                'phases': TLS_phases,
+                'L_giveway_discount': TLS_L_giveway_discount,
+                'in_lanes': TLS_in_lanes,
+                'out_lanes': TLS_out_lanes,
+                'directions': TLS_dirs,
+                'link_index_by_in_lane_and_out_edge': TLS_lane2index}
+
+    if cache_dir is not None:
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            if not os.path.isdir(cache_dir):
+                raise
+        # Written under a temporary name first, runs started together may build the same cache file
+        temporary_file = "%s.%d.tmp" % (cache_file, os.getpid())
+        with open(temporary_file, 'wb') as f:
+            pickle.dump(topology, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(temporary_file, cache_file)
+
+    return topology
+
 
 
 
@@ -2,9 +2,11 @@ from __future__ import division
 import numpy as np
 import traci
 import tls_logic
+import vehicle_routes
+import amber_phases
+import lane_state
 from blueCrystalFuncs import checkPorts
 import os, sys, subprocess
-from sumolib import net
 
 from collections import defaultdict, Counter
 
@@ -32,7 +34,9 @@ def get_first_cars_in_lane_and_lane_queue(network_intersection_ids, network_inte
 
     return network_intersection_first_cars, network_intersection_queue_by_lane
 
-def get_next_edge(veh_id):
+def get_next_edge(veh_id, in_lane=None, route_cache=None):
+    if route_cache is not None:
+        return route_cache.get_next_edge(veh_id, vehicle_routes.edge_of_lane(in_lane) if in_lane else None)
     current_edge = traci.vehicle.getRoadID(veh_id)
     route = traci.vehicle.getRoute(veh_id)
     list_indicies = [list_index for list_index, edge in enumerate(route) if edge == current_edge]
@@ -47,7 +51,7 @@ def get_next_edge(veh_id):
             out_edge = remaining_route[1]
             return out_edge
 
-def get_queue_length_per_link_index(network_intersection_lanes, network_intersection_num_queue_indexes, link_index_by_in_lane_and_out_edge):
+def get_queue_length_per_link_index(network_intersection_lanes, network_intersection_num_queue_indexes, link_index_by_in_lane_and_out_edge, route_cache=None):
 
     network_intersection_queues_by_link_index = []
 
@@ -56,7 +60,7 @@ def get_queue_length_per_link_index(network_intersection_lanes, network_intersec
         veh_link_indexes = []
         for lane_index, lane in enumerate(intersection_lanes):
             veh_ids = traci.lane.getLastStepVehicleIDs(lane)
-            new_indexes = [get_veh_link_index(lane, veh, link_index_by_in_lane_and_out_edge) for veh in veh_ids]
+            new_indexes = [get_veh_link_index(lane, veh, link_index_by_in_lane_and_out_edge, route_cache) for veh in veh_ids]
             if new_indexes:
                 new_indexes_flattened = [item for sublist in new_indexes for item in sublist]
                 veh_link_indexes.extend(new_indexes_flattened)
@@ -70,8 +74,8 @@ def get_queue_length_per_link_index(network_intersection_lanes, network_intersec
 
     return network_intersection_queues_by_link_index
 
-def get_veh_link_index(lane_id, veh_id, link_index_by_in_lane_and_out_edge):
-    out_edge = get_next_edge(veh_id)
+def get_veh_link_index(lane_id, veh_id, link_index_by_in_lane_and_out_edge, route_cache=None):
+    out_edge = get_next_edge(veh_id, lane_id, route_cache)
     if out_edge:
         try:
             index = link_index_by_in_lane_and_out_edge[lane_id][out_edge]
@@ -87,7 +91,7 @@ def get_veh_link_index(lane_id, veh_id, link_index_by_in_lane_and_out_edge):
     else:
         return link_index_by_in_lane_and_out_edge[lane_id].values()
 
-def get_queue_indices_of_first_vehicles(network_intersection_lanes, network_intersection_first_cars, network_intersection_in_lane_and_out_edge_to_queue_index):
+def get_queue_indices_of_first_vehicles(network_intersection_lanes, network_intersection_first_cars, network_intersection_in_lane_and_out_edge_to_queue_index, route_cache=None):
 
     network_intersection_first_cars_queue_indicies = []
 
@@ -101,7 +105,7 @@ def get_queue_indices_of_first_vehicles(network_intersection_lanes, network_inte
 
             if first_car:
 
-                out_edge = get_next_edge(first_car)
+                out_edge = get_next_edge(first_car, in_lane, route_cache)
 
                 try:
                     index = network_intersection_in_lane_and_out_edge_to_queue_index[intersection_index][in_lane][out_edge]
@@ -206,70 +210,253 @@ def add_force_to_queues(network_intersection_ids, network_intersection_queues_by
 
 def get_intersection_amber_phase_strings(old_phase, new_phase):
 
-    amber_phase = []
-
-    if old_phase == new_phase:
-        amber_phase = new_phase
-    else:
-        for ii in range(0, len(old_phase)):
-            if old_phase[ii] == 'r' and new_phase[ii] == 'r':
-                amber_phase.append('r')
-            elif old_phase[ii] == 'r' and (new_phase[ii] == 'g' or new_phase[ii] == 'G'):
-                amber_phase.append('r')
-            elif (old_phase[ii] == 'g' or old_phase[ii] == 'G') and (new_phase[ii] == 'r'):
-                amber_phase.append('y')
-            elif (old_phase[ii] == 'g') and (new_phase[ii] == 'g'):
-                amber_phase.append('g')
-            elif old_phase[ii] == 'G' and new_phase[ii] == 'G':
-                amber_phase.append('G')
-            elif old_phase[ii] == 'g' and new_phase[ii] == 'G':
-                amber_phase.append('g')
-            elif old_phase[ii] == 'G' and new_phase[ii] == 'g':
-                amber_phase.append('G')
-            else:
-                print("Something wrong in amber phase logic. Old: %s, New: %s" % (old_phase[ii], new_phase[ii]))
-
-    intersection_amber_phase_as_string = "".join(amber_phase)
-
-    return intersection_amber_phase_as_string
+    return amber_phases.amber_phase_string(old_phase, new_phase)
 
 def get_network_intersection_amber_phase_strings(network_intersection_ids, network_intersection_previous_phase_strings, network_intersection_next_phase_strings):
 
     """ Sets the intermediate phase between green times. Returns the phase duration and traffic light string. """
-    network_intersection_amber_phase_strings = []
-
-    for intersection_index, intersection_id in enumerate(network_intersection_ids):
-
-        old_phase = list(network_intersection_previous_phase_strings[intersection_index])
-        new_phase = list(network_intersection_next_phase_strings[intersection_index])
-        amber_phase = []
+    return amber_phases.amber_phase_strings(network_intersection_previous_phase_strings, network_intersection_next_phase_strings)
+
+class TotalPressureController:
+
+    def __init__(self, net_file, green_stage_length=10, amber_stage_length=4, giveway_discount=True, exclude=[],
+                 topology_cache_dir=None):
+        """ Total pressure control of all the traffic lights of a network at once. Every green stage the queue behind
+        each link is found, the first car of each lane passes the queue of its lane on to the lanes downstream of it
+        (the force), and every intersection switches to the phase with the largest total of queues plus force over its
+        open links. All intersections switch at the same time, with an amber stage in between.
+        Everything about the network is turned into integer index arrays when the controller is made: lanes are
+        numbered once, the links of all intersections are laid end to end as one vector of queues, and the phases are
+        stacked into one padded array. The force and the choice of phase are then array operations over the whole
+        network, the only per vehicle work left is finding the link each vehicle is queued for """
+
+        tls_topology = tls_logic.get_tls_topology_from_net_file(net_file, cache_dir=topology_cache_dir)
+        TLS_L = tls_topology['L_giveway_discount'] if giveway_discount else tls_topology['L']
+
+        self._tls_ids = sorted(tls_id for tls_id in tls_topology['phases'] if tls_id not in exclude)
+        self._phase_strings = [["".join(phase) for phase in tls_topology['phases'][tls_id]] for tls_id in self._tls_ids]
+        self._green_stage_length = green_stage_length
+        self._amber_stage_length = amber_stage_length
+
+        # Links of every intersection laid end to end: link index k of intersection i is queue _queue_offsets[i] + k
+        num_links = [len(TLS_L[tls_id][0]) if TLS_L[tls_id] else 0 for tls_id in self._tls_ids]
+        self._queue_offsets = np.concatenate(([0], np.cumsum(num_links))).astype(int)
+        self._num_queues = int(self._queue_offsets[-1])
+
+        # Lanes are numbered with the incoming lanes of the intersections first, then the outgoing lanes that do not
+        # lead into another intersection
+        self._in_lanes = []
+        self._lane_numbers = {}
+        for tls_id in self._tls_ids:
+            for lane in tls_topology['in_lanes'][tls_id]:
+                if lane not in self._lane_numbers:
+                    self._lane_numbers[lane] = len(self._in_lanes)
+                    self._in_lanes.append(lane)
+        for tls_id in self._tls_ids:
+            for lane in tls_topology['out_lanes'][tls_id]:
+                if lane not in self._lane_numbers:
+                    self._lane_numbers[lane] = len(self._lane_numbers)
+        self._num_lanes = len(self._lane_numbers)
+
+        # In and out lane of every queue, and {in_lane : {out_edge : queue}} over the whole network
+        self._queue_in_lanes = -np.ones(self._num_queues, dtype=int)
+        self._queue_out_lanes = -np.ones(self._num_queues, dtype=int)
+        self._queues_by_in_lane_and_out_edge = {}
+        for tls_index, tls_id in enumerate(self._tls_ids):
+            offset = self._queue_offsets[tls_index]
+            for link_index, (in_lane, out_lane) in enumerate(zip(tls_topology['in_lanes'][tls_id],
+                                                                 tls_topology['out_lanes'][tls_id])):
+                if link_index < num_links[tls_index]:
+                    self._queue_in_lanes[offset + link_index] = self._lane_numbers[in_lane]
+                    self._queue_out_lanes[offset + link_index] = self._lane_numbers[out_lane]
+            for in_lane, out_edges in tls_topology['link_index_by_in_lane_and_out_edge'][tls_id].items():
+                self._queues_by_in_lane_and_out_edge[in_lane] = dict(
+                    (out_edge, offset + link_index) for out_edge, link_index in out_edges.items())
+
+        # Phases of all intersections stacked and padded to the same number of phases and links. Padding links are
+        # closed, padding phases are never chosen. _padded_queue_positions places the queue vector in the padding
+        max_phases = max([len(TLS_L[tls_id]) for tls_id in self._tls_ids] + [1])
+        max_links = max(num_links + [1])
+        self._L = np.zeros([len(self._tls_ids), max_phases, max_links])
+        self._phase_padding = np.ones([len(self._tls_ids), max_phases], dtype=bool)
+        for tls_index, tls_id in enumerate(self._tls_ids):
+            if TLS_L[tls_id]:
+                self._L[tls_index, :len(TLS_L[tls_id]), :num_links[tls_index]] = TLS_L[tls_id]
+                self._phase_padding[tls_index, :len(TLS_L[tls_id])] = False
+        self._padded_queue_positions = np.concatenate(
+            [tls_index * max_links + np.arange(num_links[tls_index]) for tls_index in range(len(self._tls_ids))] +
+            [np.zeros(0, dtype=int)]).astype(int)
+
+        self._lane_state = lane_state.DirectLaneState()
+        self._route_cache = None
+
+        self._stage = 'green'
+        self._counter = green_stage_length
+        self._current_phase_strings = [phases[0] if phases else "" for phases in self._phase_strings]
+
+    def __repr__(self):
+        return "Total Pressure Controller (%d intersections, %d queues)" % (len(self._tls_ids), self._num_queues)
+
+    def subscribe_to_lane_states(self, net_file):
+        """Subscribes once to the incoming lanes of all intersections, the vehicles on them are then read from the
+        subscription results instead of asking SUMO lane by lane"""
+        self._lane_state = lane_state.SubscribedLaneState(net_file, self._in_lanes)
+
+    def set_lane_state(self, state):
+        self._lane_state = state
+
+    def use_route_cache(self):
+        """Keeps the routes of all vehicles so the next edge of the queued vehicles is found without asking SUMO"""
+        self._route_cache = vehicle_routes.VehicleRouteCache()
+
+    def set_route_cache(self, route_cache):
+        self._route_cache = route_cache
+
+    def get_tls_ids(self):
+        return self._tls_ids
+
+    def get_current_phase_strings(self):
+        return self._current_phase_strings
+
+    def get_vehicle_queues(self, veh_id, in_lane):
+        """Returns the next edge of the vehicle on the in lane and the queues (indices into the queue vector) it counts
+        towards. A vehicle leaving the network after this lane counts towards every link of the lane"""
+        out_edge = get_next_edge(veh_id, in_lane, self._route_cache)
+        if not out_edge:
+            return out_edge, self._queues_by_in_lane_and_out_edge[in_lane].values()
+        try:
+            return out_edge, [self._queues_by_in_lane_and_out_edge[in_lane][out_edge]]
+        except KeyError:
+            for best_lane in traci.vehicle.getBestLanes(veh_id):
+                try:
+                    return out_edge, [self._queues_by_in_lane_and_out_edge[best_lane[0]][out_edge]]
+                except KeyError:
+                    pass
+        return out_edge, []
+
+    def get_lane_queues_and_queue_lengths(self):
+        """Returns the number of vehicles on each incoming lane, the queue of the first car of each lane (-1 if the
+        lane is empty or the queue of its first car is unknown) and the number of vehicles queued for each link"""
+        lane_queues = np.zeros(len(self._in_lanes), dtype=int)
+        first_car_queues = -np.ones(len(self._in_lanes), dtype=int)
+        vehicle_queues = []
+
+        for lane_number, lane in enumerate(self._in_lanes):
+            veh_ids = self._lane_state.get_vehicle_ids(lane)
+            lane_queues[lane_number] = len(veh_ids)
+            if not veh_ids:
+                continue
+            for veh_id in veh_ids[:-1]:
+                vehicle_queues.extend(self.get_vehicle_queues(veh_id, lane)[1])
+            # The first car is the last one on the lane, the one nearest the junction. It only has a queue if it
+            # does not leave the network after this lane
+            out_edge, queues = self.get_vehicle_queues(veh_ids[-1], lane)
+            vehicle_queues.extend(queues)
+            if out_edge and queues:
+                first_car_queues[lane_number] = queues[0]
+
+        queue_lengths = np.bincount(np.array(vehicle_queues, dtype=int), minlength=self._num_queues)
+        return lane_queues, first_car_queues, queue_lengths
+
+    def get_lane_forces(self, lane_queues, first_car_queues):
+        """Force on every lane (numbered as _lane_numbers): the sum of the queues of the lanes upstream of it. The
+        queue of a lane is passed on to the out lane of the link of its first car, and from there on along the links
+        of the first cars of the next lanes, for as long as those lanes have vehicles on them and until a lane is
+        reached a second time. All the chains are followed together, one lane further each pass"""
+        # The lane each queued lane passes its queue on to, -1 where the chain stops
+        next_lanes = -np.ones(self._num_lanes, dtype=int)
+        force = np.zeros(self._num_lanes)
+        queued = np.flatnonzero((lane_queues > 0) & (first_car_queues >= 0))
+        if not queued.size:
+            return force
+        source_lanes = self._queue_in_lanes[first_car_queues[queued]]
+        next_lanes[source_lanes] = self._queue_out_lanes[first_car_queues[queued]]
+        source_queues = np.zeros(self._num_lanes)
+        source_queues[source_lanes] = lane_queues[queued]
+
+        sources = np.flatnonzero(next_lanes >= 0)
+        weights = source_queues[sources]
+        positions = sources
+        visited = sources * self._num_lanes + sources
+        while sources.size:
+            positions = next_lanes[positions]
+            keys = sources * self._num_lanes + positions
+            first_visit = ~np.in1d(keys, visited)
+            sources, positions, weights, keys = \
+                sources[first_visit], positions[first_visit], weights[first_visit], keys[first_visit]
+            force += np.bincount(positions, weights, minlength=self._num_lanes)
+            visited = np.concatenate((visited, keys))
+
+            carry_on = next_lanes[positions] >= 0
+            sources, positions, weights = sources[carry_on], positions[carry_on], weights[carry_on]
+
+        return force
+
+    def get_queues_plus_force(self):
+        """Queue length of every link plus the force on the lane of the first car queued for it"""
+        lane_queues, first_car_queues, queue_lengths = self.get_lane_queues_and_queue_lengths()
+        force = self.get_lane_forces(lane_queues, first_car_queues)
+
+        queues_plus_force = queue_lengths.astype(float)
+        with_first_car = first_car_queues[first_car_queues >= 0]
+        np.add.at(queues_plus_force, with_first_car, force[self._queue_in_lanes[with_first_car]])
+        return queues_plus_force
+
+    def get_max_pressure_phases(self, queues_plus_force):
+        """Index of the phase with the largest total of queues over its open links at each intersection, the first
+        one on ties"""
+        padded_queues = np.zeros(self._L.shape[0] * self._L.shape[2])
+        padded_queues[self._padded_queue_positions] = queues_plus_force
+        padded_queues = padded_queues.reshape(self._L.shape[0], self._L.shape[2])
+
+        pressures = np.einsum('ipl,il->ip', self._L, padded_queues)
+        pressures[self._phase_padding] = -np.inf
+        return pressures.argmax(axis=1)
+
+    def choose_phases(self):
+        """Picks the next phase of every intersection and sets the amber phases leading to them"""
+        max_pressure_phases = self.get_max_pressure_phases(self.get_queues_plus_force())
+
+        previous_phase_strings = self._current_phase_strings
+        self._current_phase_strings = [phases[phase_index] if phases else ""
+                                       for phases, phase_index in zip(self._phase_strings, max_pressure_phases)]
+
+        amber_phase_strings = amber_phases.amber_phase_strings(previous_phase_strings, self._current_phase_strings)
+        for tls_id, amber_phase_string in zip(self._tls_ids, amber_phase_strings):
+            traci.trafficlights.setRedYellowGreenState(tls_id, amber_phase_string)
+
+    def update_intersection_controllers(self, step, step_length):
+        """Moves the network on by one step: green stage, amber stage (the phases are chosen as it starts), then the
+        chosen phases turn green. Call once after every simulation step"""
+        if self._route_cache is not None:
+            self._route_cache.update()
+
+        if self._stage == 'green':
+            self._counter -= step_length
+            if self._counter <= 0:
+                self._stage = 'switch_green_to_amber'
+                self._counter = self._amber_stage_length
+
+        elif self._stage == 'switch_green_to_amber':
+            self.choose_phases()
+            self._counter -= step_length
+            self._stage = 'amber'
+
+        elif self._stage == 'amber':
+            self._counter -= step_length
+            if self._counter <= 0:
+                self._stage = 'switch_amber_to_green'
+                self._counter = self._green_stage_length
+
+        elif self._stage == 'switch_amber_to_green':
+            for tls_id, phase_string in zip(self._tls_ids, self._current_phase_strings):
+                traci.trafficlights.setRedYellowGreenState(tls_id, phase_string)
+            self._stage = 'green'
+            self._counter -= step_length
 
-        if old_phase == new_phase:
-            amber_phase = new_phase
         else:
-            for ii in range(0, len(old_phase)):
-                if old_phase[ii] == 'r' and new_phase[ii] == 'r':
-                    amber_phase.append('r')
-                elif old_phase[ii] == 'r' and (new_phase[ii] == 'g' or new_phase[ii] == 'G'):
-                    amber_phase.append('r')
-                elif (old_phase[ii] == 'g' or old_phase[ii] == 'G') and (new_phase[ii] == 'r'):
-                    amber_phase.append('y')
-                elif (old_phase[ii] == 'g') and (new_phase[ii] == 'g'):
-                    amber_phase.append('g')
-                elif old_phase[ii] == 'G' and new_phase[ii] == 'G':
-                    amber_phase.append('G')
-                elif old_phase[ii] == 'g' and new_phase[ii] == 'G':
-                    amber_phase.append('g')
-                elif old_phase[ii] == 'G' and new_phase[ii] == 'g':
-                    amber_phase.append('G')
-                else:
-                    print("Something wrong in amber phase logic. Old: %s, New: %s" % (old_phase[ii], new_phase[ii]))
-
-        intersection_amber_phase_as_string = "".join(amber_phase)
-
-        network_intersection_amber_phase_strings.append(intersection_amber_phase_as_string)
-
-    return network_intersection_amber_phase_strings
+            print("error in stage logic.")
+
 
 if __name__ == "__main__":
 
@@ -277,57 +464,14 @@ if __name__ == "__main__":
 
     end_step = 7200
     step_length = 0.1
-    green_stage_length = 10 # Steps between computing the force driving each traffic light phase
+    green_stage_length = 10 # Time between computing the force driving each traffic light phase
     amber_stage_length = 4
-    counter = green_stage_length # Counters used to track when calculation should be done
 
     # net file
     net_file = "/Users/tb7554/PyCharmProjects/_618_Smallworld_Debug_/Net_XML_Files/Smallworld-10x10-1-Lane-TLS.net.xml"
 
-    # sumolib net object
-    network = net.readNet(net_file, withConnections=True, withPrograms=True)
-
-    # list of ids of the tls intersections in the network
-    network_intersection_ids = network._id2tls.keys()
-
-    # nxn matrix of compatible phases, and phase strings. returned as dictionaries with intersection_ids as keys
-    TLS_L, TLS_phases = tls_logic.get_compatible_lanes_matrix_and_phases_with_giveway_discount_from_net_file(net_file)
-
-    # translate dicts into lists in order of network_intersection_ids
-    network_intersection_l_matrix = [TLS_L[intersection_id] for intersection_id in network_intersection_ids]
-    network_intersection_phase_matrix = [TLS_phases[intersection_id] for intersection_id in network_intersection_ids]
-
-    # dictionary of {intersection_id : [in lanes with index equal to link index]}, and same dictinoary but with out lanes
-    network_intersection_in_lanes_to_indicies_dict, network_intersection_out_lanes_to_indicies_dict = tls_logic.get_in_out_lanes_to_index(net_file)
-
-    # convert dictionaries to lists in order of network_intersection_ids
-    network_intersection_in_lanes_to_indicies = [network_intersection_in_lanes_to_indicies_dict[intersection_id] for intersection_id in network_intersection_ids]
-    network_intersection_out_lanes_to_indicies = [network_intersection_out_lanes_to_indicies_dict[intersection_id] for
-                                                 intersection_id in network_intersection_ids]
-
-    # list of lists [[lane for every intersection] for every intersection in the network]
-    network_intersection_in_lanes = [[entry for entry in set(network_intersection_in_lanes_to_indicies_dict[intersection_id])] for intersection_id in network_intersection_ids]
-
-    # dictionary of {intersection {in_lane: {out_edge : link index}}}
-    _, link_index_by_intersection_id_in_lane_and_out_edge_dict = tls_logic.get_connection_to_turn_defs(net_file)
-    # reordered to be in the same order as network_intersection_ids
-    network_intersection_in_lane_and_out_edge_to_queue_index = [
-        link_index_by_intersection_id_in_lane_and_out_edge_dict[intersection_id] for
-        intersection_id in network_intersection_ids]
-
-    # Construct a dictionary which just gives {in_lane : {out_edge : link_index}}
-    # link_index_by_intersection_id_in_lane_and_out_edge values as a list
-    in_lane_and_out_edge_to_queue_index_as_list = link_index_by_intersection_id_in_lane_and_out_edge_dict.values()
-    # create a new dictionary which is a flattened version of link_index_by_intersection_id_in_lane_and_out_edge -> {in_lane : {out_edge : link_index}}
-    network_in_lane_and_out_edge_to_queue_index_dict = {}
-    for intersection_id in network_intersection_ids:
-        network_in_lane_and_out_edge_to_queue_index_dict.update(link_index_by_intersection_id_in_lane_and_out_edge_dict[intersection_id])
-
-    # number of queues at each intersection, ordered by network_intersection_ids
-    network_intersection_num_queue_indexes = [network._id2tls[id]._maxConnectionNo + 1  for id in network_intersection_ids]
-
-    # All lanes in the network
-    network_lanes = [lane.getID() for intersection in network._nodes for edge in intersection.getIncoming() for lane in edge.getLanes()]
+    # all the lanes, queues and phases of the network as index arrays
+    total_pressure_controller = TotalPressureController(net_file, green_stage_length, amber_stage_length)
 
     traci_port = checkPorts.getOpenPort()
     sumoCommand = (
@@ -344,90 +488,16 @@ if __name__ == "__main__":
     traci.init(traci_port)
     print("port opened")
 
-
-    # Set intial traffic light conditions
-    network_intersection_current_phase = [network_intersection_phase_matrix[intersection_index][0] for intersection_index, intersection_id in enumerate(network_intersection_ids)]
-    network_stage = 'green'
-    network_stage == 'switch_green_to_amber'
+    # routes of the vehicles, to find the next edge of the first cars without asking SUMO
+    total_pressure_controller.use_route_cache()
 
     # run the simulation
     while step < end_step and traci.simulation.getMinExpectedNumber() > 0:
         traci.simulationStep()
-
-        if network_stage == 'green':
-            counter -= step_length
-            if counter <= 0 :
-                network_stage = 'switch_green_to_amber'
-                counter = amber_stage_length
-        elif network_stage == 'switch_green_to_amber':
-            network_intersection_first_cars, network_intersection_queues_by_lane = get_first_cars_in_lane_and_lane_queue(network_intersection_ids, network_intersection_in_lanes)
-            network_intersection_first_cars_queue_indicies = get_queue_indices_of_first_vehicles(network_intersection_in_lanes, network_intersection_first_cars,
-                                                                                                 network_intersection_in_lane_and_out_edge_to_queue_index)
-
-            network_intersection_first_cars_in_lanes, network_intersection_first_cars_out_lanes = \
-                get_network_intersection_first_car_in_lane_and_out_lane(network_intersection_ids, network_intersection_first_cars_queue_indicies,
-                                                                        network_intersection_in_lanes_to_indicies, network_intersection_out_lanes_to_indicies)
-
-            lane_to_force = queue_force_calculation(network_intersection_first_cars_in_lanes,
-                                    network_intersection_first_cars_out_lanes, network_intersection_queues_by_lane)
-
-
-            junction_and_queue_index_and_force_tuples = convert_force_to_junction_and_index_tuple(lane_to_force, network_intersection_ids, network_intersection_first_cars_in_lanes, network_intersection_first_cars_queue_indicies)
-
-            network_intersection_queues_by_link_index = get_queue_length_per_link_index(network_intersection_in_lanes, network_intersection_num_queue_indexes, network_in_lane_and_out_edge_to_queue_index_dict)
-
-            network_intersection_queues_by_link_index_plus_force = add_force_to_queues(network_intersection_ids, network_intersection_queues_by_link_index,
-                                junction_and_queue_index_and_force_tuples)
-
-            a = network_intersection_queues_by_link_index_plus_force
-            b = [max(entry) for entry in a]
-            c = max(b)
-            d = b.index(c)
-            e = a[d]
-            f = e.index(max(e))
-
-            print(network_intersection_ids[d], f, c)
-
-            total_queue_lengths = map(np.dot, network_intersection_l_matrix, network_intersection_queues_by_link_index_plus_force)
-            total_queue_lengths = [entry.tolist() for entry in total_queue_lengths]
-
-            max_pressure_phase_index = [entry.index(max(entry)) for entry in total_queue_lengths]
-
-            network_intersection_previous_phase = network_intersection_current_phase
-
-            network_intersection_current_phase = [network_intersection_phase_matrix[ii][max_entry] for ii, max_entry in enumerate(max_pressure_phase_index)]
-
-            network_intersection_amber_phase_strings = map(get_intersection_amber_phase_strings,
-                                                           network_intersection_previous_phase,
-                                                           network_intersection_current_phase)
-
-            [traci.trafficlights.setRedYellowGreenState(intersection_id, "".join(network_intersection_amber_phase_strings[intersection_index])) for
-             intersection_index, intersection_id in enumerate(network_intersection_ids)]
-
-            counter -= step_length
-            network_stage = "amber"
-
-        elif network_stage == "amber":
-            counter -= step_length
-            if counter <= 0:
-                network_stage = "switch_amber_to_green"
-                counter = green_stage_length
-
-        elif network_stage == "switch_amber_to_green":
-
-            [traci.trafficlights.setRedYellowGreenState(intersection_id, "".join(
-                network_intersection_current_phase[intersection_index])) for
-             intersection_index, intersection_id in enumerate(network_intersection_ids)]
-
-            network_stage = "green"
-            counter -= step_length
-
-        else:
-            print("error in stage logic.")
-
+        total_pressure_controller.update_intersection_controllers(step, step_length)
         step += step_length
 
     traci.close()
     sys.stdout.flush()
 
-    sumoProcess.wait()
\ No newline at end of file
+    sumoProcess.wait()
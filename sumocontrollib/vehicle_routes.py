@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import traci
+import traci.constants as tc
+
+
+def edge_of_lane(lane_id):
+    """Lane ids are the edge id followed by _<lane index>"""
+    return lane_id.rsplit("_", 1)[0]
+
+
+class VehicleRouteCache:
+
+    def __init__(self):
+        """ Routes of the vehicles in the simulation, keyed by vehicle id, so the next edge of a vehicle can be found
+        without asking SUMO for its road and route every time. Routes are fetched (in one batch) when vehicles depart
+        and dropped when they arrive. The departed and arrived vehicles come from a subscription to the simulation
+        values, which replaces any other simulation subscription of the client. Routes changed by our own code have to
+        go through set_route, changes made inside SUMO (e.g. by rerouting devices) are only noticed when the vehicle
+        turns up on an edge which is not on its cached route """
+
+        self._routes = {}  # vehicle id -> tuple of edges
+        self._cursors = {}  # vehicle id -> index in the route of the edge the vehicle was last seen on
+
+        traci.simulation.subscribe((tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS))
+
+    def __repr__(self):
+        return "Vehicle Route Cache (%d vehicles)" % len(self._routes)
+
+    def update(self):
+        """Drops the arrived vehicles and loads the routes of the departed ones. Call once after every simulation step"""
+        results = traci.simulation.getSubscriptionResults()
+        if not results:
+            return
+
+        for veh_id in results[tc.VAR_ARRIVED_VEHICLES_IDS]:
+            self.invalidate(veh_id)
+
+        departed = results[tc.VAR_DEPARTED_VEHICLES_IDS]
+        if departed:
+            with traci.batch():
+                routes = [(veh_id, traci.vehicle.getRoute(veh_id)) for veh_id in departed]
+            for veh_id, route in routes:
+                self._routes[veh_id] = tuple(route.get())
+                self._cursors[veh_id] = 0
+
+    def invalidate(self, veh_id):
+        self._routes.pop(veh_id, None)
+        self._cursors.pop(veh_id, None)
+
+    def set_route(self, veh_id, edge_list):
+        """Changes the route of the vehicle in SUMO and in the cache. As for traci.vehicle.setRoute, the first edge
+        has to be the one the vehicle is on"""
+        traci.vehicle.setRoute(veh_id, edge_list)
+        self._routes[veh_id] = tuple(edge_list)
+        self._cursors[veh_id] = 0
+
+    def get_route(self, veh_id):
+        if veh_id not in self._routes:
+            # Vehicles which were already driving when the cache was created
+            self._routes[veh_id] = tuple(traci.vehicle.getRoute(veh_id))
+            self._cursors[veh_id] = 0
+        return self._routes[veh_id]
+
+    def get_next_edge(self, veh_id, current_edge=None):
+        """Returns the edge after current_edge on the route of the vehicle, 0 if current_edge is the last one.
+        Vehicles only move forward along their route, so the search starts at the edge they were last seen on. If
+        the current edge is not given it is asked from SUMO"""
+        if current_edge is None:
+            current_edge = traci.vehicle.getRoadID(veh_id)
+
+        route = self.get_route(veh_id)
+        index = self._find(route, self._cursors[veh_id], current_edge)
+        if index is None:
+            # The route was changed inside SUMO, fetch it again
+            self.invalidate(veh_id)
+            route = self.get_route(veh_id)
+            index = self._find(route, 0, current_edge)
+            if index is None:
+                print("Edge %s is not on the route of vehicle %s. Ignoring vehicle." % (current_edge, veh_id))
+                return 0
+
+        self._cursors[veh_id] = index
+        if index + 1 == len(route):
+            return 0
+        return route[index + 1]
+
+    def _find(self, route, start, edge):
+        for index in range(start, len(route)):
+            if route[index] == edge:
+                return index
+        return None
@@ -22,8 +22,10 @@ the Free Software Foundation; either version 3 of the License, or
 """
 from __future__ import print_function
 import socket
+import sys
 import time
 import struct
+import threading
 try:
     import traciemb
     _embedded = True
@@ -77,57 +79,332 @@ class Message:
     """ A named tuple for internal usage.
 
     Simple "struct" for the composed message string
-    together with a list of TraCI commands which are inside.
+    together with a list of TraCI commands which are inside
+    and the batch currently collecting commands (if any).
     """
-    string = ""
-    queue = []
+
+    def __init__(self):
+        self.string = ""
+        self.queue = []
+        self.batch = None
+
+
+_STRUCTS = {}
+# largest message Connection._recvExact takes from a single recv, larger
+# ones are received into its buffer piece by piece
+_RECV_SMALL = 128 << 10
+# size and unpack_from of the structs by format string, for Storage.read
+_READERS = {}
+_BYTE = struct.Struct("!B")
+_INT = struct.Struct("!i")
+_DOUBLE = struct.Struct("!d")
+# Python 2 copies strings out of a str faster than out of a memoryview
+_SLICE_STR = sys.version_info[0] < 3
+
+
+def _getStruct(format):
+    """Returns the precompiled struct.Struct for the given format string"""
+    compiled = _STRUCTS.get(format)
+    if compiled is None:
+        compiled = _STRUCTS[format] = struct.Struct(format)
+    return compiled
+
+
+def _getReader(format):
+    compiled = _getStruct(format)
+    reader = _READERS[format] = (compiled.size, compiled.unpack_from)
+    return reader
 
 
 class Storage:
 
+    """Read cursor over a TraCI response.
+
+    Fields are unpacked in place with precompiled structs and strings are
+    copied out of a memoryview, so reading never slices the whole buffer.
+    The content may be a string or a (reusable) bytearray. On Python 2,
+    where slicing a str is cheaper than a memoryview, a response which is
+    not a str is copied to one once and strings are sliced from that.
+    """
+
     def __init__(self, content):
+        self._view = memoryview(content)
+        if _SLICE_STR and not isinstance(content, bytes):
+            content = self._view.tobytes()
         self._content = content
         self._pos = 0
 
     def read(self, format):
-        oldPos = self._pos
-        self._pos += struct.calcsize(format)
-        return struct.unpack(format, self._content[oldPos:self._pos])
+        try:
+            size, unpack = _READERS[format]
+        except KeyError:
+            size, unpack = _getReader(format)
+        pos = self._pos
+        self._pos = pos + size
+        return unpack(self._content, pos)
 
     def readInt(self):
-        return self.read("!i")[0]
+        oldPos = self._pos
+        self._pos += 4
+        return _INT.unpack_from(self._content, oldPos)[0]
 
     def readDouble(self):
-        return self.read("!d")[0]
+        oldPos = self._pos
+        self._pos += 8
+        return _DOUBLE.unpack_from(self._content, oldPos)[0]
 
     def readLength(self):
-        length = self.read("!B")[0]
+        length = _BYTE.unpack_from(self._content, self._pos)[0]
+        self._pos += 1
         if length > 0:
             return length
-        return self.read("!i")[0]
-
-    def readString(self):
-        length = self.read("!i")[0]
-        return self.read("!%ss" % length)[0]
-
-    def readStringList(self):
-        n = self.read("!i")[0]
-        list = []
-        for i in range(n):
-            list.append(self.readString())
-        return list
+        return self.readInt()
+
+    if _SLICE_STR:
+        def readString(self):
+            start = self._pos + 4
+            self._pos = start + _INT.unpack_from(self._content, start - 4)[0]
+            if self._pos > len(self._content):
+                raise struct.error("string exceeds the end of the storage")
+            return self._content[start:self._pos]
+
+        def readStringList(self):
+            content = self._content
+            unpackInt = _INT.unpack_from
+            pos = self._pos
+            n = unpackInt(content, pos)[0]
+            pos += 4
+            list = []
+            for i in range(n):
+                start = pos + 4
+                pos = start + unpackInt(content, pos)[0]
+                list.append(content[start:pos])
+            if pos > len(content):
+                raise struct.error("string list exceeds the end of the storage")
+            self._pos = pos
+            return list
+    else:
+        def readString(self):
+            start = self._pos + 4
+            self._pos = start + _INT.unpack_from(self._content, start - 4)[0]
+            if self._pos > len(self._view):
+                raise struct.error("string exceeds the end of the storage")
+            return self._view[start:self._pos].tobytes()
+
+        def readStringList(self):
+            content = self._content
+            view = self._view
+            unpackInt = _INT.unpack_from
+            pos = self._pos
+            n = unpackInt(content, pos)[0]
+            pos += 4
+            list = []
+            for i in range(n):
+                start = pos + 4
+                pos = start + unpackInt(content, pos)[0]
+                list.append(view[start:pos].tobytes())
+            if pos > len(view):
+                raise struct.error("string list exceeds the end of the storage")
+            self._pos = pos
+            return list
 
     def readShape(self):
-        length = self.read("!B")[0]
-        return [self.read("!dd") for i in range(length)]
+        length = _BYTE.unpack_from(self._content, self._pos)[0]
+        coords = _getStruct("!%sd" % (2 * length)).unpack_from(
+            self._content, self._pos + 1)
+        self._pos += 1 + 16 * length
+        return list(zip(coords[::2], coords[1::2]))
 
     def ready(self):
-        return self._pos < len(self._content)
+        return self._pos < len(self._view)
 
     def printDebug(self):
         if _DEBUG:
-            for char in self._content[self._pos:]:
-                print("%03i %02x %s" % (ord(char), ord(char), char))
+            for char in bytearray(self._view[self._pos:].tobytes()):
+                print("%03i %02x %s" % (char, char, chr(char)))
+
+
+class BatchResult:
+
+    """Value of a get command which was queued in a batch.
+
+    The value can be retrieved with get() once the batch has been sent.
+    """
+
+    def __init__(self, cmdID, varID, objID, decoder):
+        self._cmdID = cmdID
+        self._varID = varID
+        self._objID = objID
+        self._decoder = decoder
+        self._ready = False
+        self._value = None
+
+    def _read(self, result):
+        _readResponseHeader(result, self._cmdID, self._varID, self._objID)
+        self._value = self._decoder(result)
+        self._ready = True
+
+    def ready(self):
+        return self._ready
+
+    def get(self):
+        if not self._ready:
+            raise TraCIException(self._cmdID, _RESULTS[0xFF],
+                                 "The batch containing this command has not been sent yet.")
+        return self._value
+
+    def __repr__(self):
+        if self._ready:
+            return "<BatchResult %r>" % (self._value,)
+        return "<BatchResult pending %02x,%02x,%s>" % (self._cmdID, self._varID, self._objID)
+
+
+class Batch:
+
+    """Collects get and set commands and sends them to SUMO in one message.
+
+    While the batch is active the getters of the domain modules return a
+    BatchResult instead of the value and the setters only queue their
+    command. Everything is sent in a single round trip when the batch is
+    left or send() is called:
+
+        with traci.batch():
+            counts = [traci.lane.getLastStepVehicleNumber(l) for l in lanes]
+            traci.trafficlights.setRedYellowGreenState(tlsID, state)
+        counts = [c.get() for c in counts]
+
+    Commands which need their answer at once (e.g. simulationStep,
+    subscriptions and getters with additional parameters) are sent
+    together with everything queued before them.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._results = []
+
+    def __enter__(self):
+        message = self._connection._message
+        if message.batch is not None:
+            raise TraCIException(None, _RESULTS[0xFF], "Batches cannot be nested.")
+        message.batch = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        message = self._connection._message
+        try:
+            if type is None:
+                self.send()
+        finally:
+            message.batch = None
+            if type is not None:
+                message.string = ""
+                message.queue = []
+                self._results = []
+
+    def _add(self, result):
+        self._results.append(result)
+        return result
+
+    def send(self):
+        """Sends all queued commands and fills their results"""
+        if self._connection._message.queue:
+            self._connection._sendMessage()
+
+
+def _splitCommands(string):
+    """Returns (cmdID, varID, length) for every command in a message.
+    varID is None for commands which do not address a variable."""
+    commands = []
+    pos = 0
+    while pos < len(string):
+        length = _BYTE.unpack_from(string, pos)[0]
+        start = pos + 1
+        if length == 0:
+            length = _INT.unpack_from(string, start)[0]
+            start += 4
+        cmdID = _BYTE.unpack_from(string, start)[0]
+        varID = None
+        if 0xa0 <= cmdID <= 0xaf or 0xc0 <= cmdID <= 0xcf:
+            varID = _BYTE.unpack_from(string, start + 1)[0]
+        commands.append((cmdID, varID, length))
+        pos += length
+    return commands
+
+
+class Instrumentation:
+
+    """Counts calls, bytes and wall time per (command id, variable id).
+
+    The time is taken from sending a message until its status responses
+    are read. Commands which share a message (see Batch) share its time
+    and received bytes evenly, the sent bytes are counted per command.
+    The counters of the last step are kept separately and, with perStep,
+    those of every step. If a csvFile is given they are written to it
+    when the connection is closed.
+    """
+
+    def __init__(self, csvFile=None, perStep=False):
+        self.csvFile = csvFile
+        self.perStep = perStep
+        self._totals = {}
+        self._step = {}
+        self._lastStep = {}
+        self._steps = []
+
+    def _add(self, request, received, seconds):
+        commands = _splitCommands(request)
+        share = 1. / len(commands)
+        isStep = False
+        for cmdID, varID, length in commands:
+            for counters in (self._totals, self._step):
+                entry = counters.get((cmdID, varID))
+                if entry is None:
+                    entry = counters[(cmdID, varID)] = [0, 0, 0., 0.]
+                entry[0] += 1
+                entry[1] += length
+                entry[2] += received * share
+                entry[3] += seconds * share
+            isStep = isStep or cmdID == constants.CMD_SIMSTEP2
+        if isStep:
+            self._lastStep = self._step
+            if self.perStep:
+                self._steps.append(self._step)
+            self._step = {}
+
+    def _rows(self, counters):
+        rows = [key + tuple(entry) for key, entry in counters.items()]
+        return sorted(rows, key=lambda row: row[5], reverse=True)
+
+    def getSummary(self):
+        """getSummary() -> list((integer, integer, integer, integer, double, double))
+
+        Returns (cmdID, varID, calls, bytes sent, bytes received, seconds)
+        for everything since the instrumentation was enabled, slowest first.
+        """
+        return self._rows(self._totals)
+
+    def getStepSummary(self):
+        """getStepSummary() -> list((integer, integer, integer, integer, double, double))
+
+        Returns the rows of getSummary for the last simulation step
+        (including the commands sent before it since the previous step).
+        """
+        return self._rows(self._lastStep)
+
+    def writeCSV(self, filename):
+        names = {}
+        for name, value in vars(constants).items():
+            if name.startswith("CMD_"):
+                names[value] = name
+        with open(filename, "w") as out:
+            out.write("step,command,cmdID,varID,calls,bytesSent,bytesReceived,seconds\n")
+            steps = [(str(index), counters) for index, counters in enumerate(self._steps)]
+            for step, counters in steps + [("total", self._totals)]:
+                for cmdID, varID, calls, sent, received, seconds in self._rows(counters):
+                    out.write("%s,%s,0x%02x,%s,%s,%s,%.0f,%.6f\n" % (
+                        step, names.get(cmdID, ""), cmdID,
+                        "" if varID is None else "0x%02x" % varID,
+                        calls, sent, received, seconds))
 
 
 class SubscriptionResults:
@@ -136,6 +413,8 @@ class SubscriptionResults:
         self._results = {}
         self._contextResults = {}
         self._valueFunc = valueFunc
+        self._columns = None
+        self._incremental = False
 
     def _parse(self, varID, data):
         if not varID in self._valueFunc:
@@ -143,14 +422,159 @@ class SubscriptionResults:
         return self._valueFunc[varID](data)
 
     def reset(self):
-        self._results.clear()
+        if self._incremental:
+            self._reported = set()
+            self._changed = {}
+        else:
+            self._results.clear()
         self._contextResults.clear()
+        if self._columns is not None:
+            self._array[self._live] = self._numpy.nan
+            self._reportedRows = set()
 
     def add(self, refID, varID, data):
+        if self._columns is not None and varID in self._columns:
+            row = self._rows.get(refID)
+            if row is None:
+                row = self._addRow(refID)
+            self._reportedRows.add(refID)
+            value = self._parse(varID, data)
+            try:
+                self._array[row, self._columns[varID]] = value
+            except (TypeError, ValueError):
+                raise ValueError("Variable %02x has the non numeric value %r." % (varID, value))
+            return
+        if self._incremental:
+            self._update(refID, varID, self._parse(varID, data))
+            return
         if refID not in self._results:
             self._results[refID] = {}
         self._results[refID][varID] = self._parse(varID, data)
 
+    def enableIncremental(self):
+        """enableIncremental() -> None
+
+        Keeps the result dict of every object across steps and overwrites
+        its values in place. Objects which are not reported in a step are
+        dropped at its end (see getRemoved) and getChanged returns only the
+        values which differ from the step before.
+        """
+        self._incremental = True
+        self._reported = set()
+        self._changed = {}
+        self._removed = []
+
+    def _update(self, refID, varID, value):
+        self._reported.add(refID)
+        values = self._results.get(refID)
+        if values is None:
+            values = self._results[refID] = {}
+        elif varID in values and values[varID] == value:
+            return
+        values[varID] = value
+        changed = self._changed.get(refID)
+        if changed is None:
+            changed = self._changed[refID] = {}
+        changed[varID] = value
+
+    def _endStep(self):
+        if self._incremental:
+            self._removed = [refID for refID in self._results if refID not in self._reported]
+            for refID in self._removed:
+                del self._results[refID]
+        if self._columns is not None:
+            # the rows of objects which were not reported are NaN since reset,
+            # they are free for new objects
+            for refID in [refID for refID in self._rows if refID not in self._reportedRows]:
+                row = self._rows.pop(refID)
+                self._live[row] = False
+                self._freeRows.append(row)
+
+    def getChanged(self, refID=None):
+        """getChanged(string) -> dict(integer: <value_type>)
+
+        Returns the values which were new or different in the last step,
+        for the given object or (without an id) for all objects.
+        """
+        if not self._incremental:
+            raise TraCIException(None, _RESULTS[0xFF], "Incremental updates are not enabled.")
+        if refID == None:
+            return self._changed
+        return self._changed.get(refID, None)
+
+    def getRemoved(self):
+        """getRemoved() -> list(string)
+
+        Returns the objects which were dropped because they were not
+        reported in the last step.
+        """
+        if not self._incremental:
+            raise TraCIException(None, _RESULTS[0xFF], "Incremental updates are not enabled.")
+        return self._removed
+
+    def enableColumns(self, varIDs, capacity=1024):
+        """enableColumns(list(integer), integer) -> None
+
+        Stores the values of the given numeric variables in a NumPy array
+        with one row per object and one column per variable instead of the
+        per object dicts. Rows are assigned on first sight and stay with
+        their object as long as it is reported in every step. The row of an
+        object missing from a step is released at its end and given to the
+        next new object, so the array grows with the number of objects
+        present at once. Rows without an object are NaN. The other
+        subscribed variables still go to the dicts.
+        """
+        import numpy
+        for varID in varIDs:
+            if varID not in self._valueFunc:
+                raise ValueError("Unknown variable %02x." % varID)
+        self._numpy = numpy
+        self._columns = dict((varID, column) for column, varID in enumerate(varIDs))
+        self._rows = {}
+        self._array = numpy.empty((capacity, len(varIDs)))
+        self._array.fill(numpy.nan)
+        # rows holding an object, the rows below _usedRows which do not and
+        # the objects reported this step
+        self._live = numpy.zeros(capacity, dtype=bool)
+        self._freeRows = []
+        self._usedRows = 0
+        self._reportedRows = set()
+
+    def _addRow(self, refID):
+        if self._freeRows:
+            row = self._freeRows.pop()
+        else:
+            row = self._usedRows
+            self._usedRows += 1
+            if row == len(self._array):
+                grown = self._numpy.empty((2 * len(self._array), len(self._columns)))
+                grown[:row] = self._array
+                grown[row:] = self._numpy.nan
+                self._array = grown
+                self._live = self._numpy.concatenate([self._live, self._numpy.zeros(row, dtype=bool)])
+        self._rows[refID] = row
+        self._live[row] = True
+        return row
+
+    def getColumns(self):
+        """getColumns() -> (dict(string: integer), numpy.ndarray)
+
+        Returns the map from object id to row and the array of the
+        variables given to enableColumns (a view which the next step overwrites).
+        Rows which are not in the map are free and NaN.
+        """
+        if self._columns is None:
+            raise TraCIException(None, _RESULTS[0xFF], "Columns are not enabled.")
+        return self._rows, self._array[:self._usedRows]
+
+    def getColumn(self, varID):
+        """getColumn(integer) -> numpy.ndarray
+
+        Returns the values of the given variable for all rows, see getColumns.
+        """
+        rows, array = self.getColumns()
+        return array[:, self._columns[varID]]
+
     def get(self, refID=None):
         if refID == None:
             return self._results
@@ -174,6 +598,31 @@ class SubscriptionResults:
         return "<%s, %s>" % (self._results, self._contextResults)
 
 
+class _ActiveSubscriptionResults(object):
+
+    """The subscriptionResults of a domain module.
+
+    Every connection keeps its own SubscriptionResults per domain, this
+    forwards to the ones of the connection which is currently active.
+    """
+
+    def __init__(self, valueFunc):
+        self._valueFunc = valueFunc
+
+    def _resolve(self, connection=None):
+        if connection is None:
+            connection = _connection()
+        return connection._getSubscriptionResults(self)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        return repr(self._resolve())
+
+
 from . import constants
 
 
@@ -261,47 +710,276 @@ _modules = {constants.RESPONSE_SUBSCRIBE_INDUCTIONLOOP_VARIABLE: inductionloop,
             constants.CMD_GET_EDGE_VARIABLE: edge,
             constants.CMD_GET_SIM_VARIABLE: simulation,
             constants.CMD_GET_GUI_VARIABLE: gui}
+_domains = {"inductionloop": inductionloop, "multientryexit": multientryexit,
+            "areal": areal, "trafficlights": trafficlights, "lane": lane,
+            "vehicle": vehicle, "person": person, "vehicletype": vehicletype,
+            "route": route, "poi": poi, "polygon": polygon,
+            "junction": junction, "edge": edge, "simulation": simulation,
+            "gui": gui}
 _connections = {}
-_message = Message()
 
 
-def _recvExact():
-    try:
-        result = ""
-        while len(result) < 4:
-            t = _connections[""].recv(4 - len(result))
-            if not t:
-                return None
-            result += t
-        length = struct.unpack("!i", result)[0] - 4
-        result = ""
-        while len(result) < length:
-            t = _connections[""].recv(length - len(result))
-            if not t:
-                return None
-            result += t
-        return Storage(result)
-    except socket.error:
-        return None
+class _Local(threading.local):
 
+    """Per thread state, the connection a bound accessor is calling through"""
 
-def _sendExact():
-    if _embedded:
-        result = Storage(traciemb.execute(_message.string))
-    else:
-        length = struct.pack("!i", len(_message.string) + 4)
-        _connections[""].send(length + _message.string)
-        result = _recvExact()
-    if not result:
-        _connections[""].close()
-        del _connections[""]
-        raise FatalTraCIError("connection closed by SUMO")
-    for command in _message.queue:
+    connection = None
+
+
+_local = _Local()
+
+
+def _connection():
+    """Returns the connection the module level functions work on.
+
+    This is the connection a bound accessor is currently calling through
+    (see Connection) or else the one selected by init() or switch()."""
+    connection = _local.connection
+    if connection is None:
+        connection = _connections.get("")
+        if connection is None:
+            raise FatalTraCIError("Not connected.")
+    return connection
+
+
+class _ActiveMessage(object):
+
+    """The message of the active connection, see _connection()"""
+
+    def _forward(name):
+        return property(lambda self: getattr(_connection()._message, name),
+                        lambda self, value: setattr(_connection()._message, name, value))
+
+    string = _forward("string")
+    queue = _forward("queue")
+    batch = _forward("batch")
+    del _forward
+
+
+_message = _ActiveMessage()
+
+
+class _DomainAccessor(object):
+
+    """A domain module (vehicle, lane, ...) bound to a connection.
+
+    Calls are made with the connection made active for the current thread,
+    so the module code itself stays connection agnostic."""
+
+    def __init__(self, connection, module):
+        self._connection = connection
+        self._module = module
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if isinstance(attr, _ActiveSubscriptionResults):
+            return attr._resolve(self._connection)
+        if not callable(attr):
+            return attr
+        bound = self._connection._bind(attr)
+        setattr(self, name, bound)
+        return bound
+
+    def __repr__(self):
+        return "<%s bound to %r>" % (self._module.__name__, self._connection)
+
+
+class Connection:
+
+    """A connection to a single SUMO instance.
+
+    The connection owns its socket, the message which is composed, the
+    receive buffers and the subscription results of all domains. The domain
+    modules are available as attributes bound to it, so several simulations
+    can be run side by side, e.g. one per thread:
+
+        conn = traci.connect(8813)
+        conn.vehicle.subscribe(vehID, (tc.VAR_SPEED,))
+        conn.simulationStep()
+        conn.vehicle.getSubscriptionResults(vehID)
+        conn.close()
+
+    The module level API (traci.vehicle.getSpeed(...) etc.) works on the
+    connection selected by init() or switch().
+    """
+
+    def __init__(self, socket=None):
+        self._socket = socket
+        self._message = Message()
+        self._recorder = None
+        self._instrumentation = None
+        self._subscriptionResults = {}
+        self._recvHeader = bytearray(4)
+        self._recvHeaderView = memoryview(self._recvHeader)
+        self._recvBuffer = memoryview(bytearray(1024))
+        for name in _domains:
+            setattr(self, name, _DomainAccessor(self, _domains[name]))
+
+    def _bind(self, function):
+        """Returns function wrapped to run with this connection active"""
+        def bound(*args, **kwargs):
+            previous = _local.connection
+            _local.connection = self
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _local.connection = previous
+        return bound
+
+    def _getSubscriptionResults(self, domain):
+        results = self._subscriptionResults.get(domain)
+        if results is None:
+            results = self._subscriptionResults[domain] = SubscriptionResults(
+                domain._valueFunc)
+        return results
+
+    def _recvInto(self, view):
+        """Fills the given memoryview from the socket.
+        Returns False if the connection was closed before it was full."""
+        received = 0
+        while received < len(view):
+            n = self._socket.recv_into(view[received:])
+            if not n:
+                return False
+            received += n
+        return True
+
+    def _recvExact(self):
+        """Receives the next message into a reusable buffer.
+
+        The returned Storage reads directly from that buffer, so it is only
+        valid until the next message is received. The header and messages
+        up to _RECV_SMALL bytes, which usually arrive in one piece, are
+        taken from a single recv instead."""
+        try:
+            recv = self._socket.recv
+            header = recv(4)
+            if len(header) < 4:
+                if not header:
+                    return None
+                self._recvHeader[:len(header)] = header
+                if not self._recvInto(self._recvHeaderView[len(header):]):
+                    return None
+                header = self._recvHeader
+            length = _INT.unpack_from(header)[0] - 4
+            received = 0
+            if length <= _RECV_SMALL:
+                data = recv(length)
+                if len(data) == length:
+                    return Storage(data)
+                if not data:
+                    return None
+                received = len(data)
+            if length > len(self._recvBuffer):
+                # storages may still reference the old buffer, so replace it
+                # instead of resizing it in place
+                self._recvBuffer = memoryview(
+                    bytearray(max(length, 2 * len(self._recvBuffer))))
+            view = self._recvBuffer[:length]
+            if received:
+                view[:received] = data
+            if not self._recvInto(view[received:]):
+                return None
+            return Storage(view)
+        except socket.error:
+            return None
+
+    def _sendMessage(self):
+        """Sends all queued commands and checks their status responses,
+        see _readStatuses."""
+        message = self._message
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            start = time.time()
+        if _embedded:
+            result = Storage(traciemb.execute(message.string))
+        else:
+            length = struct.pack("!i", len(message.string) + 4)
+            self._socket.send(length + message.string)
+            result = self._recvExact()
+        if not result:
+            self._socket.close()
+            self._socket = None
+            if _connections.get("") is self:
+                del _connections[""]
+            raise FatalTraCIError("connection closed by SUMO")
+        if self._recorder is not None:
+            self._recorder.write(message.string, result._view.tobytes())
+        if instrumentation is None:
+            return _readStatuses(message, result)
+        request = message.string
+        _readStatuses(message, result)
+        instrumentation._add(request, len(result._view), time.time() - start)
+        return result
+
+    def simulationStep(self, step=0):
+        return self._bind(simulationStep)(step)
+
+    def getVersion(self):
+        return self._bind(getVersion)()
+
+    def batch(self):
+        return Batch(self)
+
+    def startRecording(self, filename):
+        """Writes all messages exchanged with SUMO from now on to the given
+        log, see traci.replay"""
+        from . import replay
+        self.stopRecording()
+        self._recorder = replay.Recorder(filename)
+
+    def stopRecording(self):
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def enableInstrumentation(self, csvFile=None, perStep=False):
+        """Starts counting calls, bytes and time per command, see
+        Instrumentation"""
+        self._instrumentation = Instrumentation(csvFile, perStep)
+        return self._instrumentation
+
+    def getInstrumentation(self):
+        return self._instrumentation
+
+    def disableInstrumentation(self):
+        self._instrumentation = None
+
+    def close(self):
+        if self._socket is None:
+            return
+        self._message.queue.append(constants.CMD_CLOSE)
+        self._message.string += struct.pack("!BB", 1 + 1, constants.CMD_CLOSE)
+        self._sendMessage()
+        self._socket.close()
+        self._socket = None
+        self.stopRecording()
+        if self._instrumentation is not None and self._instrumentation.csvFile:
+            self._instrumentation.writeCSV(self._instrumentation.csvFile)
+
+    def __repr__(self):
+        if self._socket is None:
+            return "<Connection embedded>" if _embedded else "<Connection closed>"
+        try:
+            return "<Connection %s:%s>" % self._socket.getpeername()[:2]
+        except socket.error:
+            return "<Connection closed>"
+
+
+def _readStatuses(message, result):
+    """Checks the status responses to the commands queued in message.
+    Results of batched get commands are read on the way, the returned
+    storage is positioned behind the status of the last command."""
+    batchResults = []
+    if message.batch is not None:
+        batchResults = message.batch._results
+        message.batch._results = []
+    for index, command in enumerate(message.queue):
         prefix = result.read("!BBB")
         err = result.readString()
         if prefix[2] or err:
-            _message.string = ""
-            _message.queue = []
+            message.string = ""
+            message.queue = []
             raise TraCIException(prefix[1], _RESULTS[prefix[2]], err)
         elif prefix[1] != command:
             raise FatalTraCIError("Received answer %s for command %s." % (prefix[1],
@@ -309,11 +987,29 @@ def _sendExact():
         elif prefix[1] == constants.CMD_STOP:
             length = result.read("!B")[0] - 1
             result.read("!%sx" % length)
-    _message.string = ""
-    _message.queue = []
+        if index < len(batchResults) and batchResults[index] is not None:
+            batchResults[index]._read(result)
+    message.string = ""
+    message.queue = []
     return result
 
 
+def _recvExact():
+    return _connection()._recvExact()
+
+
+def _sendExact():
+    if _message.batch is not None:
+        # the command is sent together with the rest of the batch
+        _message.batch._add(None)
+        return None
+    return _connection()._sendMessage()
+
+
+def _sendMessage():
+    return _connection()._sendMessage()
+
+
 def _beginMessage(cmdID, varID, objID, length=0):
     _message.queue.append(cmdID)
     length += 1 + 1 + 1 + 4 + len(objID)
@@ -355,8 +1051,16 @@ def _sendStringCmd(cmdID, varID, objID, value):
     _sendExact()
 
 
-def _checkResult(cmdID, varID, objID):
-    result = _sendExact()
+def _sendGetCmd(cmdID, varID, objID, decoder):
+    """Sends a get command without parameters and decodes the value.
+    Inside a batch the command is only queued and a BatchResult returned."""
+    _beginMessage(cmdID, varID, objID)
+    if _message.batch is not None:
+        return _message.batch._add(BatchResult(cmdID, varID, objID, decoder))
+    return decoder(_checkResult(cmdID, varID, objID))
+
+
+def _readResponseHeader(result, cmdID, varID, objID):
     result.readLength()
     response, retVarID = result.read("!BB")
     objectID = result.readString()
@@ -364,6 +1068,11 @@ def _checkResult(cmdID, varID, objID):
         raise FatalTraCIError("Received answer %s,%s,%s for command %s,%s,%s."
                               % (response, retVarID, objectID, cmdID, varID, objID))
     result.read("!B")     # Return type of the variable
+
+
+def _checkResult(cmdID, varID, objID):
+    result = _sendMessage()
+    _readResponseHeader(result, cmdID, varID, objID)
     return result
 
 
@@ -378,8 +1087,7 @@ def _readSubscription(result):
     numVars = result.read("!B")[0]
     if isVariableSubscription:
         while numVars > 0:
-            varID = result.read("!B")[0]
-            status, varType = result.read("!BB")
+            varID, status, varType = result.read("!BBB")
             if status:
                 print("Error!", result.readString())
             elif response in _modules:
@@ -397,8 +1105,7 @@ def _readSubscription(result):
                 _modules[response].subscriptionResults.addContext(
                     objectID, _modules[domain].subscriptionResults, oid)
             for v in range(numVars):
-                varID = result.read("!B")[0]
-                status, varType = result.read("!BB")
+                varID, status, varType = result.read("!BBB")
                 if status:
                     print("Error!", result.readString())
                 elif response in _modules:
@@ -428,7 +1135,7 @@ def _subscribe(cmdID, begin, end, objID, varIDs, parameters=None):
         _message.string += struct.pack("!B", v)
         if parameters and v in parameters:
             _message.string += parameters[v]
-    result = _sendExact()
+    result = _sendMessage()
     objectID, response = _readSubscription(result)
     if response - cmdID != 16 or objectID != objID:
         raise FatalTraCIError("Received answer %02x,%s for subscription command %02x,%s." % (
@@ -447,25 +1154,34 @@ def _subscribeContext(cmdID, begin, end, objID, domain, dist, varIDs):
     _message.string += struct.pack("!BdB", domain, dist, len(varIDs))
     for v in varIDs:
         _message.string += struct.pack("!B", v)
-    result = _sendExact()
+    result = _sendMessage()
     objectID, response = _readSubscription(result)
     if response - cmdID != 16 or objectID != objID:
         raise FatalTraCIError("Received answer %02x,%s for context subscription command %02x,%s." % (
             response, objectID, cmdID, objID))
 
 
-def init(port=8813, numRetries=10, host="localhost", label="default"):
+def connect(port=8813, numRetries=10, host="localhost"):
+    """connect(integer, integer, string) -> Connection
+
+    Establishes a new connection to SUMO without changing the connection
+    the module level functions work on.
+    """
     if _embedded:
-        return getVersion()
+        return Connection()
     for wait in range(1, numRetries + 2):
         try:
-            _connections[""] = _connections[label] = socket.socket()
-            _connections[label].setsockopt(socket.IPPROTO_TCP,
-                                           socket.TCP_NODELAY, 1)
-            _connections[label].connect((host, port))
-            break
+            sock = socket.socket()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect((host, port))
+            return Connection(sock)
         except socket.error:
             time.sleep(wait)
+    raise FatalTraCIError("Could not connect to %s:%s." % (host, port))
+
+
+def init(port=8813, numRetries=10, host="localhost", label="default"):
+    _connections[""] = _connections[label] = connect(port, numRetries, host)
     return getVersion()
 
 
@@ -476,14 +1192,20 @@ def simulationStep(step=0):
     _message.queue.append(constants.CMD_SIMSTEP2)
     _message.string += struct.pack("!BBi", 1 +
                                    1 + 4, constants.CMD_SIMSTEP2, step)
-    result = _sendExact()
-    for module in _modules.values():
-        module.subscriptionResults.reset()
+    return _readSimulationStep(_sendMessage())
+
+
+def _readSimulationStep(result):
+    subscriptionResults = _connection()._subscriptionResults
+    for results in subscriptionResults.values():
+        results.reset()
     numSubs = result.readInt()
     responses = []
     while numSubs > 0:
         responses.append(_readSubscription(result))
         numSubs -= 1
+    for results in subscriptionResults.values():
+        results._endStep()
     return responses
 
 
@@ -491,7 +1213,7 @@ def getVersion():
     command = constants.CMD_GETVERSION
     _message.queue.append(command)
     _message.string += struct.pack("!BB", 1 + 1, command)
-    result = _sendExact()
+    result = _sendMessage()
     result.readLength()
     response = result.read("!B")[0]
     if response != command:
@@ -502,12 +1224,63 @@ def getVersion():
 
 def close():
     if "" in _connections:
-        _message.queue.append(constants.CMD_CLOSE)
-        _message.string += struct.pack("!BB", 1 + 1, constants.CMD_CLOSE)
-        _sendExact()
         _connections[""].close()
         del _connections[""]
 
 
 def switch(label):
     _connections[""] = _connections[label]
+
+
+def getConnection(label="default"):
+    """getConnection(string) -> Connection
+
+    Returns the connection which was opened by init() with the given label.
+    """
+    if label not in _connections:
+        raise TraCIException(None, _RESULTS[0xFF], "Connection '%s' is not known." % label)
+    return _connections[label]
+
+
+def startRecording(filename):
+    """startRecording(string) -> None
+
+    Writes all messages exchanged on the current connection to the given
+    log, which traci.replay.ReplayServer can answer a client from.
+    """
+    _connection().startRecording(filename)
+
+
+def stopRecording():
+    _connection().stopRecording()
+
+
+def enableInstrumentation(csvFile=None, perStep=False):
+    """enableInstrumentation(string, bool) -> Instrumentation
+
+    Counts calls, bytes sent and received and the time spent per command
+    and variable on the current connection. The counters are written to
+    csvFile (if given) when the connection is closed.
+    """
+    return _connection().enableInstrumentation(csvFile, perStep)
+
+
+def getInstrumentation():
+    """getInstrumentation() -> Instrumentation
+
+    Returns the instrumentation of the current connection (None if disabled).
+    """
+    return _connection().getInstrumentation()
+
+
+def disableInstrumentation():
+    _connection().disableInstrumentation()
+
+
+def batch():
+    """batch() -> Batch
+
+    Returns a new batch for sending many get and set commands to SUMO
+    in a single message, see Batch.
+    """
+    return Batch(_connection())
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+@file    aio.py
+@date    2016-01-22
+
+asyncio implementation of the TraCI interface (needs Python 3.5 or newer).
+
+Each AsyncConnection talks to one SUMO instance over an asyncio stream with
+the same framing as traci.Connection, so a single event loop can drive many
+simulations side by side:
+
+    async def run(port):
+        conn = await traci.aio.connect(port)
+        await conn.vehicle.subscribe("veh0", (tc.VAR_SPEED,))
+        while await conn.simulation.getMinExpectedNumber() > 0:
+            await conn.simulationStep()
+            speed = conn.vehicle.getSubscriptionResults("veh0")
+        await conn.close()
+
+    loop.run_until_complete(asyncio.gather(*[run(p) for p in ports]))
+
+The domain accessors (conn.vehicle, conn.lane, ...) offer the getters of
+the corresponding traci module which only take the object id (listed in
+_GETTERS, a getter added to a module has to be added there, which
+_checkGetters enforces on import), together
+with subscribe, subscribeContext and the subscription results. Values are
+decoded with the decoders of the traci modules, so strings are returned
+as bytes on Python 3.
+"""
+import asyncio
+import socket
+import struct
+
+import traci
+import traci.constants as tc
+
+_DOMAINS = {"inductionloop": (tc.CMD_GET_INDUCTIONLOOP_VARIABLE,
+                              tc.CMD_SUBSCRIBE_INDUCTIONLOOP_VARIABLE,
+                              tc.CMD_SUBSCRIBE_INDUCTIONLOOP_CONTEXT),
+            "multientryexit": (tc.CMD_GET_MULTI_ENTRY_EXIT_DETECTOR_VARIABLE,
+                               tc.CMD_SUBSCRIBE_MULTI_ENTRY_EXIT_DETECTOR_VARIABLE,
+                               tc.CMD_SUBSCRIBE_MULTI_ENTRY_EXIT_DETECTOR_CONTEXT),
+            "areal": (tc.CMD_GET_AREAL_DETECTOR_VARIABLE,
+                      tc.CMD_SUBSCRIBE_AREAL_DETECTOR_VARIABLE,
+                      tc.CMD_SUBSCRIBE_AREAL_DETECTOR_CONTEXT),
+            "trafficlights": (tc.CMD_GET_TL_VARIABLE,
+                              tc.CMD_SUBSCRIBE_TL_VARIABLE,
+                              tc.CMD_SUBSCRIBE_TL_CONTEXT),
+            "lane": (tc.CMD_GET_LANE_VARIABLE,
+                     tc.CMD_SUBSCRIBE_LANE_VARIABLE,
+                     tc.CMD_SUBSCRIBE_LANE_CONTEXT),
+            "vehicle": (tc.CMD_GET_VEHICLE_VARIABLE,
+                        tc.CMD_SUBSCRIBE_VEHICLE_VARIABLE,
+                        tc.CMD_SUBSCRIBE_VEHICLE_CONTEXT),
+            "person": (tc.CMD_GET_PERSON_VARIABLE,
+                       tc.CMD_SUBSCRIBE_PERSON_VARIABLE,
+                       tc.CMD_SUBSCRIBE_PERSON_CONTEXT),
+            "vehicletype": (tc.CMD_GET_VEHICLETYPE_VARIABLE,
+                            tc.CMD_SUBSCRIBE_VEHICLETYPE_VARIABLE,
+                            tc.CMD_SUBSCRIBE_VEHICLETYPE_CONTEXT),
+            "route": (tc.CMD_GET_ROUTE_VARIABLE,
+                      tc.CMD_SUBSCRIBE_ROUTE_VARIABLE,
+                      tc.CMD_SUBSCRIBE_ROUTE_CONTEXT),
+            "poi": (tc.CMD_GET_POI_VARIABLE,
+                    tc.CMD_SUBSCRIBE_POI_VARIABLE,
+                    tc.CMD_SUBSCRIBE_POI_CONTEXT),
+            "polygon": (tc.CMD_GET_POLYGON_VARIABLE,
+                        tc.CMD_SUBSCRIBE_POLYGON_VARIABLE,
+                        tc.CMD_SUBSCRIBE_POLYGON_CONTEXT),
+            "junction": (tc.CMD_GET_JUNCTION_VARIABLE,
+                         tc.CMD_SUBSCRIBE_JUNCTION_VARIABLE,
+                         tc.CMD_SUBSCRIBE_JUNCTION_CONTEXT),
+            "edge": (tc.CMD_GET_EDGE_VARIABLE,
+                     tc.CMD_SUBSCRIBE_EDGE_VARIABLE,
+                     tc.CMD_SUBSCRIBE_EDGE_CONTEXT),
+            "simulation": (tc.CMD_GET_SIM_VARIABLE,
+                           tc.CMD_SUBSCRIBE_SIM_VARIABLE,
+                           tc.CMD_SUBSCRIBE_SIM_CONTEXT),
+            "gui": (tc.CMD_GET_GUI_VARIABLE,
+                    tc.CMD_SUBSCRIBE_GUI_VARIABLE,
+                    tc.CMD_SUBSCRIBE_GUI_CONTEXT)}
+
+
+# The getters of each traci module which only fetch a variable, i.e. whose body is just
+# "return _getUniversal(tc.<VARIABLE>, objID)" (or without the id for the id lists and the
+# simulation values): (name, variable id, whether it takes an object id). Getters of variables
+# without a decoder in the module (e.g. getPersonNumber) are left out
+_GETTERS = {
+    "areal": [("getIDCount", tc.ID_COUNT, False),
+              ("getIDList", tc.ID_LIST, False),
+              ("getJamLengthMeters", tc.JAM_LENGTH_METERS, True),
+              ("getJamLengthVehicle", tc.JAM_LENGTH_VEHICLE, True),
+              ("getLastStepMeanSpeed", tc.LAST_STEP_MEAN_SPEED, True),
+              ("getLastStepOccupancy", tc.LAST_STEP_OCCUPANCY, True),
+              ("getLastStepVehicleIDs", tc.LAST_STEP_VEHICLE_ID_LIST, True)],
+    "edge": [("getCO2Emission", tc.VAR_CO2EMISSION, True),
+             ("getCOEmission", tc.VAR_COEMISSION, True),
+             ("getFuelConsumption", tc.VAR_FUELCONSUMPTION, True),
+             ("getHCEmission", tc.VAR_HCEMISSION, True),
+             ("getIDCount", tc.ID_COUNT, False),
+             ("getIDList", tc.ID_LIST, False),
+             ("getLastStepHaltingNumber", tc.LAST_STEP_VEHICLE_HALTING_NUMBER, True),
+             ("getLastStepLength", tc.LAST_STEP_LENGTH, True),
+             ("getLastStepMeanSpeed", tc.LAST_STEP_MEAN_SPEED, True),
+             ("getLastStepOccupancy", tc.LAST_STEP_OCCUPANCY, True),
+             ("getLastStepVehicleIDs", tc.LAST_STEP_VEHICLE_ID_LIST, True),
+             ("getLastStepVehicleNumber", tc.LAST_STEP_VEHICLE_NUMBER, True),
+             ("getNOxEmission", tc.VAR_NOXEMISSION, True),
+             ("getNoiseEmission", tc.VAR_NOISEEMISSION, True),
+             ("getPMxEmission", tc.VAR_PMXEMISSION, True),
+             ("getTraveltime", tc.VAR_CURRENT_TRAVELTIME, True),
+             ("getWaitingTime", tc.VAR_WAITING_TIME, True)],
+    "gui": [("getBoundary", tc.VAR_VIEW_BOUNDARY, True),
+            ("getIDList", tc.ID_LIST, False),
+            ("getOffset", tc.VAR_VIEW_OFFSET, True),
+            ("getSchema", tc.VAR_VIEW_SCHEMA, True),
+            ("getZoom", tc.VAR_VIEW_ZOOM, True)],
+    "inductionloop": [("getIDCount", tc.ID_COUNT, False),
+                      ("getIDList", tc.ID_LIST, False),
+                      ("getLaneID", tc.VAR_LANE_ID, True),
+                      ("getLastStepMeanLength", tc.LAST_STEP_LENGTH, True),
+                      ("getLastStepMeanSpeed", tc.LAST_STEP_MEAN_SPEED, True),
+                      ("getLastStepOccupancy", tc.LAST_STEP_OCCUPANCY, True),
+                      ("getLastStepVehicleIDs", tc.LAST_STEP_VEHICLE_ID_LIST, True),
+                      ("getLastStepVehicleNumber", tc.LAST_STEP_VEHICLE_NUMBER, True),
+                      ("getPosition", tc.VAR_POSITION, True),
+                      ("getTimeSinceDetection", tc.LAST_STEP_TIME_SINCE_DETECTION, True),
+                      ("getVehicleData", tc.LAST_STEP_VEHICLE_DATA, True)],
+    "junction": [("getIDCount", tc.ID_COUNT, False),
+                 ("getIDList", tc.ID_LIST, False),
+                 ("getPosition", tc.VAR_POSITION, True),
+                 ("getShape", tc.VAR_SHAPE, True)],
+    "lane": [("getAllowed", tc.LANE_ALLOWED, True),
+             ("getCO2Emission", tc.VAR_CO2EMISSION, True),
+             ("getCOEmission", tc.VAR_COEMISSION, True),
+             ("getDisallowed", tc.LANE_DISALLOWED, True),
+             ("getEdgeID", tc.LANE_EDGE_ID, True),
+             ("getFuelConsumption", tc.VAR_FUELCONSUMPTION, True),
+             ("getHCEmission", tc.VAR_HCEMISSION, True),
+             ("getIDCount", tc.ID_COUNT, False),
+             ("getIDList", tc.ID_LIST, False),
+             ("getLastStepHaltingNumber", tc.LAST_STEP_VEHICLE_HALTING_NUMBER, True),
+             ("getLastStepLength", tc.LAST_STEP_LENGTH, True),
+             ("getLastStepMeanSpeed", tc.LAST_STEP_MEAN_SPEED, True),
+             ("getLastStepOccupancy", tc.LAST_STEP_OCCUPANCY, True),
+             ("getLastStepVehicleIDs", tc.LAST_STEP_VEHICLE_ID_LIST, True),
+             ("getLastStepVehicleNumber", tc.LAST_STEP_VEHICLE_NUMBER, True),
+             ("getLength", tc.VAR_LENGTH, True),
+             ("getLinkNumber", tc.LANE_LINK_NUMBER, True),
+             ("getMaxSpeed", tc.VAR_MAXSPEED, True),
+             ("getNOxEmission", tc.VAR_NOXEMISSION, True),
+             ("getNoiseEmission", tc.VAR_NOISEEMISSION, True),
+             ("getPMxEmission", tc.VAR_PMXEMISSION, True),
+             ("getShape", tc.VAR_SHAPE, True),
+             ("getTraveltime", tc.VAR_CURRENT_TRAVELTIME, True),
+             ("getWaitingTime", tc.VAR_WAITING_TIME, True),
+             ("getWidth", tc.VAR_WIDTH, True)],
+    "multientryexit": [("getIDCount", tc.ID_COUNT, False),
+                       ("getIDList", tc.ID_LIST, False),
+                       ("getLastStepHaltingNumber", tc.LAST_STEP_VEHICLE_HALTING_NUMBER, True),
+                       ("getLastStepMeanSpeed", tc.LAST_STEP_MEAN_SPEED, True),
+                       ("getLastStepVehicleIDs", tc.LAST_STEP_VEHICLE_ID_LIST, True),
+                       ("getLastStepVehicleNumber", tc.LAST_STEP_VEHICLE_NUMBER, True)],
+    "person": [("getAngle", tc.VAR_ANGLE, True),
+               ("getColor", tc.VAR_COLOR, True),
+               ("getIDCount", tc.ID_COUNT, False),
+               ("getIDList", tc.ID_LIST, False),
+               ("getLanePosition", tc.VAR_LANEPOSITION, True),
+               ("getLength", tc.VAR_LENGTH, True),
+               ("getMinGap", tc.VAR_MINGAP, True),
+               ("getPosition", tc.VAR_POSITION, True),
+               ("getRoadID", tc.VAR_ROAD_ID, True),
+               ("getSpeed", tc.VAR_SPEED, True),
+               ("getTypeID", tc.VAR_TYPE, True),
+               ("getWaitingTime", tc.VAR_WAITING_TIME, True),
+               ("getWidth", tc.VAR_WIDTH, True)],
+    "poi": [("getColor", tc.VAR_COLOR, True),
+            ("getIDCount", tc.ID_COUNT, False),
+            ("getIDList", tc.ID_LIST, False),
+            ("getPosition", tc.VAR_POSITION, True),
+            ("getType", tc.VAR_TYPE, True)],
+    "polygon": [("getColor", tc.VAR_COLOR, True),
+                ("getIDCount", tc.ID_COUNT, False),
+                ("getIDList", tc.ID_LIST, False),
+                ("getShape", tc.VAR_SHAPE, True),
+                ("getType", tc.VAR_TYPE, True)],
+    "route": [("getEdges", tc.VAR_EDGES, True),
+              ("getIDCount", tc.ID_COUNT, False),
+              ("getIDList", tc.ID_LIST, False)],
+    "simulation": [("getArrivedIDList", tc.VAR_ARRIVED_VEHICLES_IDS, False),
+                   ("getArrivedNumber", tc.VAR_ARRIVED_VEHICLES_NUMBER, False),
+                   ("getBusStopWaiting", tc.VAR_BUS_STOP_WAITING, False),
+                   ("getCurrentTime", tc.VAR_TIME_STEP, False),
+                   ("getDeltaT", tc.VAR_DELTA_T, False),
+                   ("getDepartedIDList", tc.VAR_DEPARTED_VEHICLES_IDS, False),
+                   ("getDepartedNumber", tc.VAR_DEPARTED_VEHICLES_NUMBER, False),
+                   ("getEndingTeleportIDList", tc.VAR_TELEPORT_ENDING_VEHICLES_IDS, False),
+                   ("getEndingTeleportNumber", tc.VAR_TELEPORT_ENDING_VEHICLES_NUMBER, False),
+                   ("getLoadedIDList", tc.VAR_LOADED_VEHICLES_IDS, False),
+                   ("getLoadedNumber", tc.VAR_LOADED_VEHICLES_NUMBER, False),
+                   ("getMinExpectedNumber", tc.VAR_MIN_EXPECTED_VEHICLES, False),
+                   ("getNetBoundary", tc.VAR_NET_BOUNDING_BOX, False),
+                   ("getParkingEndingVehiclesIDList", tc.VAR_PARKING_ENDING_VEHICLES_IDS, False),
+                   ("getParkingEndingVehiclesNumber", tc.VAR_PARKING_ENDING_VEHICLES_NUMBER, False),
+                   ("getParkingStartingVehiclesIDList", tc.VAR_PARKING_STARTING_VEHICLES_IDS, False),
+                   ("getParkingStartingVehiclesNumber", tc.VAR_PARKING_STARTING_VEHICLES_NUMBER, False),
+                   ("getStartingTeleportIDList", tc.VAR_TELEPORT_STARTING_VEHICLES_IDS, False),
+                   ("getStartingTeleportNumber", tc.VAR_TELEPORT_STARTING_VEHICLES_NUMBER, False),
+                   ("getStopEndingVehiclesIDList", tc.VAR_STOP_ENDING_VEHICLES_IDS, False),
+                   ("getStopEndingVehiclesNumber", tc.VAR_STOP_ENDING_VEHICLES_NUMBER, False),
+                   ("getStopStartingVehiclesIDList", tc.VAR_STOP_STARTING_VEHICLES_IDS, False),
+                   ("getStopStartingVehiclesNumber", tc.VAR_STOP_STARTING_VEHICLES_NUMBER, False)],
+    "trafficlights": [("getCompleteRedYellowGreenDefinition", tc.TL_COMPLETE_DEFINITION_RYG, True),
+                      ("getControlledLanes", tc.TL_CONTROLLED_LANES, True),
+                      ("getControlledLinks", tc.TL_CONTROLLED_LINKS, True),
+                      ("getIDCount", tc.ID_COUNT, False),
+                      ("getIDList", tc.ID_LIST, False),
+                      ("getNextSwitch", tc.TL_NEXT_SWITCH, True),
+                      ("getPhase", tc.TL_CURRENT_PHASE, True),
+                      ("getPhaseDuration", tc.TL_PHASE_DURATION, True),
+                      ("getProgram", tc.TL_CURRENT_PROGRAM, True),
+                      ("getRedYellowGreenState", tc.TL_RED_YELLOW_GREEN_STATE, True)],
+    "vehicle": [("getAccel", tc.VAR_ACCEL, True),
+                ("getAllowedSpeed", tc.VAR_ALLOWED_SPEED, True),
+                ("getAngle", tc.VAR_ANGLE, True),
+                ("getBestLanes", tc.VAR_BEST_LANES, True),
+                ("getCO2Emission", tc.VAR_CO2EMISSION, True),
+                ("getCOEmission", tc.VAR_COEMISSION, True),
+                ("getColor", tc.VAR_COLOR, True),
+                ("getDecel", tc.VAR_DECEL, True),
+                ("getDistance", tc.VAR_DISTANCE, True),
+                ("getEmissionClass", tc.VAR_EMISSIONCLASS, True),
+                ("getFuelConsumption", tc.VAR_FUELCONSUMPTION, True),
+                ("getHCEmission", tc.VAR_HCEMISSION, True),
+                ("getIDCount", tc.ID_COUNT, False),
+                ("getIDList", tc.ID_LIST, False),
+                ("getImperfection", tc.VAR_IMPERFECTION, True),
+                ("getLaneID", tc.VAR_LANE_ID, True),
+                ("getLaneIndex", tc.VAR_LANE_INDEX, True),
+                ("getLanePosition", tc.VAR_LANEPOSITION, True),
+                ("getLength", tc.VAR_LENGTH, True),
+                ("getMaxSpeed", tc.VAR_MAXSPEED, True),
+                ("getMinGap", tc.VAR_MINGAP, True),
+                ("getNOxEmission", tc.VAR_NOXEMISSION, True),
+                ("getNoiseEmission", tc.VAR_NOISEEMISSION, True),
+                ("getPMxEmission", tc.VAR_PMXEMISSION, True),
+                ("getPosition", tc.VAR_POSITION, True),
+                ("getRoadID", tc.VAR_ROAD_ID, True),
+                ("getRoute", tc.VAR_EDGES, True),
+                ("getRouteID", tc.VAR_ROUTE_ID, True),
+                ("getShapeClass", tc.VAR_SHAPECLASS, True),
+                ("getSignals", tc.VAR_SIGNALS, True),
+                ("getSpeed", tc.VAR_SPEED, True),
+                ("getSpeedDeviation", tc.VAR_SPEED_DEVIATION, True),
+                ("getSpeedFactor", tc.VAR_SPEED_FACTOR, True),
+                ("getSpeedWithoutTraCI", tc.VAR_SPEED_WITHOUT_TRACI, True),
+                ("getTau", tc.VAR_TAU, True),
+                ("getTypeID", tc.VAR_TYPE, True),
+                ("getVehicleClass", tc.VAR_VEHICLECLASS, True),
+                ("getWaitingTime", tc.VAR_WAITING_TIME, True),
+                ("getWidth", tc.VAR_WIDTH, True)],
+    "vehicletype": [("getAccel", tc.VAR_ACCEL, True),
+                    ("getColor", tc.VAR_COLOR, True),
+                    ("getDecel", tc.VAR_DECEL, True),
+                    ("getEmissionClass", tc.VAR_EMISSIONCLASS, True),
+                    ("getIDCount", tc.ID_COUNT, False),
+                    ("getIDList", tc.ID_LIST, False),
+                    ("getImperfection", tc.VAR_IMPERFECTION, True),
+                    ("getLength", tc.VAR_LENGTH, True),
+                    ("getMaxSpeed", tc.VAR_MAXSPEED, True),
+                    ("getMinGap", tc.VAR_MINGAP, True),
+                    ("getShapeClass", tc.VAR_SHAPECLASS, True),
+                    ("getSpeedDeviation", tc.VAR_SPEED_DEVIATION, True),
+                    ("getSpeedFactor", tc.VAR_SPEED_FACTOR, True),
+                    ("getTau", tc.VAR_TAU, True),
+                    ("getVehicleClass", tc.VAR_VEHICLECLASS, True),
+                    ("getWidth", tc.VAR_WIDTH, True)]}
+
+# The variables with a decoder in their traci module which no getter of _GETTERS fetches
+_OTHER_VARIABLES = {
+    # getAdaptedTraveltime and getEffort take a time as well
+    "edge": set([tc.VAR_EDGE_TRAVELTIME, tc.VAR_EDGE_EFFORT]),
+    # getLinks decodes the links itself unless extended is given
+    "lane": set([tc.LANE_LINKS]),
+    # decoded for subscriptions only
+    "person": set([tc.VAR_ROUTE_ID]),
+    # getAdaptedTraveltime, getEffort, getLeader and getDrivingDistance take more parameters, isRouteValid is
+    # not a get
+    "vehicle": set([tc.VAR_EDGE_TRAVELTIME, tc.VAR_EDGE_EFFORT, tc.VAR_LEADER, tc.DISTANCE_REQUEST,
+                    tc.VAR_ROUTE_VALID])}
+
+
+def _checkGetters():
+    """Fails if _GETTERS does not match the traci modules any more: every getter has to exist in its module and
+    have a decoder there, and every variable with a decoder has to be fetched by one of them or be listed in
+    _OTHER_VARIABLES. A getter added to a module without adding it here is found this way"""
+    for name in _DOMAINS:
+        module = traci._domains[name]
+        offered = set()
+        for getter, varID, withID in _GETTERS[name]:
+            if not hasattr(module, getter) or varID not in module._RETURN_VALUE_FUNC:
+                raise ImportError("traci.aio lists %s.%s, which %s does not offer." % (
+                    name, getter, module.__name__))
+            offered.add(varID)
+        missing = set(module._RETURN_VALUE_FUNC) - offered - _OTHER_VARIABLES.get(name, set())
+        if missing:
+            raise ImportError("traci.aio has no getter for the %s variables %s." % (
+                name, ", ".join("0x%02x" % varID for varID in sorted(missing))))
+
+
+_checkGetters()
+
+
+def _toBytes(objID):
+    if isinstance(objID, bytes):
+        return objID
+    return objID.encode("latin-1")
+
+
+def _command(cmdID, body):
+    """Frames a single command with its (short or extended) length"""
+    length = 1 + 1 + len(body)
+    if length <= 255:
+        return struct.pack("!BB", length, cmdID) + body
+    return struct.pack("!BiB", 0, length + 4, cmdID) + body
+
+
+class _AsyncDomain:
+
+    """A traci domain module bound to an AsyncConnection"""
+
+    def __init__(self, connection, name):
+        self._connection = connection
+        self._module = traci._domains[name]
+        self._getCmdID, self._subscribeID, self._contextID = _DOMAINS[name]
+        self._getters = dict((getter, (varID, withID)) for getter, varID, withID in _GETTERS[name])
+
+    def __getattr__(self, name):
+        if name not in self._getters:
+            raise AttributeError("traci.aio does not offer %s.%s" % (
+                self._module.__name__, name))
+        varID, withID = self._getters[name]
+        decoder = self._module._RETURN_VALUE_FUNC[varID]
+
+        def getter(objID=""):
+            return self._connection._get(self._getCmdID, varID, objID, decoder)
+        getter.__name__ = name
+        getter.__doc__ = getattr(self._module, name).__doc__
+        setattr(self, name, getter)
+        return getter
+
+    def _results(self):
+        return self._connection._connection._getSubscriptionResults(
+            self._module.subscriptionResults)
+
+    def subscribe(self, objID, varIDs, begin=0, end=2**31 - 1):
+        body = struct.pack("!iii", begin, end, len(_toBytes(objID))) + _toBytes(objID)
+        body += struct.pack("!B%sB" % len(varIDs), len(varIDs), *varIDs)
+        return self._connection._subscribe(self._subscribeID, objID, body)
+
+    def subscribeContext(self, objID, domain, dist, varIDs, begin=0, end=2**31 - 1):
+        body = struct.pack("!iii", begin, end, len(_toBytes(objID))) + _toBytes(objID)
+        body += struct.pack("!BdB%sB" % len(varIDs), domain, dist, len(varIDs), *varIDs)
+        return self._connection._subscribe(self._contextID, objID, body)
+
+    def getSubscriptionResults(self, objID=None):
+        return self._results().get(objID and _toBytes(objID))
+
+    def getContextSubscriptionResults(self, objID=None):
+        return self._results().getContext(objID and _toBytes(objID))
+
+
+class AsyncConnection:
+
+    """A connection to a single SUMO instance driven from an asyncio loop.
+
+    Commands issued concurrently on the same connection are sent one
+    after the other, different connections do not wait for each other.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+        # keeps the subscription results, it is never used for sending
+        self._connection = traci.Connection()
+        for name in _DOMAINS:
+            setattr(self, name, _AsyncDomain(self, name))
+
+    async def _exchange(self, commands):
+        """Sends the given (cmdID, framed command) pairs in one message
+        and returns the storage after their status responses."""
+        message = traci.Message()
+        message.queue = [cmdID for cmdID, command in commands]
+        string = b"".join(command for cmdID, command in commands)
+        async with self._lock:
+            self._writer.write(struct.pack("!i", len(string) + 4) + string)
+            try:
+                await self._writer.drain()
+                header = await self._reader.readexactly(4)
+                length = struct.unpack("!i", header)[0] - 4
+                result = traci.Storage(await self._reader.readexactly(length))
+            except (asyncio.IncompleteReadError, socket.error):
+                self._writer.close()
+                raise traci.FatalTraCIError("connection closed by SUMO")
+        return traci._readStatuses(message, result)
+
+    async def _get(self, cmdID, varID, objID, decoder):
+        objID = _toBytes(objID)
+        body = struct.pack("!Bi", varID, len(objID)) + objID
+        result = await self._exchange([(cmdID, _command(cmdID, body))])
+        traci._readResponseHeader(result, cmdID, varID, objID)
+        return decoder(result)
+
+    async def _subscribe(self, cmdID, objID, body):
+        result = await self._exchange([(cmdID, _command(cmdID, body))])
+        objectID, response = self._connection._bind(traci._readSubscription)(result)
+        if response - cmdID != 16 or objectID != _toBytes(objID):
+            raise traci.FatalTraCIError("Received answer %02x,%s for subscription command %02x,%s." % (
+                response, objectID, cmdID, objID))
+
+    async def simulationStep(self, step=0):
+        """Performs a simulation step up to the given time in ms and
+        returns the (object id, response id) of the subscription results"""
+        command = _command(tc.CMD_SIMSTEP2, struct.pack("!i", step))
+        result = await self._exchange([(tc.CMD_SIMSTEP2, command)])
+        return self._connection._bind(traci._readSimulationStep)(result)
+
+    async def getVersion(self):
+        command = tc.CMD_GETVERSION
+        result = await self._exchange([(command, _command(command, b""))])
+        result.readLength()
+        response = result.read("!B")[0]
+        if response != command:
+            raise traci.FatalTraCIError(
+                "Received answer %s for command %s." % (response, command))
+        return result.readInt(), result.readString()
+
+    async def close(self):
+        await self._exchange([(tc.CMD_CLOSE, _command(tc.CMD_CLOSE, b""))])
+        self._writer.close()
+
+
+async def connect(port=8813, numRetries=10, host="localhost"):
+    """Opens an AsyncConnection to SUMO, retrying without blocking the loop"""
+    for wait in range(1, numRetries + 2):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            break
+        except OSError:
+            await asyncio.sleep(wait)
+    else:
+        raise traci.FatalTraCIError("Could not connect to %s:%s." % (host, port))
+    writer.get_extra_info("socket").setsockopt(
+        socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return AsyncConnection(reader, writer)
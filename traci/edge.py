@@ -40,13 +40,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:                   traci.Storage.readStringList
                       tc.LAST_STEP_VEHICLE_NUMBER:  traci.Storage.readInt,
                       tc.LAST_STEP_VEHICLE_HALTING_NUMBER: traci.Storage.readInt,
                       tc.LAST_STEP_VEHICLE_ID_LIST: traci.Storage.readStringList}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, edgeID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_EDGE_VARIABLE, varID, edgeID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_EDGE_VARIABLE, varID, edgeID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
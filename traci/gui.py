@@ -27,13 +27,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:           traci.Storage.readStringList,
                       tc.VAR_VIEW_OFFSET: lambda result: result.read("!dd"),
                       tc.VAR_VIEW_SCHEMA:   traci.Storage.readString,
                       tc.VAR_VIEW_BOUNDARY: lambda result: (result.read("!dd"), result.read("!dd"))}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, viewID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_GUI_VARIABLE, varID, viewID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_GUI_VARIABLE, varID, viewID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -50,13 +50,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:                       traci.Storage.readString
                       tc.LAST_STEP_LENGTH:               traci.Storage.readDouble,
                       tc.LAST_STEP_TIME_SINCE_DETECTION: traci.Storage.readDouble,
                       tc.LAST_STEP_VEHICLE_DATA:         readVehicleData}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, loopID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_INDUCTIONLOOP_VARIABLE, varID, loopID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_INDUCTIONLOOP_VARIABLE, varID, loopID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -26,13 +26,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:      traci.Storage.readStringList,
                       tc.VAR_POSITION: lambda result: result.read("!dd"),
                       tc.VAR_SHAPE:     traci.Storage.readShape}
 
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, junctionID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_JUNCTION_VARIABLE, varID, junctionID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_JUNCTION_VARIABLE, varID, junctionID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -20,33 +20,49 @@ the Free Software Foundation; either version 3 of the License, or
 (at your option) any later version.
 """
 import struct
+import collections
 import traci
 import traci.constants as tc
 
 
+Link = collections.namedtuple("Link", ["approachedLane", "hasPrio", "isOpen", "hasFoe",
+                                       "approachedInternal", "state", "direction", "length"])
+
+# the flags of a link and the length of its state string:
+# (type, hasPrio, type, isOpen, type, hasFoe, type, state length)
+_LINK_FLAGS = struct.Struct("!BBBBBBBi")
+
+
 def _readLinks(result):
-    result.read("!Bi")  # Type Compound, Length
-    nbLinks = result.readInt()
+    content = result._content
+    view = result._view
+    unpackInt = traci._INT.unpack_from
+    unpackFlags = _LINK_FLAGS.unpack_from
+    unpackDouble = traci._DOUBLE.unpack_from
+    nbLinks = unpackInt(content, result._pos + 5)[0]
+    pos = result._pos + 9
     links = []
     for i in range(nbLinks):
-        result.read("!B")                           # Type String
-        approachedLane = result.readString()
-        result.read("!B")                           # Type String
-        approachedInternal = result.readString()
-        result.read("!B")                           # Type Byte
-        hasPrio = bool(result.read("!B"))
-        result.read("!B")                           # Type Byte
-        isOpen = bool(result.read("!B"))
-        result.read("!B")                           # Type Byte
-        hasFoe = bool(result.read("!B"))
-        result.read("!B")                           # Type String
-        state = result.readString()
-        result.read("!B")                           # Type String
-        direction = result.readString()
-        result.read("!B")                           # Type Float
-        length = result.readDouble()
-        links.append((approachedLane, hasPrio, isOpen, hasFoe,
-                      approachedInternal, state, direction, length))
+        start = pos + 5
+        pos = start + unpackInt(content, pos + 1)[0]
+        approachedLane = view[start:pos].tobytes()
+        start = pos + 5
+        pos = start + unpackInt(content, pos + 1)[0]
+        approachedInternal = view[start:pos].tobytes()
+        hasPrio, isOpen, hasFoe, stateLength = unpackFlags(content, pos)[1::2]
+        start = pos + _LINK_FLAGS.size
+        pos = start + stateLength
+        state = view[start:pos].tobytes()
+        start = pos + 5
+        pos = start + unpackInt(content, pos + 1)[0]
+        direction = view[start:pos].tobytes()
+        length = unpackDouble(content, pos + 1)[0]
+        pos += 9
+        links.append(Link(approachedLane, bool(hasPrio), bool(isOpen), bool(hasFoe),
+                          approachedInternal, state, direction, length))
+    if pos > len(view):
+        raise struct.error("links exceed the end of the storage")
+    result._pos = pos
     return links
 
 
@@ -76,13 +92,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:                   traci.Storage.readStringList
                       tc.LAST_STEP_VEHICLE_NUMBER:  traci.Storage.readInt,
                       tc.LAST_STEP_VEHICLE_HALTING_NUMBER: traci.Storage.readInt,
                       tc.LAST_STEP_VEHICLE_ID_LIST: traci.Storage.readStringList}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, laneID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_LANE_VARIABLE, varID, laneID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_LANE_VARIABLE, varID, laneID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -157,12 +172,12 @@ def getLinks(laneID, extended=False):
     (string approachedLane, bool hasPrio, bool isOpen, bool hasFoe, 
     string approachedInternal, string state, string direction, float length)
     """
-    complete_data = _getUniversal(tc.LANE_LINKS, laneID)
     if extended:
-        return complete_data
+        return _getUniversal(tc.LANE_LINKS, laneID)
     else:
         # for downward compatibility
-        return [tuple(d[:4]) for d in complete_data]
+        return traci._sendGetCmd(tc.CMD_GET_LANE_VARIABLE, tc.LANE_LINKS, laneID,
+                                 lambda result: [tuple(d[:4]) for d in _readLinks(result)])
 
 
 def getShape(laneID):
@@ -25,13 +25,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:                          traci.Storage.readStr
                       tc.LAST_STEP_MEAN_SPEED:             traci.Storage.readDouble,
                       tc.LAST_STEP_VEHICLE_ID_LIST:        traci.Storage.readStringList,
                       tc.LAST_STEP_VEHICLE_HALTING_NUMBER: traci.Storage.readInt}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, detID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_MULTI_ENTRY_EXIT_DETECTOR_VARIABLE, varID, detID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_MULTI_ENTRY_EXIT_DETECTOR_VARIABLE, varID, detID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
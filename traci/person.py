@@ -37,13 +37,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:             traci.Storage.readStringList,
                       tc.VAR_MINGAP:          traci.Storage.readDouble,
                       }
 
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, personID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_PERSON_VARIABLE, varID, personID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_PERSON_VARIABLE, varID, personID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
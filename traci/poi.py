@@ -26,12 +26,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:      traci.Storage.readStringList,
                       tc.VAR_TYPE:     traci.Storage.readString,
                       tc.VAR_POSITION: lambda result: result.read("!dd"),
                       tc.VAR_COLOR: lambda result: result.read("!BBBB")}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, poiID):
-    result = traci._sendReadOneStringCmd(tc.CMD_GET_POI_VARIABLE, varID, poiID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_POI_VARIABLE, varID, poiID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -25,13 +25,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:   traci.Storage.readStringList,
                       tc.VAR_TYPE:  traci.Storage.readString,
                       tc.VAR_SHAPE: traci.Storage.readShape,
                       tc.VAR_COLOR: lambda result: result.read("!BBBB")}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, polygonID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_POLYGON_VARIABLE, varID, polygonID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_POLYGON_VARIABLE, varID, polygonID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+@file    replay.py
+@date    2016-01-27
+
+Recording and replaying of TraCI sessions.
+
+traci.startRecording(filename) (or Connection.startRecording) writes every
+request sent to SUMO together with its response to a binary log:
+
+    header   "TraCIlog", version (unsigned byte)
+    records  request length, response length (ints), request, response
+
+A ReplayServer listens on a local port and answers a TraCI client from
+such a log without running SUMO. As long as the client sends the same
+requests it gets the same responses, which makes the Python side of a
+control loop deterministic and cheap to benchmark. The server also takes
+the wall time between the simulation steps of the client. Version
+requests which are not in the log, such as the one of the handshake in
+traci.init, are answered by the server itself.
+"""
+import socket
+import struct
+import threading
+import time
+
+import traci
+import traci.constants as tc
+
+_MAGIC = b"TraCIlog"
+_VERSION = 1
+_HEADER = struct.Struct("!8sB")
+_RECORD = struct.Struct("!ii")
+_GET_VERSION = struct.pack("!BB", 1 + 1, tc.CMD_GETVERSION)
+
+
+class Recorder:
+
+    """Appends request/response pairs to a TraCI log"""
+
+    def __init__(self, filename):
+        self._file = open(filename, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+
+    def write(self, request, response):
+        self._file.write(_RECORD.pack(len(request), len(response)))
+        self._file.write(request)
+        self._file.write(response)
+
+    def close(self):
+        self._file.close()
+
+
+def readLog(filename):
+    """readLog(string) -> generator((string, string))
+
+    Yields the (request, response) pairs of the given log.
+    """
+    with open(filename, "rb") as log:
+        header = log.read(_HEADER.size)
+        if len(header) < _HEADER.size or _HEADER.unpack(header) != (_MAGIC, _VERSION):
+            raise traci.FatalTraCIError("%s is not a TraCI log of version %s." % (
+                filename, _VERSION))
+        while True:
+            header = log.read(_RECORD.size)
+            if not header:
+                break
+            requestLength, responseLength = _RECORD.unpack(header)
+            yield log.read(requestLength), log.read(responseLength)
+
+
+def getCommandIDs(request):
+    """getCommandIDs(string) -> list(integer)
+
+    Returns the ids of the commands in the given request.
+    """
+    return [cmdID for cmdID, varID, length in traci._splitCommands(request)]
+
+
+def _versionResponse(version=tc.TRACI_VERSION, description=b"SUMO replay"):
+    """The response of SUMO to a version request"""
+    status = struct.pack("!BBBi", 1 + 1 + 1 + 4, tc.CMD_GETVERSION, tc.RTYPE_OK, 0)
+    return status + struct.pack("!BBii", 1 + 1 + 4 + 4 + len(description), tc.CMD_GETVERSION,
+                                version, len(description)) + description
+
+
+def _recvExact(sock, length):
+    data = b""
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _recvMessage(sock):
+    """Receives one length prefixed message, None if the client has left"""
+    header = _recvExact(sock, 4)
+    if header is None:
+        return None
+    return _recvExact(sock, struct.unpack("!i", header)[0] - 4)
+
+
+class ReplayServer(threading.Thread):
+
+    """Answers one TraCI client from a log.
+
+    With strict checking every request has to equal the recorded one,
+    otherwise the connection is closed and the difference is kept in
+    error. Without it the responses are handed out in their order.
+    stepTimes holds the wall time between consecutive simulation steps
+    of the client, i.e. the time the client spent per step.
+    """
+
+    def __init__(self, filename, port=0, host="localhost", strict=True):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._records = list(readLog(filename))
+        self._strict = strict
+        # answer to the version requests which are not in the log, the one
+        # the log holds if there is any
+        self._version = _versionResponse()
+        for request, response in self._records:
+            if request == _GET_VERSION:
+                self._version = response
+                break
+        self._server = socket.socket()
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self.stepTimes = []
+        self.error = None
+
+    def run(self):
+        client = self._server.accept()[0]
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            self._serve(client)
+        finally:
+            client.close()
+            self._server.close()
+
+    def _send(self, client, response):
+        client.sendall(struct.pack("!i", len(response) + 4) + response)
+
+    def _recvRequest(self, client, request):
+        """Receives the next request of the client, answering the version
+        requests in front of it which the log does not have there"""
+        received = _recvMessage(client)
+        while received == _GET_VERSION and request != _GET_VERSION:
+            self._send(client, self._version)
+            received = _recvMessage(client)
+        return received
+
+    def _serve(self, client):
+        lastStep = None
+        for index, (request, response) in enumerate(self._records):
+            received = self._recvRequest(client, request)
+            if received is None:
+                return
+            if tc.CMD_SIMSTEP2 in getCommandIDs(received):
+                now = time.time()
+                if lastStep is not None:
+                    self.stepTimes.append(now - lastStep)
+                lastStep = now
+            if self._strict and received != request:
+                self.error = "Request %s with commands %s differs from the log (%s)." % (
+                    index, getCommandIDs(received), getCommandIDs(request))
+                return
+            self._send(client, response)
+        if self._recvRequest(client, None) is not None:
+            self.error = "The client sent more requests than the log contains."
@@ -24,13 +24,12 @@ import traci.constants as tc
 _RETURN_VALUE_FUNC = {tc.ID_LIST:   traci.Storage.readStringList,
                       tc.ID_COUNT:  traci.Storage.readInt,
                       tc.VAR_EDGES: traci.Storage.readStringList}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, routeID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_ROUTE_VARIABLE, varID, routeID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_ROUTE_VARIABLE, varID, routeID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
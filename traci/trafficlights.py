@@ -85,19 +85,30 @@ def _readLogics(result):
 
 def _readLinks(result):
     result.readLength()
-    nbSignals = result.read("!i")[0]  # Length
+    content = result._content
+    view = result._view
+    unpackInt = traci._INT.unpack_from
+    nbSignals = unpackInt(content, result._pos)[0]
+    pos = result._pos + 4
     signals = []
     for i in range(nbSignals):
-        # Type of Number of Controlled Links
-        result.read("!B")
-        # Number of Controlled Links
-        nbControlledLinks = result.read("!i")[0]
+        nbControlledLinks = unpackInt(content, pos + 1)[0]
+        pos += 5
         controlledLinks = []
         for j in range(nbControlledLinks):
-            result.read("!B")                       # Type of Link j
-            link = result.readStringList()          # Link j
+            # type of link j followed by its lanes as a string list
+            nbLanes = unpackInt(content, pos + 1)[0]
+            pos += 5
+            link = []
+            for k in range(nbLanes):
+                start = pos + 4
+                pos = start + unpackInt(content, pos)[0]
+                link.append(view[start:pos].tobytes())
             controlledLinks.append(link)
         signals.append(controlledLinks)
+    if pos > len(view):
+        raise struct.error("links exceed the end of the storage")
+    result._pos = pos
     return signals
 
 
@@ -111,12 +122,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:                     traci.Storage.readStringLi
                       tc.TL_NEXT_SWITCH:              traci.Storage.readInt,
                       tc.TL_PHASE_DURATION:           traci.Storage.readInt,
                       tc.ID_COUNT:                    traci.Storage.readInt}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, tlsID):
-    result = traci._sendReadOneStringCmd(tc.CMD_GET_TL_VARIABLE, varID, tlsID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_TL_VARIABLE, varID, tlsID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -23,6 +23,7 @@ the Free Software Foundation; either version 3 of the License, or
 (at your option) any later version.
 """
 import struct
+import collections
 import traci
 import traci.constants as tc
 
@@ -35,31 +36,52 @@ STOP_PARKING = 1
 STOP_TRIGGERED = 2
 
 
+BestLane = collections.namedtuple("BestLane", ["laneID", "length", "occupation", "offset",
+                                               "allowsContinuation", "nextLanes"])
+Leader = collections.namedtuple("Leader", ["vehID", "dist"])
+
+# everything of a best lanes entry between its lane id and its next lanes:
+# (type, length, type, occupation, type, offset, type, continuation, type, #next lanes)
+_BEST_LANE = struct.Struct("!BdBdBbBBBi")
+
+
 def _readBestLanes(result):
-    result.read("!iB")
-    nbLanes = result.read("!i")[0]  # Length
+    content = result._content
+    view = result._view
+    unpackInt = traci._INT.unpack_from
+    unpackLane = _BEST_LANE.unpack_from
+    nbLanes = unpackInt(content, result._pos + 5)[0]
+    pos = result._pos + 9
     lanes = []
     for i in range(nbLanes):
-        result.read("!B")
-        laneID = result.readString()
-        length, occupation, offset = result.read("!BdBdBb")[1::2]
-        allowsContinuation = result.read("!BB")[1]
-        nextLanesNo = result.read("!Bi")[1]
+        start = pos + 5
+        pos = start + unpackInt(content, pos + 1)[0]
+        laneID = view[start:pos].tobytes()
+        length, occupation, offset, allowsContinuation, nextLanesNo = unpackLane(content, pos)[
+            1::2]
+        pos += _BEST_LANE.size
         nextLanes = []
         for j in range(nextLanesNo):
-            nextLanes.append(result.readString())
-        lanes.append(
-            [laneID, length, occupation, offset, allowsContinuation, nextLanes])
+            start = pos + 4
+            pos = start + unpackInt(content, pos)[0]
+            nextLanes.append(view[start:pos].tobytes())
+        lanes.append(BestLane(laneID, length, occupation, offset,
+                              allowsContinuation, nextLanes))
+    if pos > len(view):
+        raise struct.error("best lanes exceed the end of the storage")
+    result._pos = pos
     return lanes
 
 
 def _readLeader(result):
-    result.read("!iB")
-    vehicleID = result.readString()
-    result.read("!B")
-    dist = result.readDouble()
+    content = result._content
+    start = result._pos + 9
+    end = start + traci._INT.unpack_from(content, result._pos + 5)[0]
+    vehicleID = result._view[start:end].tobytes()
+    dist = traci._DOUBLE.unpack_from(content, end + 1)[0]
+    result._pos = end + 9
     if vehicleID:
-        return vehicleID, dist
+        return Leader(vehicleID, dist)
     return None
 
 
@@ -108,13 +130,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:             traci.Storage.readStringList,
                       tc.DISTANCE_REQUEST:    traci.Storage.readDouble,
                       tc.VAR_DISTANCE:        traci.Storage.readDouble}
 
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, vehID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_VEHICLE_VARIABLE, varID, vehID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_VEHICLE_VARIABLE, varID, vehID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():
@@ -451,7 +472,7 @@ def getTau(vehID):
 
 
 def getBestLanes(vehID):
-    """getBestLanes(string) -> 
+    """getBestLanes(string) -> list(BestLane)
 
     Information about the wish to use subsequent edges' lanes.
     """
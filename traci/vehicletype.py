@@ -37,13 +37,12 @@ _RETURN_VALUE_FUNC = {tc.ID_LIST:             traci.Storage.readStringList,
                       tc.VAR_MINGAP:          traci.Storage.readDouble,
                       tc.VAR_WIDTH:           traci.Storage.readDouble,
                       tc.VAR_COLOR: lambda result: result.read("!BBBB")}
-subscriptionResults = traci.SubscriptionResults(_RETURN_VALUE_FUNC)
+subscriptionResults = traci._ActiveSubscriptionResults(_RETURN_VALUE_FUNC)
 
 
 def _getUniversal(varID, typeID):
-    result = traci._sendReadOneStringCmd(
-        tc.CMD_GET_VEHICLETYPE_VARIABLE, varID, typeID)
-    return _RETURN_VALUE_FUNC[varID](result)
+    return traci._sendGetCmd(
+        tc.CMD_GET_VEHICLETYPE_VARIABLE, varID, typeID, _RETURN_VALUE_FUNC[varID])
 
 
 def getIDList():